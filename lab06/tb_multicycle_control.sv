@@ -22,6 +22,16 @@ module tb_multicycle_control
     
     localparam EBREAK_INSTRUCTION = 32'h00100073;
 
+    // USE_MEMORY can also be given at run time with +USE_MEMORY=<value> so that the
+    // simulations with and without memory can share one elaborated snapshot
+    function automatic integer use_memory_setting();
+        integer value;
+        if (!$value$plusargs("USE_MEMORY=%d", value))
+            value = USE_MEMORY;
+        return value;
+    endfunction
+    integer use_memory = use_memory_setting();
+
     reg clk;
     //reg [8:0] tb_ControlSignals;
     reg tb_MemWrite, tb_MemRead, tb_rst;
@@ -586,7 +596,7 @@ module tb_multicycle_control
     logic [31:0] inst_memory [0:INST_MEMORY_SIZE-1];
     initial
     begin
-        if (USE_MEMORY) begin
+        if (use_memory) begin
             $readmemh(data_memory_filename,data_memory);
             if (^data_memory[0] === 1'bX) begin
                 $display("**** Warning: Failed to load the data memory:%s",data_memory_filename);
@@ -627,7 +637,7 @@ module tb_multicycle_control
     end
     // Instruction memory reads
     always@(posedge clk)
-        if (USE_MEMORY)
+        if (use_memory)
             tb_instruction <= inst_memory[(tb_PC - INITIAL_PC)>>2];
 
     // Decode instruction
@@ -729,7 +739,7 @@ module tb_multicycle_control
         for (i=0;i<32;i=i+1)
            tmpfile[i] = 0;
 
-        if (USE_MEMORY == 0)
+        if (use_memory == 0)
             non_memory_simulation();
         else
             memory_simulation();
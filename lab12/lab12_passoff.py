@@ -92,21 +92,17 @@ riscv_io_final_bit = tester_module.build_bitstream( "riscv_io_final",["xdc"],hdl
 	"DATA_MEMORY_FILENAME=final_iosystem_data.mem", "DEBOUNCE_DELAY_US=150"]
 	)
 
-# Update font for exercise #3
-final_font_bit = tester_module.update_font_mem( "riscv_io_final.dcp", "font_mem_mod.txt", 
-	"final_font.bit", "final_font.dcp")
-# Update background for exercise #3
-final_background_bit = tester_module.update_background_mem( "final_font.dcp", "background_mem.txt", 
-	"final_background.bit", "final_background.dcp")
-# Update program for final project
-project_program_bit = tester_module.update_bitstream_mem("project_text.mem","project_data.mem","riscv_io_final.dcp",
-	"project_program.bit", "project_program.dcp")
-# Update font for final project
-font_bit = tester_module.update_font_mem( "project_program.dcp", "project_font.txt", 
-	"project_font.bit", "project_font.dcp")
-# Update background for final project
-project_bit = tester_module.update_background_mem( "project_font.dcp", "project_background.txt", 
-	"project.bit", "project.dcp")
+# Update font and background for exercise #3 (only the final bitstream is written)
+final_background_bit = tester_module.update_mem_chain( "riscv_io_final.dcp", [
+	tester_module.font_update("font_mem_mod.txt"),
+	tester_module.background_update("background_mem.txt", "final_background.bit"),
+	])
+# Update program, font and background for final project
+project_bit = tester_module.update_mem_chain( "riscv_io_final.dcp", [
+	tester_module.program_update("project_text.mem", "project_data.mem"),
+	tester_module.font_update("project_font.txt"),
+	tester_module.background_update("project_background.txt", "project.bit"),
+	])
 
 def main():
 	''' Main executable for script
@@ -122,10 +118,7 @@ def main():
 	lab_test.add_test_module(final_iosystem_mem)
 	lab_test.add_test_module(project_mem)
 	lab_test.add_test_module(riscv_io_final_bit)
-	lab_test.add_test_module(final_font_bit)
 	lab_test.add_test_module(final_background_bit)
-	lab_test.add_test_module(project_program_bit)
-	lab_test.add_test_module(font_bit)
 	lab_test.add_test_module(project_bit)
 
 	# Add ending message to remind students to test their bitfiles
@@ -134,7 +127,7 @@ def main():
 	message.append('='*80)
 	# {}
 	project_bitfile_path = lab_test.submission_lab_path / "project.bit"
-	final_bitfile_path = lab_test.submission_lab_path / "final_backround.bit"
+	final_bitfile_path = lab_test.submission_lab_path / "final_background.bit"
 	message.append(f"NOTE: You should test the following bitfiles generated by the passoff script")
 	message.append(f"     \"{final_bitfile_path}\"")
 	message.append(f"     \"{project_bitfile_path}\"")
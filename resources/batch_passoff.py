@@ -0,0 +1,275 @@
+#!/usr/bin/python3
+
+'''
+Script for grading a roster of student submissions for a lab.
+
+Each submission is graded by running the lab-specific passoff script in its own
+extract directory (and therefore its own execution directory) with all of the
+interactive prompts disabled. A bounded number of submissions are graded at the
+same time and the results of all submissions are collected in a single table.
+
+The roster is a text file with one submission per line. Each line contains the
+GitHub URL (or local path) of the repository, optionally preceded by a name for
+the submission. Blank lines and lines starting with '#' are ignored:
+
+  # name     repository
+  wirthlin   git@github.com:byu-ecen323-winter2024/323-labs-wirthlin.git
+  git@github.com:byu-ecen323-winter2024/323-labs-student2.git
+
+The passoff scripts are run with --shallow_clone: they clone only the files of the
+lab at the commit of the submission tag. The objects shared with the starter code (i.e., rars1_4.jar and the iosystem)
+are borrowed from a local mirror of the starter code repository rather than fetched
+for every submission. The mirror is created (or updated) before the grading when the
+--starter_repo option is given.
+
+With the --harvest_store option, the submission tags of the roster are first fetched
+into a shared object store and checked out as worktrees of the store (see
+roster_harvest.py); the passoff scripts then grade these checkouts rather than cloning.
+'''
+
+# Command line argunent parser
+import argparse
+import concurrent.futures
+import csv
+# Manages file paths
+import pathlib
+import re
+# Shell utilities for removing directories
+import shutil
+import subprocess
+import sys
+import time
+
+from lab_passoff import TermColor
+# Shared object store of the submissions
+import roster_harvest
+
+# Root of the starter code repository (contains the lab directories)
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+
+class batch_submission:
+    ''' Represents a single submission in the roster and the result of grading it '''
+
+    def __init__(self, name, repo):
+        self.name = name
+        self.repo = repo
+        self.returncode = None
+        self.elapsed = 0.0
+        self.passed_modules = []
+        self.failed_modules = []
+        self.result_found = False
+
+    def status(self):
+        ''' Returns a string summarizing the result of the submission '''
+        if not self.result_found:
+            return "ERROR"
+        if self.failed_modules or self.returncode or not self.passed_modules:
+            return "FAIL"
+        return "PASS"
+
+def submission_name_from_repo(repo):
+    ''' Determine a name for the submission from the repository URL or path
+    (i.e., "git@github.com:byu-ecen323-winter2024/323-labs-wirthlin.git" -> "wirthlin") '''
+    name = re.split(r"[/:]", repo.rstrip("/"))[-1]
+    if name.endswith(".git"):
+        name = name[:-4]
+    if name.startswith("323-labs-"):
+        name = name[len("323-labs-"):]
+    return name
+
+def read_roster(roster_filename):
+    ''' Reads the roster file and returns a list of 'batch_submission' objects '''
+    submissions = []
+    names = set()
+    with open(roster_filename) as roster_file:
+        for line in roster_file:
+            fields = line.split()
+            if len(fields) == 0 or fields[0].startswith("#"):
+                continue
+            if len(fields) > 1:
+                name, repo = fields[0], fields[1]
+            else:
+                repo = fields[0]
+                name = submission_name_from_repo(repo)
+            if pathlib.Path(repo).expanduser().is_dir():
+                # The passoff scripts run in the lab directory
+                repo = str(pathlib.Path(repo).expanduser().absolute())
+            # Make sure each submission has its own directory
+            unique_name = name
+            i = 1
+            while unique_name in names:
+                unique_name = str.format("{}_{}", name, i)
+                i += 1
+            names.add(unique_name)
+            submissions.append(batch_submission(unique_name, repo))
+    return submissions
+
+def read_test_results(submission, result_filepath):
+    ''' Reads the 'labN_test_result.txt' file generated by the passoff script '''
+    try:
+        with open(result_filepath) as result_file:
+            for line in result_file:
+                line = line.strip()
+                if line.startswith("Success:"):
+                    submission.passed_modules.append(line[len("Success:"):])
+                elif line.startswith("Failed:"):
+                    submission.failed_modules.append(line[len("Failed:"):])
+        submission.result_found = True
+    except FileNotFoundError:
+        submission.result_found = False
+
+def update_reference_mirror(starter_repo, mirror_path):
+    ''' Create or update the local mirror of the starter code repository that the clones
+    of the submissions borrow objects from '''
+    if (mirror_path / "HEAD").exists():
+        print("Updating starter code mirror", mirror_path)
+        cmd = ["git", "--git-dir", str(mirror_path), "fetch", "--prune", "--quiet", "origin"]
+    else:
+        print("Creating starter code mirror", mirror_path)
+        mirror_path.parent.mkdir(parents=True, exist_ok=True)
+        cmd = ["git", "clone", "--mirror", "--quiet", starter_repo, str(mirror_path)]
+    proc = subprocess.run(cmd)
+    return proc.returncode == 0
+
+def grade_submission(submission, lab_num, work_path, args):
+    ''' Grade a single submission by running the passoff script in its own directories '''
+    lab_dir_name = str.format("lab{:02d}", lab_num)
+    lab_script = REPO_ROOT_PATH / lab_dir_name / str.format("{}_passoff.py", lab_dir_name)
+    submission_path = work_path / submission.name
+    extract_path = submission_path / "repo"
+    submission_path.mkdir(parents=True, exist_ok=True)
+    output_filepath = submission_path / "passoff_output.txt"
+
+    passoff_cmd = [ sys.executable, str(lab_script),
+        "--git_repo", submission.repo,
+        "--extract_dir", str(extract_path),
+        "--no_tag", "--force", "--non_interactive",
+        "--jobs", str(args.jobs),
+        # All of the passoff scripts share the capacity of the host
+        "--resource_dir", str(work_path / "resource_tokens"),
+        "--shallow_clone", "--reference_repo", args.reference_repo ]
+    if args.max_memory:
+        passoff_cmd.extend(["--max_memory", str(args.max_memory)])
+    if args.max_threads:
+        passoff_cmd.extend(["--max_threads", str(args.max_threads)])
+    if args.harvest_store:
+        # Grade the worktree checked out by the harvest
+        passoff_cmd.extend(["--submission_dir", str(extract_path)])
+    passoff_cmd.extend(args.passoff_option)
+    start_time = time.time()
+    with open(output_filepath, "w") as fp:
+        proc = subprocess.run(passoff_cmd, cwd=str(REPO_ROOT_PATH / lab_dir_name),
+            stdin=subprocess.DEVNULL, stdout=fp, stderr=subprocess.STDOUT)
+    submission.elapsed = time.time() - start_time
+    submission.returncode = proc.returncode
+
+    result_filepath = extract_path / lab_dir_name / str.format("lab{}_test_result.txt", lab_num)
+    read_test_results(submission, result_filepath)
+    # The repository is deleted here (rather than with the --clean option of the passoff
+    # script) so that the test result file can be read first.
+    if args.clean:
+        shutil.rmtree(extract_path, ignore_errors=True)
+    return submission
+
+def print_result_table(submissions):
+    ''' Print a table summarizing the result of every submission '''
+    name_width = max([len("Name")] + [len(s.name) for s in submissions])
+    header = str.format("{:<{}}  {:<6}  {:>6}  {:>6}  {:>8}  {}", "Name", name_width,
+        "Status", "Passed", "Failed", "Time(s)", "Failed modules")
+    print(header)
+    print("-" * len(header))
+    for s in submissions:
+        color = TermColor.GREEN if s.status() == "PASS" else TermColor.RED
+        print(color + str.format("{:<{}}  {:<6}  {:>6}  {:>6}  {:>8.1f}  {}", s.name, name_width,
+            s.status(), len(s.passed_modules), len(s.failed_modules), s.elapsed,
+            "; ".join(s.failed_modules)) + TermColor.END)
+
+def write_result_csv(submissions, csv_filepath):
+    ''' Write the results of every submission to a csv file '''
+    with open(csv_filepath, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(["name", "repository", "status", "passed", "failed",
+            "time_s", "return_code", "failed_modules"])
+        for s in submissions:
+            writer.writerow([s.name, s.repo, s.status(), len(s.passed_modules),
+                len(s.failed_modules), str.format("{:.1f}", s.elapsed), s.returncode,
+                ";".join(s.failed_modules)])
+
+def main():
+    ''' Main executable for script
+    '''
+
+    parser = argparse.ArgumentParser(description="Grade a roster of lab submissions")
+    parser.add_argument("lab", type=int, help="Lab number")
+    parser.add_argument("roster", type=str, help="Roster file (one repository URL or path per line)")
+    parser.add_argument("-w", "--workers", type=int, default=4,
+        help="Number of submissions to grade at the same time (default 4)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+        help="Number of test modules each passoff script can run concurrently (default 1)")
+    parser.add_argument("--max_memory", type=int,
+        help="Memory (MB) of the host shared by all tool processes (default is the host memory)")
+    parser.add_argument("--max_threads", type=int,
+        help="Threads of the host shared by all tool processes (default is the number of host CPUs)")
+    parser.add_argument("--work_dir", type=str, default="batch_passoff",
+        help="Directory where each submission is extracted and graded")
+    parser.add_argument("--summary", type=str,
+        help="csv file for the consolidated results (default is labN_batch_results.csv in the work directory)")
+    parser.add_argument("--clean", action="store_true",
+        help="Delete each extracted repository once it has been graded")
+    parser.add_argument("--reference_repo", type=str, default="~/.cache/ecen323_passoff/starter_mirror",
+        help="Local mirror of the starter code repository whose objects are borrowed by the clones")
+    parser.add_argument("--starter_repo", type=str,
+        help="Create or update the reference mirror from this starter code repository (URL or path) before grading")
+    parser.add_argument("--harvest_store", type=str,
+        help="Fetch the submissions into this shared object store and grade worktrees of it rather than clones")
+    parser.add_argument("--connections", type=int, default=8,
+        help="Number of repositories fetched at the same time into the harvest store (default 8)")
+    parser.add_argument("--passoff_option", action="append", default=[],
+        help="Option passed to the passoff script of every submission (i.e., --passoff_option=--no_preflight)")
+    args = parser.parse_args()
+
+    submissions = read_roster(args.roster)
+    if len(submissions) == 0:
+        print("No submissions in roster", args.roster)
+        return 1
+
+    work_path = pathlib.Path(args.work_dir).absolute()
+    work_path.mkdir(parents=True, exist_ok=True)
+    if args.starter_repo:
+        mirror_path = pathlib.Path(args.reference_repo).expanduser().absolute()
+        if not update_reference_mirror(args.starter_repo, mirror_path):
+            print("Cannot update the starter code mirror: the submissions are cloned without it")
+    if args.harvest_store:
+        store = roster_harvest.harvest_store(args.harvest_store)
+        store.create()
+        if args.starter_repo:
+            store.seed(args.starter_repo)
+        print(str.format("Harvesting {} submissions ({} at a time)", len(submissions), args.connections))
+        tag = str.format("lab{}_submission", args.lab)
+        results = roster_harvest.harvest(store, submissions, tag, work_path, args.connections)
+        harvested = { r.name for r in results if r.path }
+        skipped = [ s for s in submissions if s.name not in harvested ]
+        submissions = [ s for s in submissions if s.name in harvested ]
+    else:
+        skipped = []
+    print(str.format("Grading {} submissions for lab {} ({} at a time)",
+        len(submissions), args.lab, args.workers))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=args.workers) as executor:
+        futures = [ executor.submit(grade_submission, s, args.lab, work_path, args) for s in submissions ]
+        for future in concurrent.futures.as_completed(futures):
+            s = future.result()
+            print(str.format(" {}: {} ({:.1f}s)", s.name, s.status(), s.elapsed))
+
+    # The submissions that could not be harvested are reported as errors
+    submissions = submissions + skipped
+    print()
+    print_result_table(submissions)
+    csv_filepath = args.summary if args.summary else work_path / str.format("lab{}_batch_results.csv", args.lab)
+    write_result_csv(submissions, csv_filepath)
+    print()
+    print("Results written to", csv_filepath)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
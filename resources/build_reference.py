@@ -0,0 +1,195 @@
+#!/usr/bin/python3
+
+'''
+Reference checkpoints for incremental bitstream builds.
+
+Classes:
+  build_reference: the synthesized and routed checkpoints of the last successful build
+    of a design and the keys of the inputs of that build
+
+A bitstream build keeps the checkpoints of its last successful build in a directory
+named after the lab and the design. The next build of the design uses them as follows:
+ - If the sources and options of the design are unchanged and only the contents of the
+   memory files given by the memory generics (i.e., TEXT_MEMORY_FILENAME) differ, the
+   design is not synthesized. A private copy of the routed reference checkpoint (taken
+   while holding the lock of the reference) is opened and the new memory contents are
+   loaded into the BRAMs with 'load_mem.tcl'.
+ - Otherwise the design is built with incremental synthesis and incremental place and
+   route ('read_checkpoint -incremental') using the reference checkpoints.
+
+The key of the sources is computed from the contents of the HDL, constraint and include
+files, the generics that are not memory generics, the part and the Vivado version. The
+checkpoints are written to temporary files and renamed so that several passoff scripts
+on the host can share the reference directory.
+'''
+
+import contextlib
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import pathlib
+import tempfile
+
+import result_cache
+
+# Generics that name the initial contents of a memory and the 'updateChain' step that
+# loads the memory (see load_mem.tcl)
+MEMORY_GENERICS = { "TEXT_MEMORY_FILENAME" : "text", "DATA_MEMORY_FILENAME" : "data" }
+
+SYNTH_CHECKPOINT = "synth.dcp"
+ROUTED_CHECKPOINT = "routed.dcp"
+RECORD_FILENAME = "reference.json"
+
+def split_generics(generics):
+    ''' Split the generics into the memory generics (a dictionary of generic name to
+    filename) and the other generics '''
+    memory_generics = {}
+    other_generics = []
+    for generic in generics:
+        name, _, value = generic.partition("=")
+        value = value.strip().strip('"')
+        if name.strip() in MEMORY_GENERICS and value != "":
+            memory_generics[name.strip()] = value
+        else:
+            other_generics.append(generic)
+    return memory_generics, other_generics
+
+class build_reference:
+    ''' The reference checkpoints of a design '''
+
+    def __init__(self, reference_root, lab_name, design_name):
+        self.path = pathlib.Path(reference_root) / str.format("{}_{}", lab_name, design_name)
+        self.synth_checkpoint = self.path / SYNTH_CHECKPOINT
+        self.routed_checkpoint = self.path / ROUTED_CHECKPOINT
+        self.record_filepath = self.path / RECORD_FILENAME
+        self.record = None
+        self.read_record()
+
+    def read_record(self):
+        self.record = None
+        try:
+            with open(self.record_filepath) as fp:
+                self.record = json.load(fp)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def sources_key(self, execution_path, filenames, generics, options):
+        ''' Computes the key of the sources of a build from its input files (relative to the
+        execution path, glob patterns allowed), its non-memory generics and other options. The
+        memory files named by the memory generics are not part of the key. '''
+        memory_generics, other_generics = split_generics(generics)
+        memory_filenames = set(os.path.normpath(f) for f in memory_generics.values())
+        h = hashlib.sha256()
+        h.update(result_cache.tool_version("vivado").encode())
+        h.update(" ".join(str(o) for o in options).encode())
+        h.update(str.format("generics {}\n", " ".join(sorted(other_generics))).encode())
+        h.update(str.format("memories {}\n", " ".join(sorted(memory_generics))).encode())
+        for filename in sorted(set(str(f) for f in filenames)):
+            if glob.has_magic(filename):
+                matches = [ os.path.relpath(f, str(execution_path)) for f in
+                    sorted(glob.glob(os.path.join(str(execution_path), filename))) ]
+            else:
+                matches = [ filename ]
+            for match in matches:
+                if os.path.normpath(match) in memory_filenames:
+                    continue
+                filepath = os.path.join(str(execution_path), match)
+                h.update(str.format("{}={}\n", os.path.basename(match), result_cache.file_hash(filepath)).encode())
+        return h.hexdigest()
+
+    def memory_hashes(self, execution_path, generics):
+        ''' Returns the hash of the contents of each memory file named by the memory generics '''
+        memory_generics, _ = split_generics(generics)
+        return { name : result_cache.file_hash(os.path.join(str(execution_path), filename))
+            for name, filename in memory_generics.items() }
+
+    def has_checkpoints(self):
+        return self.record is not None and self.synth_checkpoint.is_file() and self.routed_checkpoint.is_file()
+
+    def memory_updates(self, sources_key, execution_path, generics):
+        ''' Returns the 'updateChain' arguments that turn the routed reference checkpoint into
+        the design with the given memory files or None if the design must be built (the
+        sources are different or there is no reference) '''
+        if not self.has_checkpoints() or self.record.get("sources_key") != sources_key:
+            return None
+        memory_generics, _ = split_generics(generics)
+        reference_hashes = self.record.get("memory_hashes", {})
+        updates = []
+        for name, memory_hash in sorted(self.memory_hashes(execution_path, generics).items()):
+            if memory_hash is None:
+                return None
+            if reference_hashes.get(name) != memory_hash:
+                updates.extend([ MEMORY_GENERICS[name], memory_generics[name] ])
+        return updates
+
+    def copy_for_update(self, sources_key, execution_path, generics):
+        ''' Returns (updates, checkpoint): the 'updateChain' arguments of memory_updates and a
+        private copy of the routed reference checkpoint to apply them to. The reference is
+        checked and copied while holding the lock so that a reference saved at the same time by
+        another passoff script (i.e., the build of another submission) is never used. Returns
+        (None, None) if the design must be built. The caller removes the copy. '''
+        with self.locked():
+            self.read_record()
+            updates = self.memory_updates(sources_key, execution_path, generics)
+            if updates is None:
+                return None, None
+            checkpoint = self.temporary_checkpoint()
+            with open(self.routed_checkpoint, "rb") as src, open(checkpoint, "wb") as dst:
+                for block in iter(lambda: src.read(result_cache.HASH_BLOCK_SIZE), b""):
+                    dst.write(block)
+        return updates, checkpoint
+
+    def incremental_checkpoints(self):
+        ''' Returns the (synthesized, routed) reference checkpoints for an incremental build or
+        None if there is no reference built with the same version of Vivado '''
+        if not self.has_checkpoints():
+            return None
+        if self.record.get("vivado") != result_cache.tool_version("vivado"):
+            return None
+        return (self.synth_checkpoint, self.routed_checkpoint)
+
+    def temporary_checkpoint(self):
+        ''' Returns a new temporary filename in the reference directory for a checkpoint '''
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd, filepath = tempfile.mkstemp(dir=str(self.path), prefix=".tmp_", suffix=".dcp")
+        os.close(fd)
+        return pathlib.Path(filepath)
+
+    @contextlib.contextmanager
+    def locked(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        fd = os.open(str(self.path / "lock"), os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def save(self, sources_key, memory_hashes, synth_checkpoint, routed_checkpoint):
+        ''' Make the checkpoints of a successful build the new reference. The synthesized
+        checkpoint (a temporary file of the reference directory) is renamed and the routed
+        checkpoint is copied. '''
+        with self.locked():
+            os.replace(str(synth_checkpoint), str(self.synth_checkpoint))
+            tmp_routed = self.temporary_checkpoint()
+            with open(routed_checkpoint, "rb") as src, open(tmp_routed, "wb") as dst:
+                for block in iter(lambda: src.read(result_cache.HASH_BLOCK_SIZE), b""):
+                    dst.write(block)
+            os.replace(str(tmp_routed), str(self.routed_checkpoint))
+            self.record = { "sources_key" : sources_key, "memory_hashes" : memory_hashes,
+                "vivado" : result_cache.tool_version("vivado") }
+            tmp_record = self.record_filepath.with_suffix(".tmp")
+            with open(tmp_record, "w") as fp:
+                json.dump(self.record, fp, indent=1, sort_keys=True)
+            os.replace(str(tmp_record), str(self.record_filepath))
+
+    def discard(self):
+        ''' Remove the reference (used when an incremental build fails because of it) '''
+        with self.locked():
+            for filepath in (self.record_filepath, self.synth_checkpoint, self.routed_checkpoint):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(filepath)
+            self.record = None
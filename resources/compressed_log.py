@@ -0,0 +1,201 @@
+#!/usr/bin/python3
+
+'''
+Compressed storage of the tool logs.
+
+Classes:
+  log_writer: writes a log as a sequence of independent gzip members (frames) and an
+    index of the frames
+
+A compressed log 'X.txt' is stored in 'X.txt.gz'. The output of the tool is buffered and
+written as one gzip member each time the buffer holds FRAME_SIZE bytes (the frames end
+at the end of a line when possible). The concatenated members are a regular gzip file
+that can be viewed with 'zless' or 'zcat'. The index 'X.txt.gz.idx' has one line per
+frame with the offset and size of the frame in the compressed file, its offset in the
+uncompressed log and the number of lines in the frame. The index is used to read the
+last lines of a log by decompressing only the last frames.
+
+The readers ('open_reader', 'tail_lines') accept the name of the uncompressed log and use
+the compressed log when it is the most recent of the two, so that the error checks of
+the test modules do not depend on whether the logs are compressed.
+
+Usage (view a log):
+  compressed_log.py <log> [--tail N]
+'''
+
+import argparse
+import contextlib
+import gzip
+import io
+import os
+import sys
+import zlib
+
+# Size of the uncompressed data of a frame
+FRAME_SIZE = 1024 * 1024
+# Compression level of the frames (the zlib default)
+COMPRESS_LEVEL = 6
+COMPRESSED_SUFFIX = ".gz"
+INDEX_SUFFIX = ".gz.idx"
+
+def compressed_path(filepath):
+    return str(filepath) + COMPRESSED_SUFFIX
+
+def index_path(filepath):
+    return str(filepath) + INDEX_SUFFIX
+
+def stored_files(filenames):
+    ''' Returns the names of the files that may hold the given logs (the uncompressed log,
+    the compressed log and its index) '''
+    files = []
+    for filename in filenames:
+        files.extend([ filename, compressed_path(filename), index_path(filename) ])
+    return files
+
+def is_compressed(filepath):
+    ''' Returns True if the compressed form of a log is the current one '''
+    try:
+        compressed_mtime = os.path.getmtime(compressed_path(filepath))
+    except OSError:
+        return False
+    try:
+        return compressed_mtime >= os.path.getmtime(str(filepath))
+    except OSError:
+        return True
+
+class log_writer:
+    ''' A binary file object that writes a compressed log '''
+
+    def __init__(self, filepath, frame_size=FRAME_SIZE):
+        self.filepath = filepath
+        self.frame_size = frame_size
+        self.buffer = bytearray()
+        # (compressed offset, compressed size, uncompressed offset, lines) of each frame
+        self.frames = []
+        self.offset = 0
+        self.uncompressed_offset = 0
+        self.fp = open(compressed_path(filepath), "wb")
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(str(filepath))
+
+    def write(self, data):
+        self.buffer += data
+        while len(self.buffer) >= self.frame_size:
+            # End the frame at the last line that fits (the whole buffer for a very long line)
+            end = self.buffer.rfind(b"\n", 0, self.frame_size)
+            self.write_frame(end + 1 if end >= 0 else self.frame_size)
+        return len(data)
+
+    def write_frame(self, size):
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        member = gzip.compress(data, compresslevel=COMPRESS_LEVEL, mtime=0)
+        self.fp.write(member)
+        self.frames.append((self.offset, len(member), self.uncompressed_offset, data.count(b"\n")))
+        self.offset += len(member)
+        self.uncompressed_offset += len(data)
+
+    def flush(self):
+        ''' Write the buffered output as a frame so that readers see it '''
+        if self.buffer:
+            self.write_frame(len(self.buffer))
+        self.fp.flush()
+
+    def close(self):
+        if self.fp is None:
+            return
+        self.flush()
+        self.fp.close()
+        self.fp = None
+        tmp_index = index_path(self.filepath) + ".tmp"
+        with open(tmp_index, "w") as fp:
+            for frame in self.frames:
+                fp.write(" ".join(str(value) for value in frame) + "\n")
+        os.replace(tmp_index, index_path(self.filepath))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_writer(filepath, compress=False, buffering=-1):
+    ''' Open a log for writing (binary). The other form of the log is removed. '''
+    if compress:
+        return log_writer(filepath)
+    for path in (compressed_path(filepath), index_path(filepath)):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+    return open(str(filepath), "wb", buffering=buffering)
+
+def open_reader(filepath):
+    ''' Open the current form of a log for reading (text) '''
+    if is_compressed(filepath):
+        return gzip.open(compressed_path(filepath), "rt", errors="replace")
+    return open(str(filepath), errors="replace")
+
+def read_index(filepath):
+    ''' Returns the frames of a compressed log (None if there is no valid index) '''
+    try:
+        with open(index_path(filepath)) as fp:
+            frames = [ tuple(int(value) for value in line.split()) for line in fp ]
+    except (OSError, ValueError):
+        return None
+    if any(len(frame) != 4 for frame in frames):
+        return None
+    # An index that does not cover the compressed log (i.e., written by an interrupted run)
+    covered = frames[-1][0] + frames[-1][1] if frames else 0
+    if covered != os.path.getsize(compressed_path(filepath)):
+        return None
+    return frames
+
+def tail_lines(filepath, count):
+    ''' Returns the last lines of a log. Only the last frames of an indexed compressed log
+    are decompressed. '''
+    if not is_compressed(filepath):
+        with open(str(filepath), "rb") as fp:
+            return tail_of_file(fp, count)
+    frames = read_index(filepath)
+    if frames is None:
+        with open_reader(filepath) as fp:
+            lines = fp.read().splitlines()
+        return lines[-count:] if count > 0 else []
+    blocks = []
+    lines = 0
+    with open(compressed_path(filepath), "rb") as fp:
+        for offset, size, _, frame_lines in reversed(frames):
+            fp.seek(offset)
+            blocks.insert(0, zlib.decompress(fp.read(size), wbits=31))
+            lines += frame_lines
+            if lines > count:
+                break
+    text = b"".join(blocks).decode(errors="replace")
+    return text.splitlines()[-count:] if count > 0 else []
+
+def tail_of_file(fp, count, block_size=64 * 1024):
+    ''' Returns the last lines of an uncompressed file by reading it from the end '''
+    fp.seek(0, io.SEEK_END)
+    position = fp.tell()
+    data = b""
+    while position > 0 and data.count(b"\n") <= count:
+        read_size = min(block_size, position)
+        position -= read_size
+        fp.seek(position)
+        data = fp.read(read_size) + data
+    return data.decode(errors="replace").splitlines()[-count:] if count > 0 else []
+
+def main():
+    parser = argparse.ArgumentParser(description="View a (compressed) tool log")
+    parser.add_argument("log", help="Log file (i.e., tb_simulation.txt)")
+    parser.add_argument("--tail", type=int, help="Print the last N lines")
+    args = parser.parse_args()
+    if args.tail is not None:
+        for line in tail_lines(args.log, args.tail):
+            print(line)
+        return
+    with open_reader(args.log) as fp:
+        for line in fp:
+            sys.stdout.write(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+#!/usr/bin/python3
+
+'''
+Status of a local repository for the repository checks of the passoff scripts (--check_repo).
+
+Classes:
+  index_error: the index cannot be read by this module (i.e., a split or sparse index)
+  repository_status: the tracked files, changes and untracked files of a repository
+
+The tracked files are read directly from the index file of the repository and the
+references (HEAD, origin/main) from the reference files. The changes and the untracked
+files come from a single 'git status --porcelain=v2 -z --branch' call rather than one git
+process per file and per check. The index is compared with another commit (i.e., whether
+the commits have been pushed) by comparing the object names of its entries with a single
+'git ls-tree -r' of the commit. An index with entries that are not plain blobs (merge
+conflicts, files added with 'git add -N') is compared by git ('git diff --cached').
+Linked worktrees (i.e., roster_harvest.py) are supported.
+
+Usage (print the status of the repository of a directory):
+  git_status.py [<dir>]
+'''
+
+import os
+import re
+import struct
+import subprocess
+import sys
+
+# Size of the fixed part of an index entry before the object name (ctime, mtime, dev,
+# ino, mode, uid, gid, size)
+INDEX_ENTRY_STAT_SIZE = 40
+# Flags of an index entry
+INDEX_EXTENDED_FLAG = 0x4000
+INDEX_STAGE_MASK = 0x3000
+INDEX_NAME_MASK = 0xFFF
+# Extended flag (version 3 and later) of the files added with 'git add -N' (intent to add)
+INDEX_INTENT_TO_ADD_FLAG = 0x2000
+# Mode of the directory entries of a sparse index
+INDEX_DIRECTORY_MODE = 0o040000
+# Extensions of the index files whose entries are not all in the index file
+INDEX_UNSUPPORTED_EXTENSIONS = { b"link" : "split index", b"sdir" : "sparse index" }
+# Prefixes of the references searched for a short reference name (i.e., "origin/main" is
+# "refs/remotes/origin/main") in the order of git rev-parse
+REF_SEARCH_PREFIXES = [ "refs/", "refs/tags/", "refs/heads/", "refs/remotes/" ]
+
+class index_error(Exception):
+    pass
+
+def find_git_dirs(path):
+    ''' Returns the (top, git_dir, common_dir) of the repository that contains a directory
+    (None if the directory is not in a repository) '''
+    path = os.path.abspath(str(path))
+    while True:
+        dot_git = os.path.join(path, ".git")
+        if os.path.isdir(dot_git):
+            git_dir = dot_git
+            break
+        if os.path.isfile(dot_git):
+            # A linked worktree: "gitdir: <path>"
+            with open(dot_git) as fp:
+                git_dir = fp.read().strip()[len("gitdir:"):].strip()
+            git_dir = os.path.normpath(os.path.join(path, git_dir))
+            break
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    common_dir = git_dir
+    commondir_filepath = os.path.join(git_dir, "commondir")
+    if os.path.isfile(commondir_filepath):
+        with open(commondir_filepath) as fp:
+            common_dir = os.path.normpath(os.path.join(git_dir, fp.read().strip()))
+    return path, git_dir, common_dir
+
+def object_name_size(common_dir):
+    ''' Size of the object names of a repository (sha1 or sha256) '''
+    try:
+        with open(os.path.join(common_dir, "config")) as fp:
+            if re.search(r"^\s*objectformat\s*=\s*sha256\s*$", fp.read(), re.MULTILINE | re.IGNORECASE):
+                return 32
+    except OSError:
+        pass
+    return 20
+
+def read_varint(data, offset):
+    ''' Decode a variable length integer of an index version 4 entry '''
+    c = data[offset]
+    offset += 1
+    value = c & 0x7F
+    while c & 0x80:
+        c = data[offset]
+        offset += 1
+        value = ((value + 1) << 7) | (c & 0x7F)
+    return value, offset
+
+def read_index(index_filepath, name_size=20):
+    ''' Returns the entries of an index file (versions 2 to 4) as a dictionary of path
+    (relative to the top of the repository) to (mode, object name) where the mode is an
+    octal string as printed by git ls-tree. The value is None for the paths with merge
+    conflicts and the paths added with 'git add -N'. Raises index_error for the index files that only git can interpret (split
+    index, sparse index). '''
+    try:
+        with open(index_filepath, "rb") as fp:
+            data = fp.read()
+    except FileNotFoundError:
+        # No index (nothing was ever added)
+        return {}
+    if len(data) < 12 or data[:4] != b"DIRC":
+        raise index_error("not an index file: " + str(index_filepath))
+    version, count = struct.unpack(">II", data[4:12])
+    if version not in (2, 3, 4):
+        raise index_error(str.format("index version {} is not supported", version))
+    entries = {}
+    offset = 12
+    previous = b""
+    for _ in range(count):
+        entry_offset = offset
+        mode = struct.unpack(">I", data[offset + 24:offset + 28])[0]
+        offset += INDEX_ENTRY_STAT_SIZE
+        oid = data[offset:offset + name_size].hex()
+        offset += name_size
+        flags = struct.unpack(">H", data[offset:offset + 2])[0]
+        offset += 2
+        extended_flags = 0
+        if version >= 3 and flags & INDEX_EXTENDED_FLAG:
+            extended_flags = struct.unpack(">H", data[offset:offset + 2])[0]
+            offset += 2
+        if version == 4:
+            # The name is the previous name minus N bytes plus a suffix
+            strip, offset = read_varint(data, offset)
+            end = data.index(b"\0", offset)
+            name = previous[:len(previous) - strip] + data[offset:end]
+            offset = end + 1
+        else:
+            end = data.index(b"\0", offset)
+            name = data[offset:end]
+            # Entries are padded with 1 to 8 NUL bytes to a multiple of 8 bytes
+            offset = entry_offset + ((end - entry_offset + 8) // 8) * 8
+        if mode == INDEX_DIRECTORY_MODE:
+            raise index_error("sparse index")
+        previous = name
+        path = name.decode("utf-8", errors="surrogateescape")
+        if flags & INDEX_STAGE_MASK or extended_flags & INDEX_INTENT_TO_ADD_FLAG:
+            entries[path] = None
+        else:
+            entries[path] = (str.format("{:06o}", mode), oid)
+    # Extensions (signature, size, data) followed by the checksum of the index
+    while offset + 8 <= len(data) - name_size:
+        signature = data[offset:offset + 4]
+        size = struct.unpack(">I", data[offset + 4:offset + 8])[0]
+        if signature in INDEX_UNSUPPORTED_EXTENSIONS:
+            raise index_error(INDEX_UNSUPPORTED_EXTENSIONS[signature])
+        offset += 8 + size
+    return entries
+
+def resolve_ref(git_dir, common_dir, ref):
+    ''' Returns the object name of a reference given by its full name (i.e., "refs/tags/lab01"),
+    a name in the git directory (i.e., "HEAD") or a short name (i.e., "origin/main" or "lab01").
+    Returns None if the reference does not exist. '''
+    if ref.startswith("refs/") or re.fullmatch(r"[A-Z_]+", ref):
+        return read_ref(git_dir, common_dir, ref)
+    for prefix in REF_SEARCH_PREFIXES:
+        oid = read_ref(git_dir, common_dir, prefix + ref)
+        if oid is not None:
+            return oid
+    # The default branch of a remote (i.e., "origin")
+    return read_ref(git_dir, common_dir, "refs/remotes/" + ref + "/HEAD")
+
+def read_ref(git_dir, common_dir, ref):
+    ''' Returns the object name of a reference given by its full name (None if it does not exist) '''
+    for _ in range(10):
+        # HEAD (and the other names without a '/') is in the directory of the worktree, the
+        # other references are shared
+        base_dir = git_dir if "/" not in ref else common_dir
+        try:
+            with open(os.path.join(base_dir, ref)) as fp:
+                value = fp.read().strip()
+        except OSError:
+            return packed_ref(common_dir, ref)
+        if not value.startswith("ref:"):
+            return value
+        ref = value[len("ref:"):].strip()
+    return None
+
+def packed_ref(common_dir, ref):
+    try:
+        with open(os.path.join(common_dir, "packed-refs")) as fp:
+            for line in fp:
+                fields = line.split()
+                if len(fields) == 2 and fields[1] == ref:
+                    return fields[0]
+    except OSError:
+        pass
+    return None
+
+class repository_status:
+    ''' The status of the repository containing a directory '''
+
+    def __init__(self, path):
+        self.path = os.path.abspath(str(path))
+        dirs = find_git_dirs(self.path)
+        if dirs is None:
+            raise index_error("not in a git repository: " + self.path)
+        self.top, self.git_dir, self.common_dir = dirs
+        try:
+            self.tracked = read_index(os.path.join(self.git_dir, "index"), object_name_size(self.common_dir))
+            self.index_read_by_git = False
+        except index_error:
+            # Let git interpret the index
+            proc = subprocess.run(["git", "ls-files", "-s", "-z", "--full-name", ":/"], cwd=self.path,
+                stdout=subprocess.PIPE, check=True)
+            self.tracked = {}
+            for record in proc.stdout.split(b"\0"):
+                if record:
+                    # <mode> <object> <stage>\t<path>
+                    info, path = os.fsdecode(record).split("\t", 1)
+                    mode, oid, stage = info.split()
+                    self.tracked[path] = (mode, oid) if stage == "0" else None
+            # (the files added with 'git add -N' are not shown by ls-files)
+            self.index_read_by_git = True
+        self.head = None
+        self.upstream = None
+        # Path (relative to the top) -> two letter status (i.e., ".M", "A.", "??")
+        self.changes = {}
+        self.untracked = []
+        self.read_status()
+
+    def read_status(self):
+        cmd = ["git", "status", "--porcelain=v2", "-z", "--branch", "--untracked-files=all"]
+        proc = subprocess.run(cmd, cwd=self.path, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        records = proc.stdout.split(b"\0")
+        i = 0
+        while i < len(records):
+            record = os.fsdecode(records[i])
+            i += 1
+            if record.startswith("# branch.oid "):
+                oid = record.split()[2]
+                self.head = None if oid == "(initial)" else oid
+            elif record.startswith("# branch.upstream "):
+                self.upstream = record.split()[2]
+            elif record.startswith("1 "):
+                fields = record.split(" ", 8)
+                self.changes[fields[8]] = fields[1]
+            elif record.startswith("2 "):
+                fields = record.split(" ", 9)
+                self.changes[fields[9]] = fields[1]
+                # The original path of a rename is in the next record
+                i += 1
+            elif record.startswith("u "):
+                fields = record.split(" ", 10)
+                self.changes[fields[10]] = fields[1]
+            elif record.startswith("? "):
+                self.changes[record[2:]] = "??"
+                self.untracked.append(record[2:])
+
+    def top_name(self, filename):
+        ''' The path (relative to the top of the repository) of a file relative to the directory '''
+        filepath = os.path.normpath(os.path.join(self.path, str(filename)))
+        return os.path.relpath(filepath, self.top).replace(os.sep, "/")
+
+    def is_tracked(self, filename):
+        ''' Returns True if a file (relative to the directory) is in the index (git ls-files) '''
+        return self.top_name(filename) in self.tracked
+
+    def changed_files(self, filenames):
+        ''' Returns the (status, path) of the files (relative to the directory) that are modified,
+        staged or untracked (git status --porcelain <files>) '''
+        names = [ self.top_name(f) for f in filenames ]
+        return [ (self.changes[name], name) for name in sorted(set(names)) if name in self.changes ]
+
+    def has_staged_changes(self):
+        return any(xy[0] not in ".?" for xy in self.changes.values())
+
+    def untracked_files(self):
+        ''' Returns the untracked files in the directory relative to the directory
+        (git ls-files --others --exclude-standard) '''
+        prefix = os.path.relpath(self.path, self.top).replace(os.sep, "/")
+        if prefix == ".":
+            return list(self.untracked)
+        return [ name[len(prefix) + 1:] for name in self.untracked if name.startswith(prefix + "/") ]
+
+    def differs_from(self, ref):
+        ''' Returns True if the index differs from the tree of a reference (git diff --cached
+        <ref>) and None if the reference does not exist. The tree is only read (with a single
+        git ls-tree) when HEAD is not the reference or changes are staged. '''
+        oid = resolve_ref(self.git_dir, self.common_dir, ref)
+        if oid is not None and oid == self.head and not self.has_staged_changes():
+            return False
+        if self.index_read_by_git or None in self.tracked.values():
+            # Conflicts and intent to add entries are compared by git
+            proc = subprocess.run(["git", "diff", "--cached", "--quiet", ref, "--"], cwd=self.path,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            return { 0 : False, 1 : True }.get(proc.returncode)
+        proc = subprocess.run(["git", "ls-tree", "-r", "-z", "--full-tree", ref], cwd=self.path,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if proc.returncode:
+            return None
+        tree = {}
+        for record in proc.stdout.split(b"\0"):
+            if record:
+                # <mode> <type> <object>\t<path>
+                info, path = os.fsdecode(record).split("\t", 1)
+                mode, _, tree_oid = info.split()
+                tree[path] = (mode, tree_oid)
+        return tree != self.tracked
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else "."
+    status = repository_status(path)
+    print("Top", status.top)
+    print("HEAD", status.head, "upstream", status.upstream)
+    print(len(status.tracked), "tracked files")
+    for name, xy in sorted(status.changes.items()):
+        print(" " + xy, name)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/python3
+
+'''
+Benchmark of the passoff harness (lab_passoff, tester_module, batch_passoff) run with the
+stand-in tools of tool_stubs.
+
+Classes:
+  benchmark_workspace: a copy of the repository (with placeholders for the student
+    files) and the stand-in tools in a scratch directory
+
+The time of a passoff run is split between the tools and the harness. The stand-in
+tools have a fixed latency and record the time of each run in a ledger so that the time
+spent in the harness (starting the script, checking the files, scheduling the modules,
+copying and checking the tool output, writing the results) is the wall-clock time of
+the run minus the time of the tools. The benchmark measures:
+  single: each labNN_passoff.py run on the local files (--local) one module at a time:
+    wall-clock time, tool time and harness overhead per test module
+  throughput: the rate at which the output of a tool is written to its log (plain,
+    compressed and checked by a monitor) compared to the rate of the tool itself
+  scaling: the passoff script of one lab with 1, 2, 4, ... concurrent test modules (--jobs)
+  batch: batch_passoff.py grading a roster of copies of the repository with 1, 2, 4, ...
+    workers
+The results are written as JSON and compared against thresholds (and optionally the
+results of an earlier run) so that a change that makes the harness slower is caught:
+  harness_benchmark.py --output results.json
+  harness_benchmark.py --baseline results.json --tolerance 0.2
+The exit code is 1 if a threshold is not met.
+'''
+
+import argparse
+import ast
+import contextlib
+import csv
+import json
+import os
+import pathlib
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Runs tool processes and copies their output to the logs
+import process_runner
+# Checks the tool output for errors
+import log_monitor
+# The stand-in tools
+import tool_stubs
+
+# Root of the starter code repository (contains the lab directories)
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+# The repository is copied in a path that passes the repository check of the passoff scripts
+CLASS_REPO = "byu-ecen323-winter2024"
+REPO_NAME = "323-labs-benchmark"
+
+# Each metric is checked against a limit ("max": the value must not exceed it, "min": the
+# value must be at least the limit)
+DEFAULT_THRESHOLDS = {
+    # Harness time per test module of a passoff run (seconds)
+    "overhead_per_module_s" : ("max", 1.5),
+    # Rate at which the tool output is written to a plain log (MB/s)
+    "log_throughput_mb_s" : ("min", 30.0),
+    # Rate at which the tool output is written to a compressed log that is checked for errors (MB/s)
+    "monitored_throughput_mb_s" : ("min", 3.0),
+    # Speedup of the passoff script with the largest number of jobs over one job
+    "jobs_speedup" : ("min", 1.3),
+    # Speedup of batch_passoff with the largest number of workers over one worker
+    "batch_speedup" : ("min", 1.3),
+}
+
+# Configurations of the log throughput benchmark: (name, compress, monitor tool)
+THROUGHPUT_CONFIGS = [
+    ("file", False, None),
+    ("compressed", True, None),
+    ("monitored", False, "testbench"),
+    ("compressed+monitored", True, "testbench"),
+]
+
+def placeholder_text(filename):
+    ''' Returns the contents of a placeholder for a missing student file (the stand-in
+    tools do not read the files but the harness checks that they exist and are well formed) '''
+    path = pathlib.Path(filename)
+    if path.suffix in (".sv", ".v"):
+        return str.format("// Placeholder for the benchmark\nmodule {}();\nendmodule\n", path.stem)
+    if path.suffix == ".s":
+        return "# Placeholder for the benchmark\n.text\nmain:\n\tnop\n"
+    return "# Placeholder for the benchmark\n"
+
+def lab_files(script_path):
+    ''' Returns the submission and test files (relative to the lab directory) of a passoff
+    script (read from the 'submission_files' and 'test_files' dictionaries of the script) '''
+    files = []
+    tree = ast.parse(script_path.read_text())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name) \
+            and node.targets[0].id in ("submission_files", "test_files"):
+            with contextlib.suppress(ValueError):
+                files.extend(ast.literal_eval(node.value).values())
+    return files
+
+def ledger_entries(ledger_filepath):
+    ''' Returns the runs recorded in a ledger of the stand-in tools '''
+    try:
+        with open(ledger_filepath) as fp:
+            return [ json.loads(line) for line in fp if line.strip() ]
+    except FileNotFoundError:
+        return []
+
+class benchmark_workspace:
+    ''' A scratch copy of the repository and the stand-in tools '''
+
+    def __init__(self, root, latency_scale=1.0, volume_scale=1.0, host_threads=None, host_memory=None):
+        self.root = pathlib.Path(root).absolute()
+        self.repo_path = self.root / CLASS_REPO / REPO_NAME
+        self.bin_path = self.root / "bin"
+        self.home_path = self.root / "home"
+        self.log_path = self.root / "logs"
+        self.latency_scale = latency_scale
+        self.volume_scale = volume_scale
+        # Capacity given to the passoff scripts (the stand-in tools use little CPU or memory)
+        self.host_options = []
+        if host_threads:
+            self.host_options.extend(["--max_threads", str(host_threads)])
+        if host_memory:
+            self.host_options.extend(["--max_memory", str(host_memory)])
+        self.run_count = 0
+
+    def create(self):
+        ''' Copy the repository (with placeholders for the missing student files), commit it
+        with the submission tag of every lab and install the stand-in tools '''
+        shutil.rmtree(self.root / CLASS_REPO, ignore_errors=True)
+        shutil.copytree(REPO_ROOT_PATH, self.repo_path,
+            ignore=shutil.ignore_patterns(".git", "__pycache__", "batch_passoff"))
+        for lab_num in self.lab_numbers():
+            lab_path = self.lab_path(lab_num)
+            for filename in lab_files(self.script_path(lab_num)):
+                filepath = lab_path / filename
+                if not filepath.exists():
+                    filepath.parent.mkdir(parents=True, exist_ok=True)
+                    filepath.write_text(placeholder_text(filename))
+        self.git("init", "-q")
+        # The passoff scripts check the origin of the repository (also for local runs)
+        self.git("remote", "add", "origin", str(self.repo_path))
+        self.git("add", "-A")
+        self.git("-c", "user.name=benchmark", "-c", "user.email=benchmark@localhost",
+            "commit", "-q", "-m", "Benchmark submission")
+        for lab_num in self.lab_numbers():
+            self.git("tag", "-f", str.format("lab{}_submission", lab_num))
+        # Every run has its own cache and library directories (~/.cache/ecen323_passoff)
+        self.home_path.mkdir(parents=True, exist_ok=True)
+        self.log_path.mkdir(parents=True, exist_ok=True)
+        tool_stubs.install(self.bin_path)
+
+    def git(self, *args):
+        subprocess.run(["git"] + list(args), cwd=str(self.repo_path), check=True,
+            stdout=subprocess.DEVNULL)
+
+    def reset(self):
+        ''' Remove the outputs of earlier runs from the repository '''
+        self.git("checkout", "-q", "-f")
+        self.git("clean", "-q", "-x", "-d", "-f")
+        shutil.rmtree(self.home_path, ignore_errors=True)
+        self.home_path.mkdir()
+
+    def lab_numbers(self):
+        return sorted(int(path.name[3:]) for path in self.repo_path.glob("lab[0-9][0-9]")
+            if (path / str.format("{}_passoff.py", path.name)).exists())
+
+    def lab_path(self, lab_num):
+        return self.repo_path / str.format("lab{:02d}", lab_num)
+
+    def script_path(self, lab_num):
+        return self.lab_path(lab_num) / str.format("lab{:02d}_passoff.py", lab_num)
+
+    def environment(self, ledger_filepath):
+        env = dict(os.environ)
+        env["PATH"] = str(self.bin_path) + os.pathsep + env.get("PATH", "")
+        env["HOME"] = str(self.home_path)
+        env["TOOL_STUB_LATENCY_SCALE"] = str(self.latency_scale)
+        env["TOOL_STUB_VOLUME_SCALE"] = str(self.volume_scale)
+        env["TOOL_STUB_LEDGER"] = str(ledger_filepath)
+        return env
+
+    def run(self, name, cmd, cwd):
+        ''' Run a command with the stand-in tools. Returns the wall-clock time, the return
+        code and the runs of the tools. '''
+        self.run_count += 1
+        ledger_filepath = self.log_path / str.format("{:03d}_{}_ledger.txt", self.run_count, name)
+        output_filepath = self.log_path / str.format("{:03d}_{}_output.txt", self.run_count, name)
+        start_time = time.monotonic()
+        with open(output_filepath, "w") as fp:
+            proc = subprocess.run(cmd, cwd=str(cwd), env=self.environment(ledger_filepath),
+                stdin=subprocess.DEVNULL, stdout=fp, stderr=subprocess.STDOUT)
+        wall_time = time.monotonic() - start_time
+        return wall_time, proc.returncode, ledger_entries(ledger_filepath)
+
+    def run_passoff(self, lab_num, jobs=1):
+        ''' Run the passoff script of a lab on the local files. Returns the measurements of the run. '''
+        self.reset()
+        cmd = [ sys.executable, str(self.script_path(lab_num)), "--local", "--no_tag", "--non_interactive",
+            "--no_preflight", "--output_mode", "file", "--jobs", str(jobs) ] + self.host_options
+        wall_time, return_code, tool_runs = self.run(str.format("lab{:02d}_j{}", lab_num, jobs), cmd,
+            self.lab_path(lab_num))
+        result = { "lab" : lab_num, "jobs" : jobs, "return_code" : return_code }
+        result.update(run_measurements(wall_time, tool_runs, jobs > 1))
+        try:
+            with open(self.lab_path(lab_num) / str.format("lab{}_test_result.json", lab_num)) as fp:
+                summary = json.load(fp)["summary"]
+        except (OSError, ValueError, KeyError):
+            summary = {}
+        result["modules"] = sum(summary.values())
+        result["passed"] = summary.get("passed", 0)
+        result["overhead_per_module"] = round(result["overhead"] / result["modules"], 3) \
+            if result["modules"] and result["overhead"] is not None else None
+        return result
+
+    def run_batch(self, lab_num, submissions, workers):
+        ''' Grade a roster of copies of the repository with batch_passoff. Returns the measurements of the run. '''
+        self.reset()
+        work_path = self.root / str.format("batch_w{}", workers)
+        shutil.rmtree(work_path, ignore_errors=True)
+        roster_filepath = self.root / "roster.txt"
+        with open(roster_filepath, "w") as fp:
+            for i in range(submissions):
+                fp.write(str.format("bench{} {}\n", i, self.repo_path))
+        csv_filepath = work_path / "results.csv"
+        cmd = [ sys.executable, str(self.repo_path / "resources" / "batch_passoff.py"), str(lab_num),
+            str(roster_filepath), "--workers", str(workers), "--work_dir", str(work_path),
+            "--summary", str(csv_filepath), "--clean", "--passoff_option=--no_preflight",
+            "--passoff_option=--output_mode", "--passoff_option=file" ] + self.host_options
+        wall_time, return_code, tool_runs = self.run(str.format("batch_lab{:02d}_w{}", lab_num, workers), cmd,
+            self.repo_path / "resources")
+        result = { "lab" : lab_num, "workers" : workers, "submissions" : submissions, "return_code" : return_code }
+        result.update(run_measurements(wall_time, tool_runs, workers > 1))
+        try:
+            with open(csv_filepath, newline="") as fp:
+                statuses = [ row["status"] for row in csv.DictReader(fp) ]
+        except OSError:
+            statuses = []
+        result["passed"] = statuses.count("PASS")
+        result["submissions_per_minute"] = round(60.0 * submissions / wall_time, 2)
+        return result
+
+def run_measurements(wall_time, tool_runs, concurrent=False):
+    ''' The wall-clock time of a run and the time of its tools. The harness overhead is
+    only known when the tools run one at a time. '''
+    tool_time = sum(run["elapsed"] for run in tool_runs)
+    return { "wall" : round(wall_time, 3), "tool_time" : round(tool_time, 3),
+        "overhead" : None if concurrent else round(wall_time - tool_time, 3), "tool_runs" : len(tool_runs),
+        "log_mb" : round(sum(run["bytes"] for run in tool_runs) / 1e6, 3) }
+
+def log_throughput(workspace, lines, repeat=3):
+    ''' Measure the rate at which the process runner writes the output of a tool to its log.
+    Returns the best rate (MB/s) of each configuration and of the tool writing to /dev/null. '''
+    throughput_path = workspace.root / "throughput"
+    throughput_path.mkdir(parents=True, exist_ok=True)
+    ledger_filepath = throughput_path / "ledger.txt"
+    xsim_cmd = [ str(workspace.bin_path / "xsim"), "-nolog", "throughput", "-runall" ]
+    env = workspace.environment(ledger_filepath)
+    env["TOOL_STUB_LATENCY_SCALE"] = "0"
+    env["TOOL_STUB_VOLUME_SCALE"] = str(lines / tool_stubs.TESTBENCH_SIMULATION[1])
+    results = {}
+    # The process runner starts the tools with the environment of this process
+    saved_environ = dict(os.environ)
+    os.environ.update(env)
+    runner = process_runner.process_runner()
+    try:
+        rates = []
+        for _ in range(repeat):
+            start_time = time.monotonic()
+            subprocess.run(xsim_cmd, cwd=str(throughput_path), stdout=subprocess.DEVNULL)
+            rates.append(ledger_entries(ledger_filepath)[-1]["bytes"] / (time.monotonic() - start_time) / 1e6)
+        results["tool"] = round(max(rates), 2)
+        for name, compress, monitor_tool in THROUGHPUT_CONFIGS:
+            rates = []
+            for _ in range(repeat):
+                monitor = log_monitor.line_monitor(monitor_tool) if monitor_tool else None
+                start_time = time.monotonic()
+                runner.run(xsim_cmd, throughput_path, throughput_path / (name + ".txt"), monitor=monitor,
+                    compress=compress, output_mode="file")
+                rates.append(ledger_entries(ledger_filepath)[-1]["bytes"] / (time.monotonic() - start_time) / 1e6)
+            results[name] = round(max(rates), 2)
+    finally:
+        runner.stop()
+        os.environ.clear()
+        os.environ.update(saved_environ)
+    return results
+
+def summary_metrics(report):
+    ''' The metrics of the report that are checked against the thresholds '''
+    metrics = {}
+    single = [ run["overhead_per_module"] for run in report.get("single", []) if run["overhead_per_module"] is not None ]
+    if single:
+        metrics["overhead_per_module_s"] = max(single)
+        metrics["median_overhead_per_module_s"] = round(statistics.median(single), 3)
+    throughput = report.get("throughput")
+    if throughput:
+        metrics["log_throughput_mb_s"] = throughput["file"]
+        metrics["monitored_throughput_mb_s"] = throughput["compressed+monitored"]
+    for key, runs, count_key in (("jobs_speedup", report.get("scaling"), "jobs"),
+        ("batch_speedup", report.get("batch"), "workers")):
+        if runs and len(runs) > 1:
+            metrics[key] = round(runs[0]["wall"] / runs[-1]["wall"], 3)
+            for run in runs:
+                run["speedup"] = round(runs[0]["wall"] / run["wall"], 3)
+    return metrics
+
+def check_thresholds(metrics, thresholds, baseline=None, tolerance=0.2):
+    ''' Returns a description of each metric that does not meet its threshold or that is
+    worse than the baseline by more than the tolerance (a fraction of the baseline) '''
+    failures = []
+    for name, (kind, limit) in thresholds.items():
+        if name not in metrics:
+            continue
+        value = metrics[name]
+        if (kind == "max" and value > limit) or (kind == "min" and value < limit):
+            failures.append(str.format("{} = {} ({} {})", name, value, kind, limit))
+        if baseline is None or name not in baseline:
+            continue
+        reference = baseline[name]
+        if (kind == "max" and value > reference * (1 + tolerance)) or \
+            (kind == "min" and value < reference * (1 - tolerance)):
+            failures.append(str.format("{} = {} (baseline {}, tolerance {:.0%})", name, value, reference, tolerance))
+    return failures
+
+def print_runs(title, runs, count_key):
+    print(title)
+    print(str.format("  {:>5} {:>7} {:>8} {:>8} {:>8} {:>8} {:>7} {:>7} {:>8}", "lab", count_key, "wall(s)",
+        "tools(s)", "harn.(s)", "per mod", "passed", "log MB", "speedup"))
+    for run in runs:
+        per_module = run.get("overhead_per_module")
+        print(str.format("  {:>5} {:>7} {:>8.2f} {:>8.2f} {:>8} {:>8} {:>7} {:>7.1f} {:>8}", run["lab"],
+            run[count_key], run["wall"], run["tool_time"],
+            "" if run["overhead"] is None else str.format("{:.2f}", run["overhead"]),
+            "" if per_module is None else str.format("{:.3f}", per_module),
+            str.format("{}/{}", run["passed"], run.get("modules", run.get("submissions"))), run["log_mb"],
+            run.get("speedup", "")))
+    print()
+
+def read_thresholds(filepath):
+    ''' Read the thresholds (a JSON object of metric name to [kind, limit]) that replace the defaults '''
+    thresholds = dict(DEFAULT_THRESHOLDS)
+    if filepath:
+        with open(filepath) as fp:
+            thresholds.update({ name : tuple(value) for name, value in json.load(fp).items() })
+    return thresholds
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the passoff harness with stand-in tools")
+    parser.add_argument("--labs", type=int, nargs="+", help="Labs of the single runs (default all)")
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4],
+        help="Numbers of jobs of the scaling runs (default 1 2 4)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+        help="Numbers of batch_passoff workers of the batch runs (default 1 2 4)")
+    parser.add_argument("--scaling_lab", type=int, default=7,
+        help="Lab of the scaling and batch runs (default 7)")
+    parser.add_argument("--submissions", type=int, default=4,
+        help="Number of submissions in the roster of the batch runs (default 4)")
+    parser.add_argument("--latency_scale", type=float, default=0.02,
+        help="Factor applied to the latencies of the stand-in tools (default 0.02)")
+    parser.add_argument("--volume_scale", type=float, default=1.0,
+        help="Factor applied to the output volume of the stand-in tools (default 1.0)")
+    parser.add_argument("--throughput_lines", type=int, default=200000,
+        help="Lines of tool output in the log throughput runs (default 200000)")
+    parser.add_argument("--host_threads", type=int, default=16,
+        help="Threads of the host given to the passoff scripts (default 16)")
+    parser.add_argument("--host_memory", type=int, default=65536,
+        help="Memory (MB) of the host given to the passoff scripts (default 65536)")
+    parser.add_argument("--skip", choices=["single", "throughput", "scaling", "batch"], nargs="+", default=[],
+        help="Parts of the benchmark to skip")
+    parser.add_argument("--work_dir", type=str,
+        help="Scratch directory of the benchmark (default is a temporary directory that is deleted)")
+    parser.add_argument("--output", type=str, help="JSON file for the results")
+    parser.add_argument("--thresholds", type=str,
+        help="JSON file of thresholds ({\"metric\" : [\"max\" or \"min\", limit]}) replacing the defaults")
+    parser.add_argument("--baseline", type=str, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+        help="Fraction by which a metric may be worse than the baseline (default 0.2)")
+    args = parser.parse_args()
+
+    thresholds = read_thresholds(args.thresholds)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)["metrics"]
+
+    with contextlib.ExitStack() as stack:
+        root = args.work_dir if args.work_dir else stack.enter_context(tempfile.TemporaryDirectory(prefix="harness_benchmark_"))
+        workspace = benchmark_workspace(root, args.latency_scale, args.volume_scale,
+            args.host_threads, args.host_memory)
+        workspace.create()
+        report = { "latency_scale" : args.latency_scale, "volume_scale" : args.volume_scale,
+            "host_threads" : args.host_threads, "python" : sys.version.split()[0], "cpus" : os.cpu_count() }
+        if "single" not in args.skip:
+            report["single"] = [ workspace.run_passoff(lab_num)
+                for lab_num in (args.labs if args.labs else workspace.lab_numbers()) ]
+        if "throughput" not in args.skip:
+            report["throughput"] = log_throughput(workspace, args.throughput_lines)
+        if "scaling" not in args.skip:
+            report["scaling"] = [ workspace.run_passoff(args.scaling_lab, jobs) for jobs in args.jobs ]
+        if "batch" not in args.skip:
+            report["batch"] = [ workspace.run_batch(args.scaling_lab, args.submissions, workers)
+                for workers in args.workers ]
+    report["metrics"] = summary_metrics(report)
+
+    if "single" in report:
+        print_runs("Single runs (one job)", report["single"], "jobs")
+    if "throughput" in report:
+        print("Log throughput (MB/s)")
+        for name, rate in report["throughput"].items():
+            print(str.format("  {:<22} {:>8.1f}", name, rate))
+        print()
+    if "scaling" in report:
+        print_runs(str.format("Scaling with jobs (lab {})", args.scaling_lab), report["scaling"], "jobs")
+    if "batch" in report:
+        print_runs(str.format("Batch grading of {} submissions (lab {})", args.submissions, args.scaling_lab),
+            report["batch"], "workers")
+
+    failures = check_thresholds(report["metrics"], thresholds, baseline, args.tolerance)
+    report["failures"] = failures
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=1)
+            fp.write("\n")
+    for name, value in report["metrics"].items():
+        print(str.format("{:<30} {}", name, value))
+    if failures:
+        print()
+        print("Regressions:")
+        for failure in failures:
+            print(" ", failure)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+
+'''
+Dependency tracking for incremental HDL analysis.
+
+Classes:
+  analysis_record: the files that have been analyzed into the xsim libraries of an
+    execution path and the key of each file when it was analyzed
+
+The key of a file is a hash of its contents, the contents of the files it includes
+(`include), the keys of the earlier files that define the packages it imports, and the
+analysis options. A file only needs to be analyzed again when its key changes or when
+one of the design units it defines has since been replaced by another file (i.e., a
+different version of 'regfile.sv' analyzed by another simulation).
+
+The record also holds the key of each elaborated snapshot (the keys of the analyzed files
+and the elaboration options) so that simulations that only differ in the values of
+parameters read from plusargs at run time can share a single snapshot.
+
+The record is kept inside 'xsim.dir' so that it is discarded with the libraries. It is
+shared by the simulations of the execution path (which may run concurrently): each change
+is made to the latest record while the record is locked.
+'''
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+
+import result_cache
+
+# Name of the record file (in the xsim.dir directory of the execution path)
+RECORD_FILENAME = "passoff_analysis.json"
+
+SV_COMMENT_RE = re.compile(r"//[^\n]*|/\*.*?\*/", re.DOTALL)
+SV_INCLUDE_RE = re.compile(r'`include\s+"([^"]+)"')
+SV_IMPORT_RE = re.compile(r"\bimport\s+(\w+)\s*::")
+SV_UNIT_RE = re.compile(r"^\s*(module|macromodule|package|interface|program|primitive)\s+(?:(?:automatic|static)\s+)?(\w+)",
+    re.MULTILINE)
+SV_PLUSARG_RE = re.compile(r'\$(?:value|test)\$plusargs\s*\(\s*"(\w+)')
+SV_MEMORY_PARAMETER_RE = re.compile(r'\b(\w+)\s*=\s*"([^"]+\.mem)"')
+SV_READMEM_RE = re.compile(r'\$readmem[hb]\s*\(\s*"([^"]+)"')
+VHDL_COMMENT_RE = re.compile(r"--[^\n]*")
+VHDL_USE_RE = re.compile(r"\buse\s+work\.(\w+)", re.IGNORECASE)
+VHDL_UNIT_RE = re.compile(r"^\s*(entity|package)\s+(\w+)\s+is\b", re.MULTILINE | re.IGNORECASE)
+
+def read_text(filepath):
+    try:
+        with open(filepath, errors="replace") as fp:
+            return fp.read()
+    except (FileNotFoundError, IsADirectoryError):
+        return ""
+
+def scan_hdl_file(filepath, vhdl=False):
+    ''' Returns the (includes, imported packages, design units) of an HDL file '''
+    if vhdl:
+        text = VHDL_COMMENT_RE.sub("", read_text(filepath))
+        units = [ m.group(2).lower() for m in VHDL_UNIT_RE.finditer(text) ]
+        return ([], [ m.group(1).lower() for m in VHDL_USE_RE.finditer(text) ], units)
+    text = SV_COMMENT_RE.sub("", read_text(filepath))
+    units = [ m.group(2) for m in SV_UNIT_RE.finditer(text) ]
+    return (SV_INCLUDE_RE.findall(text), SV_IMPORT_RE.findall(text), units)
+
+def plusarg_names(filepath):
+    ''' Returns the names of the plusargs read by an HDL file (i.e., "USE_MEMORY" for
+    $value$plusargs("USE_MEMORY=%d", use_memory)) '''
+    text = SV_COMMENT_RE.sub("", read_text(filepath))
+    return set(SV_PLUSARG_RE.findall(text))
+
+def memory_filenames(filepath):
+    ''' Returns the (parameter name, filename) of the memory files named in an HDL file: the
+    default values of the "*.mem" parameters (i.e., ("TEXT_MEMORY_FILENAME", "final_text.mem"))
+    and the files read by $readmemh/$readmemb (with a None parameter name) '''
+    text = SV_COMMENT_RE.sub("", read_text(filepath))
+    files = SV_MEMORY_PARAMETER_RE.findall(text)
+    files.extend([ (None, filename) for filename in SV_READMEM_RE.findall(text) ])
+    return files
+
+def resolve_include(include_name, including_filepath, search_paths):
+    ''' Find an included file in the directory of the including file or the search paths '''
+    for directory in [ os.path.dirname(including_filepath) ] + list(search_paths):
+        filepath = os.path.join(directory, include_name)
+        if os.path.isfile(filepath):
+            return os.path.normpath(filepath)
+    return None
+
+def include_hash(h, filepath, search_paths, visited):
+    ''' Add the contents of the files included by a file (recursively) to a hash '''
+    includes, _, _ = scan_hdl_file(filepath)
+    for include_name in includes:
+        include_filepath = resolve_include(include_name, filepath, search_paths)
+        h.update(str.format("include {}={}\n", include_name,
+            result_cache.file_hash(include_filepath) if include_filepath else None).encode())
+        if include_filepath and include_filepath not in visited:
+            visited.add(include_filepath)
+            include_hash(h, include_filepath, search_paths, visited)
+
+class analysis_record:
+    ''' The record of the files analyzed in the xsim libraries of an execution path '''
+
+    def __init__(self, execution_path):
+        self.execution_path = str(execution_path)
+        self.record_filepath = os.path.join(self.execution_path, "xsim.dir", RECORD_FILENAME)
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        self.files = {}
+        self.units = {}
+        self.snapshots = {}
+        try:
+            with open(self.record_filepath) as fp:
+                record = json.load(fp)
+            self.files = record["files"]
+            self.units = record["units"]
+            self.snapshots = record.get("snapshots", {})
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+
+    def file_keys(self, library, filenames, options, include_dirs, vhdl=False):
+        ''' Returns the key and design units of each file (relative to the execution path)
+        as a list of (filename, key, units) '''
+        search_paths = [ os.path.join(self.execution_path, d) for d in include_dirs ] + [ self.execution_path ]
+        package_keys = {}
+        file_keys = []
+        for filename in filenames:
+            filepath = os.path.normpath(os.path.join(self.execution_path, filename))
+            includes, imports, units = scan_hdl_file(filepath, vhdl)
+            h = hashlib.sha256()
+            h.update(str.format("{} {}\n", library, " ".join(str(o) for o in options)).encode())
+            h.update(result_cache.file_hash(filepath).encode() if os.path.isfile(filepath) else b"missing")
+            if not vhdl:
+                include_hash(h, filepath, search_paths, set([filepath]))
+            for package in imports:
+                h.update(str.format("import {}={}\n", package, package_keys.get(package)).encode())
+            key = h.hexdigest()
+            for unit in units:
+                package_keys[unit] = key
+            file_keys.append((filename, key, units))
+        return file_keys
+
+    def record_key(self, library, filename):
+        return library + ":" + os.path.normpath(filename)
+
+    def needs_analysis(self, library, filename, key, units):
+        ''' Returns True if the file has changed (or one of its units was replaced) since it was analyzed '''
+        record_key = self.record_key(library, filename)
+        if not os.path.isdir(os.path.join(self.execution_path, "xsim.dir", library)):
+            return True
+        with self.lock:
+            if self.files.get(record_key) != key:
+                return True
+            return any(self.units.get(library + ":" + unit) != record_key for unit in units)
+
+    def update(self, library, file_keys, analyzed):
+        ''' Record the result of analyzing the given files (removing them if the analysis failed) '''
+        with self.updating():
+            for filename, key, units in file_keys:
+                record_key = self.record_key(library, filename)
+                if analyzed:
+                    self.files[record_key] = key
+                    for unit in units:
+                        self.units[library + ":" + unit] = record_key
+                else:
+                    self.files.pop(record_key, None)
+
+    def elaboration_key(self, library_files, options):
+        ''' Returns the key of a snapshot elaborated from the given files (a list of (library,
+        filename)) with the given options or None if one of the files has not been analyzed '''
+        h = hashlib.sha256()
+        h.update(" ".join(str(o) for o in options).encode())
+        h.update(result_cache.tool_version("xelab").encode())
+        with self.lock:
+            for library, filename in library_files:
+                file_key = self.files.get(self.record_key(library, filename))
+                if file_key is None:
+                    return None
+                h.update(str.format("{}={}\n", self.record_key(library, filename), file_key).encode())
+        return h.hexdigest()
+
+    def snapshot_is_current(self, snapshot, key):
+        ''' Returns True if the snapshot was elaborated with the given key '''
+        if key is None:
+            return False
+        with self.lock:
+            return self.snapshots.get(snapshot) == key
+
+    def update_snapshot(self, snapshot, key):
+        ''' Record the key of an elaborated snapshot (None when the elaboration failed) '''
+        with self.updating():
+            if key is None:
+                self.snapshots.pop(snapshot, None)
+            else:
+                self.snapshots[snapshot] = key
+
+    @contextlib.contextmanager
+    def updating(self):
+        ''' Context manager for changing the record. The record is read again before the
+        change (keeping the changes of the other simulations) and saved after it while the
+        record file is locked. '''
+        with self.lock:
+            if not os.path.isdir(os.path.dirname(self.record_filepath)):
+                # Nothing has been analyzed yet
+                yield
+                return
+            fd = os.open(self.record_filepath + ".lock", os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                self.load()
+                yield
+                self.save()
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+
+    def save(self):
+        tmp_filepath = self.record_filepath + ".tmp"
+        with open(tmp_filepath, "w") as fp:
+            json.dump({ "files" : self.files, "units" : self.units, "snapshots" : self.snapshots }, fp, indent=1, sort_keys=True)
+        os.replace(tmp_filepath, self.record_filepath)
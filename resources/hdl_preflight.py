@@ -0,0 +1,353 @@
+#!/usr/bin/python3
+
+'''
+Preflight checks of the HDL files of a lab before any tool is run.
+
+Classes:
+  preflight_problem: a problem found by the checks and whether it is definite
+  hdl_file: the design units, ports, includes and module instances of an HDL file
+  hdl_design: the scanned HDL files of a lab (each file is scanned once) and the checks
+    of the files used by a test module
+
+Problems such as a missing module, a misnamed top module, or a testbench connecting a
+port that the student module does not declare are otherwise only found when xvlog,
+xelab or synth_design reports them, which may be minutes into a test. The files are
+scanned with a simple tokenizer (not a full parser) so the checks are conservative:
+only the module instances and ports that the scanner recognizes are checked and
+modules that may come from a vendor library (i.e., BUFG, RAMB36E1, xpm_*) are not
+reported as missing.
+Three problems are definite: a top module that no design file declares, an `include
+file that is not found, and a named port connection to a port that the scanned module
+does not declare. A test module with a definite problem fails without running its tools.
+The other problems (i.e., a missing instantiated module or an unbalanced file) are
+reported as warnings and the tools are still run: the tools decide whether the files are
+valid (i.e., with macros or `ifdef'd ports). The checks are skipped with --no_preflight.
+'''
+
+import difflib
+import os
+import re
+
+import hdl_analysis
+
+SV_EXTENSIONS = (".sv", ".v", ".svh", ".vh")
+VHDL_EXTENSIONS = (".vhd", ".vhdl")
+
+SV_STRING_RE = re.compile(r'"(?:\\.|[^"\\\n])*"')
+SV_TOKEN_RE = re.compile(r"[A-Za-z_][\w$]*|\$\w+|`\w+|\d[\w]*|'[sS]?[bBoOdDhH]?\w*|\.\*|\S")
+VHDL_TOKEN_RE = re.compile(r"[A-Za-z_]\w*|\d[\w.]*|\S")
+IDENTIFIER_RE = re.compile(r"[A-Za-z_][\w$]*$")
+
+# Keywords that cannot start a module instance
+SV_KEYWORDS = set("""
+    always always_comb always_ff always_latch and assert assign assume automatic begin bit break
+    buf byte case casex casez cover default defparam disable do else end endcase endfunction
+    endgenerate endmodule endtask enum final for force foreach forever fork function generate
+    genvar if import initial inout input int integer interface join localparam logic longint
+    module negedge nor not or output package parameter posedge priority real reg repeat return
+    shortint signed static struct supply0 supply1 task time timeprecision timeunit tri typedef
+    union unique unsigned var void wait while wire xor
+    """.split())
+# Keywords dropped from the start of a statement before looking for a module instance
+SV_STATEMENT_PREFIXES = set("begin end else generate endgenerate fork join endcase endfunction endtask".split())
+
+def balanced_end(tokens, start):
+    ''' Returns the index after the bracket that closes the bracket at tokens[start] (or None) '''
+    pairs = { "(" : ")", "[" : "]", "{" : "}" }
+    stack = []
+    for i in range(start, len(tokens)):
+        if tokens[i] in pairs:
+            stack.append(pairs[tokens[i]])
+        elif stack and tokens[i] == stack[-1]:
+            stack.pop()
+            if not stack:
+                return i + 1
+    return None
+
+def split_top_level(tokens, separator):
+    ''' Split a list of tokens at the separators that are not within brackets '''
+    segments = [ [] ]
+    depth = 0
+    for token in tokens:
+        if token in "([{":
+            depth += 1
+        elif token in ")]}":
+            depth -= 1
+        if token == separator and depth == 0:
+            segments.append([])
+        else:
+            segments[-1].append(token)
+    return [ s for s in segments if s ]
+
+def sv_port_name(segment):
+    ''' Returns the name declared by a port list segment (i.e., "input logic [3:0] a" is "a") '''
+    name = None
+    depth = 0
+    for token in segment:
+        if token == "=" and depth == 0:
+            break
+        if token in "([{":
+            depth += 1
+        elif token in ")]}":
+            depth -= 1
+        elif depth == 0 and IDENTIFIER_RE.match(token):
+            name = token
+    return name
+
+class preflight_problem:
+    ''' A problem found by the preflight checks. A definite problem fails the test module;
+    the other problems are warnings. '''
+
+    def __init__(self, message, definite=False):
+        self.message = message
+        self.definite = definite
+
+    def __str__(self):
+        return self.message
+
+class sv_instance:
+    ''' A module instance: the module name, the instance name and the connected ports '''
+
+    def __init__(self, module_name, instance_name, named_ports, positional_ports, wildcard):
+        self.module_name = module_name
+        self.instance_name = instance_name
+        self.named_ports = named_ports
+        self.positional_ports = positional_ports
+        self.wildcard = wildcard
+
+def sv_instance_from_statement(tokens):
+    ''' Returns the module instance of a statement (without the ';') or None '''
+    while tokens:
+        if tokens[0] in SV_STATEMENT_PREFIXES:
+            tokens = tokens[1:]
+        elif tokens[0] == ":" and len(tokens) > 1:
+            tokens = tokens[2:]
+        elif len(tokens) > 2 and tokens[1] == ":" and IDENTIFIER_RE.match(tokens[0]):
+            tokens = tokens[2:]
+        else:
+            break
+    if len(tokens) < 4 or not IDENTIFIER_RE.match(tokens[0]) or tokens[0] in SV_KEYWORDS:
+        return None
+    i = 1
+    if tokens[i] == "#":
+        if i + 1 >= len(tokens) or tokens[i + 1] != "(":
+            return None
+        i = balanced_end(tokens, i + 1)
+        if i is None or i >= len(tokens):
+            return None
+    if not IDENTIFIER_RE.match(tokens[i]) or tokens[i] in SV_KEYWORDS:
+        return None
+    instance_name = tokens[i]
+    i += 1
+    if i < len(tokens) and tokens[i] == "[":
+        i = balanced_end(tokens, i)
+        if i is None or i >= len(tokens):
+            return None
+    if tokens[i] != "(" or balanced_end(tokens, i) != len(tokens):
+        return None
+    connections = tokens[i + 1:-1]
+    named_ports = []
+    wildcard = False
+    depth = 0
+    for j, token in enumerate(connections):
+        if token in "([{":
+            depth += 1
+        elif token in ")]}":
+            depth -= 1
+        elif depth == 0 and token == ".*":
+            wildcard = True
+        elif depth == 0 and token == "." and j + 1 < len(connections):
+            named_ports.append(connections[j + 1])
+    positional_ports = 0
+    if not named_ports and not wildcard:
+        positional_ports = len(split_top_level(connections, ","))
+    return sv_instance(tokens[0], instance_name, named_ports, positional_ports, wildcard)
+
+class hdl_file:
+    ''' The scanned contents of an HDL file '''
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.vhdl = filepath.lower().endswith(VHDL_EXTENSIONS)
+        # Module (entity) name to the list of port names (None if the ports are not known)
+        self.modules = {}
+        self.instances = []
+        self.includes = []
+        # Problems with the structure of the file
+        self.problems = []
+        text = hdl_analysis.read_text(filepath)
+        if self.vhdl:
+            self.scan_vhdl(text)
+        else:
+            self.scan_sv(text)
+
+    def scan_sv(self, text):
+        self.includes, _, _ = hdl_analysis.scan_hdl_file(self.filepath)
+        if re.search(r"/\*", hdl_analysis.SV_COMMENT_RE.sub("", text)):
+            self.problems.append("unterminated block comment (/*)")
+        text = SV_STRING_RE.sub('""', hdl_analysis.SV_COMMENT_RE.sub(" ", text))
+        # Compiler directives are not part of the design units
+        text = re.sub(r"^\s*`(?:include|define|ifdef|ifndef|else|elsif|endif|timescale|default_nettype|undef)\b[^\n]*",
+            "", text, flags=re.MULTILINE)
+        tokens = SV_TOKEN_RE.findall(text)
+        # Modules may be declared within other modules: the tokens of each module exclude
+        # the tokens of the modules nested within it
+        stack = []
+        for token in tokens:
+            if token in ("module", "macromodule"):
+                stack.append([])
+            elif token == "endmodule":
+                if not stack:
+                    self.problems.append("endmodule without a matching module")
+                    continue
+                self.scan_sv_module(stack.pop())
+            elif stack:
+                stack[-1].append(token)
+        for module_tokens in stack:
+            self.problems.append(str.format("module '{}' has no matching endmodule",
+                module_tokens[0] if module_tokens else "?"))
+
+    def scan_sv_module(self, tokens):
+        ''' Scan the tokens between 'module' and 'endmodule' '''
+        i = 0
+        while i < len(tokens) and tokens[i] in ("automatic", "static"):
+            i += 1
+        if i >= len(tokens) or not IDENTIFIER_RE.match(tokens[i]):
+            return
+        name = tokens[i]
+        i += 1
+        # Package imports in the header
+        while i < len(tokens) and tokens[i] == "import":
+            while i < len(tokens) and tokens[i] != ";":
+                i += 1
+            i += 1
+        if i < len(tokens) and tokens[i] == "#" and i + 1 < len(tokens) and tokens[i + 1] == "(":
+            i = balanced_end(tokens, i + 1) or len(tokens)
+        ports = []
+        if i < len(tokens) and tokens[i] == "(":
+            end = balanced_end(tokens, i)
+            if end is None:
+                self.problems.append(str.format("unbalanced parentheses in the port list of module '{}'", name))
+                self.modules[name] = None
+                return
+            ports = [ sv_port_name(segment) for segment in split_top_level(tokens[i + 1:end - 1], ",") ]
+            i = end
+        if any(p is None for p in ports) or any(t.startswith("`") for t in tokens[:i]):
+            # Ports declared with macros or other constructs that are not scanned
+            self.modules[name] = None
+        else:
+            self.modules[name] = ports
+        for statement in split_top_level(tokens[i:], ";"):
+            instance = sv_instance_from_statement(statement)
+            if instance:
+                self.instances.append(instance)
+
+    def scan_vhdl(self, text):
+        text = hdl_analysis.VHDL_COMMENT_RE.sub(" ", text)
+        tokens = [ t.lower() for t in VHDL_TOKEN_RE.findall(text) ]
+        for i in range(len(tokens) - 2):
+            if tokens[i] != "entity" or tokens[i + 2] != "is":
+                continue
+            name = tokens[i + 1]
+            ports = []
+            j = i + 3
+            while j < len(tokens) and tokens[j] not in ("end", "begin"):
+                if tokens[j] == "port" and j + 1 < len(tokens) and tokens[j + 1] == "(":
+                    end = balanced_end(tokens, j + 1)
+                    if end is None:
+                        break
+                    for segment in split_top_level(tokens[j + 2:end - 1], ";"):
+                        if ":" in segment:
+                            ports.extend(t for t in segment[:segment.index(":")] if t != ",")
+                    j = end
+                else:
+                    j += 1
+            self.modules[name] = ports
+
+def is_hdl_file(filename):
+    return str(filename).lower().endswith(SV_EXTENSIONS + VHDL_EXTENSIONS)
+
+def is_vendor_module(module_name):
+    ''' Returns True if the module may come from a vendor library (unisim primitives are
+    named in upper case, i.e., BUFG, and the Xilinx parameterized macros start with xpm_) '''
+    return module_name.upper() == module_name or module_name.startswith("xpm_")
+
+class hdl_design:
+    ''' The HDL files of a lab (relative to the execution path) '''
+
+    def __init__(self, execution_path):
+        self.execution_path = str(execution_path)
+        self.files = {}
+
+    def scan(self, filename):
+        ''' Returns the scanned file (relative to the execution path) '''
+        filepath = os.path.normpath(os.path.join(self.execution_path, str(filename)))
+        if filepath not in self.files:
+            self.files[filepath] = hdl_file(filepath)
+        return self.files[filepath]
+
+    def check_files(self, filenames):
+        ''' Returns the structural problems of the HDL files (warnings) as a list of preflight_problem '''
+        problems = []
+        for filename in filenames:
+            if not is_hdl_file(filename) or not os.path.isfile(os.path.join(self.execution_path, str(filename))):
+                continue
+            for problem in self.scan(filename).problems:
+                problems.append(preflight_problem(str.format("{}: {}", os.path.basename(str(filename)), problem)))
+        return problems
+
+    def check_design(self, top_name, filenames, include_dirs=[]):
+        ''' Returns the problems (preflight_problem) found in the files of a design with the given
+        top module (the filenames and include directories are relative to the execution path) '''
+        problems = []
+        scanned = [ (os.path.basename(str(f)), self.scan(f)) for f in filenames
+            if os.path.isfile(os.path.join(self.execution_path, str(f))) ]
+        # Definitions of the modules (SystemVerilog names are case sensitive, VHDL names are not)
+        definitions = {}
+        for basename, scanned_file in scanned:
+            for name, ports in scanned_file.modules.items():
+                definitions[name] = (basename, ports, scanned_file.vhdl)
+        def find_definition(module_name):
+            if module_name in definitions:
+                return definitions[module_name]
+            definition = definitions.get(module_name.lower())
+            if definition and definition[2]:
+                return definition
+            return None
+        if top_name and find_definition(top_name) is None:
+            message = str.format("top module '{}' is not declared in any of the design files", top_name)
+            close_names = difflib.get_close_matches(top_name, list(definitions), n=3)
+            if close_names:
+                message += str.format(" (declared modules with similar names: {})", ", ".join(close_names))
+            problems.append(preflight_problem(message, definite=True))
+        search_paths = [ os.path.join(self.execution_path, str(d)) for d in include_dirs ] + [ self.execution_path ]
+        for basename, scanned_file in scanned:
+            for include_name in scanned_file.includes:
+                if hdl_analysis.resolve_include(include_name, scanned_file.filepath, search_paths) is None:
+                    problems.append(preflight_problem(str.format(
+                        "{}: included file '{}' not found in the include directories ({})",
+                        basename, include_name, ", ".join(str(d) for d in include_dirs) or "none"), definite=True))
+            for instance in scanned_file.instances:
+                definition = find_definition(instance.module_name)
+                if definition is None:
+                    if not is_vendor_module(instance.module_name):
+                        problems.append(preflight_problem(str.format(
+                            "{}: module '{}' (instance '{}') is not declared in any of the design files",
+                            basename, instance.module_name, instance.instance_name)))
+                    continue
+                def_basename, ports, vhdl = definition
+                if ports is None:
+                    continue
+                declared = set(p.lower() for p in ports) if vhdl else set(ports)
+                for port in instance.named_ports:
+                    if (port.lower() if vhdl else port) not in declared:
+                        problems.append(preflight_problem(str.format(
+                            "{}: instance '{}' connects port '{}' that is not declared by module '{}' in {} (ports: {})",
+                            basename, instance.instance_name, port, instance.module_name, def_basename, ", ".join(ports)),
+                            definite=True))
+                if instance.positional_ports > len(ports):
+                    problems.append(preflight_problem(str.format(
+                        "{}: instance '{}' connects {} ports but module '{}' in {} declares {}",
+                        basename, instance.instance_name, instance.positional_ports, instance.module_name,
+                        def_basename, len(ports))))
+        return problems
@@ -21,8 +21,41 @@ import shutil
 import subprocess
 import sys
 import re
+# Futures of the tool runs
+import concurrent.futures
 # For os.remove
 import os
+# Serializes updates to shared state when test modules run concurrently
+import threading
+
+# Scheduler for running the test modules
+import test_scheduler
+# Admission control for tool processes
+import resource_pool
+# Engine for running the tool processes
+import process_runner
+# Long-lived Vivado sessions
+import vivado_session
+# Cache of test module results
+import result_cache
+# Precompiled simulation library of the shared HDL files
+import xsim_library
+# Private work directories for the test modules
+import sandbox
+# Reference checkpoints for incremental bitstream builds
+import build_reference
+# Checks of the HDL files before the tools are run
+import hdl_preflight
+# Compressed log files
+import compressed_log
+# Copies the tool output to the terminal
+import terminal_output
+# Machine readable results of the test modules
+import test_results
+# Record and replay of the tool runs
+import tool_replay
+# Status of the local repository (--check_repo)
+import git_status
 
 
 # TODO Reused from pygrader
@@ -39,6 +72,8 @@ class TermColor:
     UNDERLINE = "\033[4m"
 
 SCRIPT_VERSION = 1.0
+# Directory (in the execution directory) of the work directories of the test modules (--sandbox)
+SANDBOX_DIR_NAME = ".passoff_sandbox"
 
 class lab_test:
     ''' An instance of this class represents a specific test for a lab passoff.
@@ -56,7 +91,9 @@ class lab_test:
 
         lab_num - the integer lab number
         script_path - the Path of the lab-specific script (not the path of this class)
-        tests_to_perform - a list of "tester_module" objects that represet a specific test to perform
+        tests_to_perform - a list of "tester_module" objects that represet a specific test to perform.
+            The tests are run by a "test_scheduler" that orders them by the files they consume
+            and produce (independent tests run concurrently when the --jobs option is given).
         submission_top_path - represents the top directory where the repository files exist.
             This is specified as "cwd" for local or "extract_dir" from the arguments
         submission_lab_path - represents the directory where the lab-specific files exist
@@ -89,6 +126,7 @@ class lab_test:
         self.TEST_RESULT_FILENAME = str.format("lab{}_test_result.txt",self.lab_num)
         self.LAB_TAG_STRING = str.format("lab{}_submission",self.lab_num)
         self.TEST_RESULT_FILENAME = str.format("lab{}_test_result.txt",self.lab_num)
+        self.TEST_RESULT_JSON_FILENAME = str.format("lab{}_test_result.json",self.lab_num)
         self.NEW_PROJECT_SETTINGS_FILENAME = "../resources/new_project_settings.tcl"
         # The filename of the commit string relative to the current lab
         self.COMMIT_STRING_FILENAME = ".commitdate"		# Initialize variables
@@ -97,6 +135,27 @@ class lab_test:
         self.log = None
         self.tests_to_perform = []
         self.stepnum=1
+        # Lock for the counters and log file shared by concurrently running test modules
+        self.lock = threading.RLock()
+        # Pool of host resources needed to start a tool process (created on first use)
+        self.resource_pool = None
+        # Cache of test module results (--cache, created on first use)
+        self.result_cache = None
+        # Precompiled simulation libraries by their set of files (created on first use)
+        self.xsim_libraries = {}
+        # Scanned HDL files of the lab and the problems found in the files of each test module
+        self.hdl_design = None
+        self.preflight_problems = {}
+        # Runs the tool processes (and copies their output to the log files and terminal)
+        self.process_runner = process_runner.process_runner()
+        # Vivado tcl sessions reused by the test modules (--vivado_server)
+        self.vivado_sessions = vivado_session.vivado_session_pool()
+        # Per-thread state of the test module that is running in the thread
+        self.thread_state = threading.local()
+        # Status, timing and tool runs of each test module (written as JSON at the end of the run)
+        self.results = test_results.run_results(self.LAB_DIR_NAME)
+        # Recorded tool runs (--record_dir or --replay_dir)
+        self.tool_recorder = None
 
         # Final messages to print at end of passoff script
         self.final_messages = []
@@ -110,10 +169,24 @@ class lab_test:
 
         # Parse the arguments
         self.args = self.parser.parse_args()
+        if self.args.record_dir or self.args.replay_dir:
+            self.tool_recorder = tool_replay.tool_recorder(self.args.record_dir or self.args.replay_dir,
+                replaying=self.args.replay_dir is not None)
+            # The tool runs may only depend on the files of the submission (see tool_replay)
+            for option in ("xsim_lib", "incremental_build", "vivado_server"):
+                if getattr(self.args, option):
+                    print(str.format("Tool runs are recorded and replayed without shared state: ignoring --{}", option))
+                    setattr(self.args, option, False)
+            if self.args.record_dir and self.args.jobs > 1:
+                print("Tool runs are recorded one at a time: ignoring --jobs", self.args.jobs)
+                self.args.jobs = 1
 
     def print_step_message(self,msg_str):
-        self.print_color(TermColor.YELLOW, f"Step {self.stepnum}: {msg_str}")
-        self.stepnum += 1
+        with self.lock:
+            self.print_color(TermColor.YELLOW, f"Step {self.stepnum}: {msg_str}")
+            # Remember the step of the test module running in this thread (used to prefix its output)
+            self.thread_state.step = self.stepnum
+            self.stepnum += 1
 
     def print_message_with_header(self, msg_str, header_char='#', color = TermColor.YELLOW):
         ''' Prints a message with a header and footer based on the message length.  '''
@@ -142,25 +215,73 @@ class lab_test:
         self.print_step_message("Checking repository and submission files")
         if not self.prepare_remote_repo():
             return False
-        return self.check_lab_fileset()
+        if not self.check_lab_fileset():
+            return False
+        return self.check_hdl_files()
+
+    def check_hdl_files(self):
+        ''' Scan the HDL files of the lab for structural problems (unmatched module/endmodule,
+            unterminated comments) before any tool is run. The problems are reported as warnings:
+            the scanner is not a full parser so the tools decide whether the files are valid. '''
+        if self.args.no_preflight:
+            return True
+        self.hdl_design = hdl_preflight.hdl_design(self.execution_path)
+        all_files = self.submission_dict.copy()
+        all_files.update(self.testfiles_dict)
+        problems = self.hdl_design.check_files(self.get_filenames_from_keylist(all_files.keys()))
+        for problem in problems:
+            self.print_warning(problem)
+        return True
+
+    def preflight_test_modules(self):
+        ''' Check the files of each registered test module against what the module expects (top
+            module, included files, ports of the module instances). A module with a definite problem
+            (see hdl_preflight) fails without running its tools; the other problems are reported as
+            warnings when the module runs. '''
+        if self.args.no_preflight or not self.proceed_with_tests:
+            return
+        if self.hdl_design is None:
+            self.hdl_design = hdl_preflight.hdl_design(self.execution_path)
+        for test_module in self.tests_to_perform:
+            problems = test_module.preflight(self, self.hdl_design)
+            if problems:
+                self.preflight_problems[id(test_module)] = problems
+                self.print_warning(str.format("Preflight check of {} found {} problem(s)",
+                    test_module.module_name(), len(problems)))
 
     def add_test_module(self, test_module):
-        ''' Add a test module. '''
+        ''' Add a test module. Modules with the same log name (i.e., two simulations of the same
+        top module) are given different log names so that they do not write the same files. '''
+        log_name = getattr(test_module, "log_name", None)
+        if log_name is not None:
+            used_names = set(getattr(test, "log_name", None) for test in self.tests_to_perform)
+            count = 1
+            while test_module.log_name in used_names:
+                count += 1
+                test_module.log_name = str.format("{}_{}", log_name, count)
         self.tests_to_perform.append(test_module)
 
     def run_tests(self):
-        ''' Run all the registered tests '''
-        if not self.args.notest:
+        ''' Run all the registered tests. Tests are ordered by the files that they consume
+        and produce and tests that depend on a failed test are not run. '''
+        if not self.args.notest and not self.proceed_with_tests:
+            # The repository could not be prepared (i.e., failed clone): there are no files
+            # to schedule the tests with
             for test in self.tests_to_perform:
-                self.print_step_message(test.module_name())
-                self.execute_test_module(test)
+                print("Skipping test",test.module_name(),"due to previous errors")
+        elif not self.args.notest:
+            self.preflight_test_modules()
+            scheduler = test_scheduler.test_scheduler(self, self.tests_to_perform, sandboxed=self.args.sandbox)
+            scheduler.run(max_workers=self.args.jobs)
         # Wrap up
         self.print_message_summary()
+        self.write_results()
         self.clean_up_test()
 
     def print_color(self,color, *msg):
         """ Print a message in color """
-        print(color + " ".join(str(item) for item in msg), TermColor.END)
+        with self.lock:
+            print(color + " ".join(str(item) for item in msg), TermColor.END)
 
     def print_info(self,*msg):
         """ Print an error message and exit program """
@@ -168,13 +289,15 @@ class lab_test:
 
     def print_error(self,*msg):
         """ Print an error message and exit program """
-        self.print_color(TermColor.RED, "ERROR:", " ".join(str(item) for item in msg))
-        self.errors += 1
+        with self.lock:
+            self.print_color(TermColor.RED, "ERROR:", " ".join(str(item) for item in msg))
+            self.errors += 1
 
     def print_warning(self,*msg):
         """ Print an error message and exit program """
-        self.print_color(TermColor.YELLOW, "WARNING:", " ".join(str(item) for item in msg))
-        self.warnings += 1
+        with self.lock:
+            self.print_color(TermColor.YELLOW, "WARNING:", " ".join(str(item) for item in msg))
+            self.warnings += 1
 
     def print_message_summary(self):
         ''' Prints final message after the completion of the runs. ''' 
@@ -191,7 +314,11 @@ class lab_test:
             # the github action. We need to update the local repository with the new tag
             # (updated by the actions) and checkout the modified tag.
             #   Update the local tags and "force" to update the local lab submission tag
-            cmd = ["git", "fetch", "--tags", "--force"]
+            cmd = ["git", "fetch", "--force", "origin",
+                str.format("+refs/tags/{0}:refs/tags/{0}", self.LAB_TAG_STRING)]
+            if not self.args.local and self.args.shallow_clone:
+                # Only fetch the commit of the tag in the shallow clone
+                cmd.insert(3, "--depth=1")
             p = subprocess.run(cmd, cwd=self.submission_top_path, 
                 stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
             #   Checkout the new tag (which should have the commit string)
@@ -212,37 +339,212 @@ class lab_test:
         self.print_message_with_header("End of Passoff Script")
 
 
-    def subprocess_file_print(self,process_output_filepath, proc_cmd, proc_cwd):
+    def prompt_yes_no(self, question):
+        ''' Asks the user a yes/no question and returns True if the answer is yes. When the
+        --non_interactive option is given the question is answered with the given policy
+        rather than waiting for input. '''
+        if self.args.non_interactive:
+            answer = self.args.non_interactive
+            print(question, str.format("(non-interactive: answering '{}')", answer))
+            return answer == 'y'
+        result = input(question + " (y/n):")
+        return result.lower() == 'y'
+
+    def subprocess_file_print(self,process_output_filepath, proc_cmd, proc_cwd, monitor=None):
         """ 
-        Complete a sub-process and print to a file and stdout.
+        Complete a sub-process and print to a file and stdout. The output shown on stdout
+        depends on the output mode of the test module (see output_mode).
 
         Returns the sub-process return code.
+        """
+        return self.subprocess_file_submit(process_output_filepath, proc_cmd, proc_cwd, monitor).result()
 
-        TODO:Provide more options on output: 1. to stdout and file, 2. To one or the other, or 3. None
+    def subprocess_file_submit(self,process_output_filepath, proc_cmd, proc_cwd, monitor=None):
         """
-        with open(process_output_filepath, "w") as fp:
-            # Print command to file
-            fp.write("Executing the following command in directory:"+str(proc_cwd)+"\n\t")
-            for cmd in proc_cmd:
-                fp.write(str(cmd)+" ")
-            fp.write("\n")
-            # Execute command		
-            proc = subprocess.Popen(
-                proc_cmd,
-                cwd=proc_cwd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-            )
-            for line in proc.stdout:
-                sys.stdout.write(line)
-                fp.write(line)
-                fp.flush()
-            # Wait until process is done
-            proc.communicate()
-            #print("Proc return code",proc.returncode)
-            return proc.returncode
-        return 0
+        Start a sub-process that prints to a file and stdout without waiting for it to complete.
+        The sub-process is started once the resources it needs are available.
+
+        Returns a concurrent.futures.Future for the sub-process return code. Call 'result()' to
+        wait for the sub-process or use 'asyncio.wrap_future' to await it from a coroutine.
+        The output of the sub-process is passed to the monitor (log_monitor.line_monitor) if given.
+        The tool run is recorded or replayed when --record_dir or --replay_dir is given.
+        """
+        tool_run = self.start_tool_run(proc_cmd, process_output_filepath)
+        recording = None
+        if self.tool_recorder is not None:
+            invocation = self.tool_invocation(proc_cmd, proc_cwd)
+            if self.tool_recorder.replaying:
+                return self.replay_tool_run(invocation, process_output_filepath, proc_cmd, proc_cwd, monitor, tool_run)
+            recording = self.tool_recorder.start(invocation, proc_cwd, process_output_filepath)
+        pool = self.get_resource_pool()
+        memory_mb, threads = resource_pool.tool_resources(proc_cmd)
+        def acquire():
+            token = pool.acquire(memory_mb, threads)
+            # The time waiting for the resources is not part of the duration of the tool run
+            if tool_run is not None:
+                tool_run.started()
+            return token
+        future = self.process_runner.submit(proc_cmd, proc_cwd, process_output_filepath,
+            prefix=self.output_prefix(), before=acquire, after=pool.release,
+            budget=getattr(self.thread_state, "budget", None), monitor=monitor,
+            compress=self.args.compress_logs, output_mode=self.output_mode(),
+            capture=recording.output if recording is not None else None)
+        if recording is not None:
+            future = self.record_tool_run(future, recording)
+        if tool_run is not None:
+            future.add_done_callback(lambda f: tool_run.finish(
+                f.result() if not f.cancelled() and f.exception() is None else None, monitor))
+        return future
+
+    def tool_invocation(self, proc_cmd, proc_cwd):
+        ''' Returns the identity of a tool run for the recorder (see tool_replay). The earlier
+        tool runs of the test module running in this thread are part of the identity. '''
+        previous = getattr(self.thread_state, "tool_keys", None)
+        invocation = self.tool_recorder.invocation(proc_cmd, proc_cwd, self.execution_path,
+            self.submission_top_path, previous or [])
+        if previous is not None:
+            previous.append(invocation.key)
+        return invocation
+
+    def record_tool_run(self, future, recording):
+        ''' Returns a future that completes once the tool run of the given future is recorded '''
+        recorded = concurrent.futures.Future()
+        def finish(f):
+            if f.cancelled():
+                recording.discard()
+                recorded.cancel()
+                return
+            if f.exception() is not None:
+                recording.discard()
+                recorded.set_exception(f.exception())
+                return
+            try:
+                recording.finish(f.result())
+            except OSError as e:
+                self.print_warning("Cannot record the tool run:", e)
+            recorded.set_result(f.result())
+        future.add_done_callback(finish)
+        return recorded
+
+    def replay_tool_run(self, invocation, process_output_filepath, proc_cmd, proc_cwd, monitor, tool_run):
+        ''' Replay the recording of a tool run (the tool is not run). Returns a completed future
+        for the return code of the recorded run (1 if the run was not recorded). '''
+        entry = self.tool_recorder.lookup(invocation)
+        if entry is None:
+            reason = self.tool_recorder.mismatch(invocation) or "command not recorded"
+            self.print_error(str.format("No recorded run of {} ({})", invocation.tool, reason))
+            output_filepath = None
+            return_code = 1
+        else:
+            self.tool_recorder.restore_files(entry, proc_cwd)
+            output_filepath = self.tool_recorder.output_filepath(entry)
+            return_code = entry["return_code"]
+        if tool_run is not None:
+            tool_run.replayed = True
+        future = self.process_runner.replay(proc_cmd, proc_cwd, process_output_filepath,
+            output_filepath if output_filepath is not None else os.devnull, return_code,
+            prefix=self.output_prefix(), monitor=monitor, compress=self.args.compress_logs,
+            output_mode=self.output_mode())
+        if tool_run is not None:
+            tool_run.finish(future.result(), monitor)
+        return future
+
+    def start_tool_run(self, proc_cmd, process_output_filepath):
+        ''' Record a tool run in the result of the test module running in this thread (returns
+        None if no test module is running) '''
+        result = getattr(self.thread_state, "result", None)
+        if result is None:
+            return None
+        tool_run = test_results.tool_run(proc_cmd, process_output_filepath, self.execution_path)
+        result.add_tool_run(tool_run)
+        return tool_run
+
+    def vivado_script_print(self, process_output_filepath, tcl_filename, proc_cwd, tclargs=[], monitor=None):
+        '''
+        Run a Vivado tcl script and print the output to a file and stdout. The script runs in
+        a long-lived Vivado tcl session when the --vivado_server option is given and in a new
+        'vivado -mode batch' process otherwise. The output is passed to the monitor if given.
+
+        Returns 0 if the script completed without error.
+        '''
+        if not self.args.vivado_server:
+            vivado_cmd = ["vivado", "-nolog", "-mode", "batch", "-nojournal", "-source", str(tcl_filename)]
+            if len(tclargs) > 0:
+                vivado_cmd.append("-tclargs")
+                vivado_cmd.extend(tclargs)
+            return self.subprocess_file_print(process_output_filepath, vivado_cmd, proc_cwd, monitor)
+        tool_run = self.start_tool_run(["vivado", "-source", str(tcl_filename)] + list(tclargs), process_output_filepath)
+        with self.get_resource_pool().reserve(["vivado"]):
+            return_code = self.vivado_sessions.run_script(process_output_filepath, tcl_filename, proc_cwd,
+                tclargs, prefix=self.output_prefix(), budget=getattr(self.thread_state, "budget", None),
+                monitor=monitor, compress=self.args.compress_logs, output_mode=self.output_mode())
+        if tool_run is not None:
+            tool_run.finish(return_code, monitor)
+        return return_code
+
+    def expire_budget(self, reason):
+        ''' Record that the test module running in this thread ran out of time '''
+        budget = getattr(self.thread_state, "budget", None)
+        if budget is not None:
+            budget.expire(reason)
+
+    def output_mode(self):
+        ''' Returns the output mode (see terminal_output) of the test module running in this thread '''
+        return getattr(self.thread_state, "output_mode", None) or self.args.output_mode
+
+    def output_prefix(self):
+        ''' Returns the prefix for the tool output of the test module running in this thread.
+        The step number is used as a prefix when test modules run concurrently. '''
+        step = getattr(self.thread_state, "step", None)
+        if self.args.jobs > 1 and step is not None:
+            return str.format("[Step {}] ", step)
+        return ""
+
+    def get_resource_pool(self):
+        ''' Returns the pool of host resources used to admit tool processes. The capacity
+        of the pool is set with the --max_memory and --max_threads options. '''
+        with self.lock:
+            if self.resource_pool is None:
+                self.resource_pool = resource_pool.resource_pool(self.args.max_memory,
+                    self.args.max_threads, self.args.resource_dir)
+            return self.resource_pool
+
+    def get_result_cache(self):
+        ''' Returns the cache of test module results or None if caching is not enabled (--cache) '''
+        if not self.args.cache:
+            return None
+        with self.lock:
+            if self.result_cache is None:
+                self.result_cache = result_cache.result_cache(
+                    os.path.expanduser(self.args.cache_dir), self.args.cache_size)
+            return self.result_cache
+
+    def get_xsim_library(self, sv_filenames, vhdl_filenames):
+        ''' Returns the precompiled simulation library of the given shared HDL files (relative to
+        the execution path), building it if needed. Returns None if the library is not used
+        (no --xsim_lib) or could not be built. '''
+        if not self.args.xsim_lib or (len(sv_filenames) == 0 and len(vhdl_filenames) == 0):
+            return None
+        sv_filepaths = [ os.path.realpath(self.execution_path / f) for f in sv_filenames ]
+        vhdl_filepaths = [ os.path.realpath(self.execution_path / f) for f in vhdl_filenames ]
+        key = (tuple(sv_filepaths), tuple(vhdl_filepaths))
+        with self.lock:
+            if key not in self.xsim_libraries:
+                self.xsim_libraries[key] = xsim_library.xsim_library(
+                    os.path.expanduser(self.args.xsim_lib_dir), sv_filepaths, vhdl_filepaths,
+                    os.path.realpath(self.submission_top_path / "resources"))
+            library = self.xsim_libraries[key]
+        if not library.build(self):
+            return None
+        return library
+
+    def get_build_reference(self, design_name):
+        ''' Returns the reference checkpoints used for incremental builds of a design or None if
+        incremental builds are not enabled (--incremental_build) '''
+        if not self.args.incremental_build:
+            return None
+        return build_reference.build_reference(os.path.expanduser(self.args.build_reference_dir),
+            self.LAB_DIR_NAME, design_name)
 
     def check_executable_existence(self, command_list):
         # See if the executable is even in the path
@@ -252,6 +554,9 @@ class lab_test:
             select something that will just return immediately (like -version)
             so that nothing consuming much time will occur.
         '''
+        if self.tool_recorder is not None and self.tool_recorder.replaying:
+            # The tools are not run when the tool runs are replayed
+            return True
         try:
             proc = subprocess.run(command_list)
         except OSError:
@@ -274,6 +579,14 @@ class lab_test:
             current_repo = p.stdout.strip()
         return current_repo
 
+    def is_local_submission_repo(self, origin_url):
+        ''' Returns True if the origin of the submission is the local repository given
+        with the --git_repo option (a path rather than a URL) '''
+        if not self.args.git_repo or not os.path.isdir(os.path.expanduser(self.args.git_repo)):
+            return False
+        return os.path.realpath(os.path.expanduser(origin_url)) == \
+            os.path.realpath(os.path.expanduser(self.args.git_repo))
+
     def get_tag_commit_date(self):
         '''
         Reads the ".commit" file to find commit date and returns as a string.
@@ -313,8 +626,7 @@ class lab_test:
             print("Overwriting the tag will change the submissiom time.")
             print("(You can avoid this check by using the '--new_tag' command line option)")
             print()
-            result = input("Do you want to overwrite the tag and submission time? (y/n):")
-            if result.lower() != 'y':
+            if not self.prompt_yes_no("Do you want to overwrite the tag and submission time?"):
                 # Don't tag the repository
                 return 
 
@@ -358,6 +670,15 @@ class lab_test:
             # Perform a local repo check if necessary
             if self.args.check_repo:
                 self.check_repo_file_status()
+        elif self.args.submission_dir:
+            # A submission that was already checked out (i.e., by roster_harvest.py)
+            self.submission_top_path = pathlib.Path(self.args.submission_dir).absolute()
+            self.submission_lab_path = self.submission_top_path / self.LAB_DIR_NAME
+            if not self.submission_lab_path.is_dir():
+                self.print_error("Submission directory", self.submission_lab_path, "does not exist")
+                self.proceed_with_tests = False
+                return False
+            print("Running passoff from the submission at", self.submission_top_path)
         else:
             # A remote passoff
             self.submission_top_path = self.script_path / self.args.extract_dir
@@ -391,8 +712,7 @@ class lab_test:
                     print("Target passoff test directory",self.submission_top_path,"exists. ")
                     print(" (Use --force option to avoid this check and overwrite existing directories)")
                     print()
-                    result = input("Do you want to delete the existing directory to complete the passoff script? (y/n):")
-                    if result.lower() != 'y':
+                    if not self.prompt_yes_no("Do you want to delete the existing directory to complete the passoff script?"):
                         self.proceed_with_tests = False
                         return False
                     shutil.rmtree(self.submission_top_path, ignore_errors=True)
@@ -419,6 +739,11 @@ class lab_test:
 
         # Determine incoming URL of repository
         actual_origin_url = self.get_repo_origin_url(self.submission_top_path)
+        if actual_origin_url is None and self.args.submission_dir:
+            # An export of the files of a submission (without a repository)
+            actual_origin_url = self.args.git_repo
+        if actual_origin_url is None:
+            actual_origin_url = ""
 
         # git@github.com:byu-ecen323-classroom/323-labs-wirthlin.git
         #URL_MATCH_STRING = "git@github.com:byu-ecen323-classroom/323-labs-(\w+).git"
@@ -433,7 +758,10 @@ class lab_test:
         CLASS_REPO = "byu-ecen323-winter2024"
         URL_MATCH_STRING = f"(.*){CLASS_REPO}/323-labs-(\w+)"
         match = re.match(URL_MATCH_STRING, actual_origin_url)
-        if not match:
+        if not match and self.is_local_submission_repo(actual_origin_url):
+            # A repository given by its path (i.e., in a batch_passoff.py roster)
+            print("Local repository", actual_origin_url, f"(not checked against the {CLASS_REPO} repositories)")
+        elif not match:
             self.print_error(f"Cloned repository is not part of the {CLASS_REPO} repository:",actual_origin_url)
             self.proceed_with_tests = False
             return False
@@ -489,7 +817,11 @@ class lab_test:
 
     def clone_repo(self, git_path, student_repo_path, lab_tag):
         '''
-        Clone student repository to local directory
+        Clone student repository to local directory. With the --shallow_clone option (used by
+        batch_passoff.py), only the commit of the tag is fetched (depth 1), the file contents
+        are fetched on demand (blob filter) and only the files of the lab are checked out (see
+        sparse_checkout_patterns). Objects found in the reference repository (--reference_repo,
+        a local mirror of the starter code) are not fetched.
         
         Parameters
         ----------
@@ -509,16 +841,14 @@ class lab_test:
             )
 
             # Fetch
-            cmd = ["git", "fetch", "--tags", "-f"]
-            p = subprocess.run(cmd, cwd=student_repo_path)
-            if p.returncode:
+            if not self.fetch_submission(student_repo_path, lab_tag, shallow=self.args.shallow_clone):
                 self.print_error("git fetch failed")
                 return False
 
-            # Checkout tag
-            if self.LAB_TAG_STRING not in ("master", "main"):
-                tag = "tags/" + lab_tag
-            cmd = ["git", "checkout", tag, "-f"]
+            # Checkout tag (with the files of this lab)
+            if self.args.shallow_clone and not self.set_sparse_checkout(student_repo_path):
+                return False
+            cmd = ["git", "checkout", "FETCH_HEAD", "-f"]
             p = subprocess.run(cmd, cwd=student_repo_path)
             if p.returncode:
                 self.print_error(TermColor.RED, "git checkout of tag failed")
@@ -530,12 +860,20 @@ class lab_test:
             "git",
             "clone",
             "--branch",
-            self.LAB_TAG_STRING,
-            git_path,
-            str(student_repo_path.absolute()),
+            lab_tag,
         ]
+        if self.args.shallow_clone:
+            # '--no-local' so that the depth and filter also apply to repositories given by path
+            cmd.extend(["--depth", "1", "--filter=blob:none", "--no-checkout", "--no-local"])
+        if self.args.reference_repo and os.path.isdir(os.path.expanduser(self.args.reference_repo)):
+            cmd.extend(["--reference-if-able", os.path.expanduser(self.args.reference_repo)])
+        cmd.extend([git_path, str(student_repo_path.absolute())])
         try:
             p = subprocess.run(cmd)
+            if p.returncode == 0 and self.args.shallow_clone:
+                if not self.set_sparse_checkout(student_repo_path):
+                    return False
+                p = subprocess.run(["git", "checkout", "-q", lab_tag], cwd=str(student_repo_path))
         except KeyboardInterrupt:
             shutil.rmtree(str(student_repo_path))
             sys.exit(-1)
@@ -544,6 +882,48 @@ class lab_test:
             return False
         return True
 
+    def fetch_submission(self, student_repo_path, lab_tag, shallow=True):
+        ''' Fetch the tag (or branch) of the submission from the origin of a repository into
+        FETCH_HEAD. Only this reference is fetched (only its commit when 'shallow' is True). '''
+        if lab_tag in ("master", "main"):
+            refspec = lab_tag
+        else:
+            refspec = str.format("+refs/tags/{0}:refs/tags/{0}", lab_tag)
+        cmd = ["git", "fetch", "--force", "--no-tags"]
+        if shallow:
+            cmd.extend(["--depth", "1"])
+        cmd.extend(["origin", refspec])
+        p = subprocess.run(cmd, cwd=str(student_repo_path))
+        return p.returncode == 0
+
+    def sparse_checkout_patterns(self):
+        ''' Returns the sparse checkout patterns of the files needed to test the lab: the files
+        at the top of the repository, the lab directory, the include directory, the files at
+        the top of the resources directory (i.e., the RARS jar and the tcl scripts) and the
+        directories of the files of the lab (i.e., ../resources/iosystem/iosystem.sv) '''
+        patterns = [ "/*", "!/*/", "/" + self.LAB_DIR_NAME + "/", "/include/",
+            "/resources/*", "!/resources/*/" ]
+        filenames = list(self.submission_dict.values()) + list(self.testfiles_dict.values())
+        for filename in filenames:
+            top_filename = os.path.normpath(os.path.join(self.LAB_DIR_NAME, filename))
+            directory = os.path.dirname(top_filename)
+            # (the files at the top of the resources directory are always checked out)
+            if directory and directory != "resources" and not directory.startswith(".."):
+                pattern = "/" + pathlib.PurePath(directory).as_posix() + "/"
+                if pattern not in patterns:
+                    patterns.append(pattern)
+        return patterns
+
+    def set_sparse_checkout(self, student_repo_path):
+        ''' Limit the checkout of a cloned repository to the files needed to test the lab '''
+        cmd = ["git", "sparse-checkout", "set", "--no-cone", "--stdin"]
+        p = subprocess.run(cmd, cwd=str(student_repo_path),
+            input="\n".join(self.sparse_checkout_patterns()) + "\n", universal_newlines=True)
+        if p.returncode:
+            self.print_error("git sparse-checkout failed")
+            return False
+        return True
+
     def print_date(self, student_repo_path):
         print("Last commit: ")
         cmd = ["git", "log", "-1", r"--format=%cd"]
@@ -617,88 +997,71 @@ class lab_test:
                 self.proceed_with_tests = False
         return not error
     
-    def check_for_required_files(self):
+    def repository_status(self):
+        ''' Returns the status of the repository of the lab (tracked files, changes and untracked
+        files) read in a single pass (see git_status) '''
+        return git_status.repository_status(self.submission_lab_path)
+
+    def check_for_required_files(self, status=None):
         ''' Checks to make sure all required files exist in the file system. '''
-        status = True
+        if status is None:
+            status = self.repository_status()
+        result = True
         # Make sure the files are in the repository
-        files_to_check = []
         for filename in self.submission_dict.values():
-            cmd = ["git", "ls-files", filename]
-            proc = subprocess.run(cmd, cwd=str(self.submission_lab_path),
-                                stdout=subprocess.PIPE,
-                                stderr=subprocess.PIPE,
-                                text=True,
-                                check=True)
-            git_file = proc.stdout.rstrip()
-            if git_file != filename:
-                print(f"Required file {filename} not in repository ({git_file})")
-                status = False
-            else:
-                files_to_check.append(filename)
-        return status
+            if not status.is_tracked(filename):
+                print(f"Required file {filename} not in repository")
+                result = False
+        return result
 
-    def check_for_git_file_status(self):
-        status = True
+    def check_for_git_file_status(self, status=None):
+        if status is None:
+            status = self.repository_status()
         # Make sure the files are up to date and committed
-        cmd = ["git", "status", "--porcelain"]
-        for filename in self.submission_dict.values():
-            cmd.append(filename)
-        proc = subprocess.run(cmd, cwd=str(self.submission_lab_path),
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            text=True,
-                            check=True)
-        if proc.stdout != "":
-            modified_files=[]
-            status = False
-            for line in proc.stdout.splitlines():
-                status, file_repo_name = line[:2], line[3:]
-                filename = pathlib.PurePath(file_repo_name).name
-                modified_files.append(filename)
-            print("Warning: The following files have been modified and need to be committed:")
-            for mfile in modified_files:
-                print(f" {mfile}")
-        return status
-
-    def check_for_git_pending_push(self):
-        status = True
-        # Make sure all the commits have been pushed
-        cmd = ["git", "diff", "--stat", "--cached", "origin/main" ]
-        proc = subprocess.run(cmd, cwd=str(self.submission_lab_path),
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            text=True,
-                            check=True)
-        if proc.stdout != "":
-            status = False
+        changed_files = status.changed_files(self.submission_dict.values())
+        if len(changed_files) == 0:
+            return True
+        print("Warning: The following files have been modified and need to be committed:")
+        for _, file_repo_name in changed_files:
+            print(f" {pathlib.PurePath(file_repo_name).name}")
+        return False
+
+    def check_for_git_pending_push(self, status=None):
+        if status is None:
+            status = self.repository_status()
+        result = True
+        # Make sure all the commits have been pushed (the index matches origin/main)
+        differs = status.differs_from("refs/remotes/origin/main")
+        if differs is None:
+            result = False
+            print("Warning: origin/main not found (the repository has not been pushed)")
+        elif differs:
+            result = False
             print("Warning: Pending commits have not been pushed")
-        return status
+        return result
 
-    def check_for_git_untracked_files(self):
-        status = True
+    def check_for_git_untracked_files(self, status=None):
+        if status is None:
+            status = self.repository_status()
         # See if there are any ignored directories
-        cmd = ["git", "ls-files", "--others", "--exclude-standard" ]
-        proc = subprocess.run(cmd, cwd=str(self.submission_lab_path),
-                            stdout=subprocess.PIPE,
-                            stderr=subprocess.PIPE,
-                            text=True,
-                            check=True)
-        if proc.stdout != "":
-            status = False
-            print("Warning: Untracked files in repository")
-            for line in proc.stdout.splitlines():
-                print(" "+line)
-        return status
+        untracked_files = status.untracked_files()
+        if len(untracked_files) == 0:
+            return True
+        print("Warning: Untracked files in repository")
+        for line in untracked_files:
+            print(" "+line)
+        return False
 
     def check_repo_file_status(self):
         ''' Checks the respository to make sure that all expected files are committed and that
         there are no changes in these files. Returns True if the files are properly committed
-        and false otherwise. '''
+        and false otherwise. The status of the repository is read once for all of the checks. '''
 
-        required_files = self.check_for_required_files()
-        file_commit_status = self.check_for_git_file_status()
-        pending_push = self.check_for_git_pending_push()
-        untracked_files = self.check_for_git_untracked_files()
+        status = self.repository_status()
+        required_files = self.check_for_required_files(status)
+        file_commit_status = self.check_for_git_file_status(status)
+        pending_push = self.check_for_git_pending_push(status)
+        untracked_files = self.check_for_git_untracked_files(status)
         return required_files and file_commit_status and pending_push and untracked_files
 
     def create_log_file(self):
@@ -714,10 +1077,11 @@ class lab_test:
         return log
 
     def print_log_file(self,str,print_to_stdout=False):
-        if self.log:
-            self.log.write(str)
-        if print_to_stdout:
-            print(str)
+        with self.lock:
+            if self.log:
+                self.log.write(str)
+            if print_to_stdout:
+                print(str)
 
     def execute_test_module(self, test_module):
         ''' Executes the 'perform_test' function of the tester_module and logs its result in the log file '''
@@ -725,23 +1089,170 @@ class lab_test:
         # Check to see if the test should proceed
         if not self.proceed_with_tests:
             print("Skipping test",test_module.module_name(),"due to previous errors")
+            self.print_log_file(str.format("Failed:{}\n",test_module.module_name()))
+            self.results.add_module(test_module.module_name()).finish("skipped", "previous errors")
             return False
 
         module_name = test_module.module_name()
-        result = test_module.perform_test(self)
-        if result:
+        module_result = self.results.add_module(module_name)
+        module_result.step = getattr(self.thread_state, "step", None)
+        problems = self.preflight_problems.get(id(test_module), [])
+        module_result.problems = [ str(problem) for problem in problems ]
+        definite_problems = [ problem for problem in problems if problem.definite ]
+        for problem in problems:
+            if problem.definite:
+                self.print_error(problem)
+            else:
+                self.print_warning(problem)
+        # Time budgets of the tool processes run by the module
+        budget = test_module.budget(self)
+        self.thread_state.budget = budget
+        self.thread_state.output_mode = test_module.output_mode(self)
+        self.thread_state.result = module_result
+        # Identity of the tool runs of the module (see tool_invocation)
+        self.thread_state.tool_keys = []
+        try:
+            if definite_problems:
+                result = False
+            elif self.args.sandbox:
+                result = self.run_in_sandbox(test_module)
+            else:
+                result = self.run_test_module(test_module)
+        finally:
+            self.thread_state.budget = None
+            self.thread_state.output_mode = None
+            self.thread_state.result = None
+            self.thread_state.tool_keys = None
+        if budget.timed_out:
+            module_result.finish("timeout", budget.timed_out)
+            self.print_log_file(str.format("Timeout:{} ({})\n",module_name,budget.timed_out))
+            self.print_error(str.format("Timeout executing:{} ({})",module_name,budget.timed_out))
+            result = False
+        elif result:
+            module_result.finish("passed")
             self.print_log_file(str.format("Success:{}\n",module_name))
             self.print_color(TermColor.GREEN, str.format("Success:{}\n",module_name))
         else:
+            module_result.finish("failed", "preflight problems" if definite_problems else None)
             self.print_log_file(str.format("Failed:{}\n",module_name))
             self.print_error(str.format("Error executing:{}",module_name))
             #self.proceed_with_tests = False
         return result
 
+    def run_test_module(self, test_module):
+        ''' Runs the test module (or restores its outputs from the result cache). Returns the result of the test. '''
+        module_name = test_module.module_name()
+        # Reuse the outputs of an earlier run of the module with the same inputs
+        cache = self.get_result_cache()
+        cache_key = None
+        result = None
+        if cache and test_module.cache_tools():
+            cache_key = cache.module_key(self, test_module)
+            entry = cache.lookup(cache_key)
+            if entry:
+                restored = cache.restore(entry, self.execution_path)
+                module_result = getattr(self.thread_state, "result", None)
+                if module_result is not None:
+                    module_result.cached = True
+                    module_result.restored_files = restored
+                self.print_info(str.format("Cached result of {} (restored {})",
+                    module_name, ", ".join(restored)))
+                result = True
+        if result is None:
+            result = test_module.perform_test(self)
+            # Only successful results are cached
+            if result and cache_key:
+                cache.store(cache_key, self.execution_path,
+                    compressed_log.stored_files(test_module.output_files(self)))
+        return result
+
+    def run_in_sandbox(self, test_module):
+        ''' Runs the test module in its own work directory (--sandbox). The files used by the
+        module are linked into the sandbox and the outputs of the module are published to the
+        execution directory when it completes (whether or not the test passed). '''
+        module_sandbox = sandbox.module_sandbox(self.execution_path / SANDBOX_DIR_NAME,
+            self.execution_path, self.submission_lab_path, self.submission_top_path,
+            name=str.format("step{}", getattr(self.thread_state, "step", 0)))
+        # All of the lab files (testbenches read data files that are not declared as inputs)
+        lab_files = self.get_filenames_from_keylist(list(self.submission_dict.keys()) + list(self.testfiles_dict.keys()))
+        # (the logs may be compressed)
+        output_files = compressed_log.stored_files(test_module.output_files(self))
+        module_sandbox.link_inputs(lab_files + test_module.input_files(self) + test_module.cache_files(self),
+            output_files)
+        self.thread_state.sandbox = module_sandbox
+        try:
+            return self.run_test_module(test_module)
+        finally:
+            self.thread_state.sandbox = None
+            module_sandbox.publish(output_files)
+            module_sandbox.remove()
+
+    @property
+    def execution_path(self):
+        ''' The directory where the tools are run (the sandbox of the test module running in this thread) '''
+        module_sandbox = getattr(self.thread_state, "sandbox", None)
+        return module_sandbox.execution_path if module_sandbox else self._execution_path
+
+    @execution_path.setter
+    def execution_path(self, path):
+        self._execution_path = path
+
+    @property
+    def submission_lab_path(self):
+        module_sandbox = getattr(self.thread_state, "sandbox", None)
+        return module_sandbox.submission_lab_path if module_sandbox else self._submission_lab_path
+
+    @submission_lab_path.setter
+    def submission_lab_path(self, path):
+        self._submission_lab_path = path
+
+    @property
+    def submission_top_path(self):
+        module_sandbox = getattr(self.thread_state, "sandbox", None)
+        return module_sandbox.submission_top_path if module_sandbox else self._submission_top_path
+
+    @submission_top_path.setter
+    def submission_top_path(self, path):
+        self._submission_top_path = path
+
+    def skip_test_module(self, test_module, failed_test_module):
+        ''' Logs a test module that was not executed because a test it depends on failed '''
+        module_name = test_module.module_name()
+        self.results.add_module(module_name).finish("skipped",
+            str.format("failed dependency {}", failed_test_module.module_name()))
+        self.print_log_file(str.format("Failed:{}\n",module_name))
+        self.print_error(str.format("Skipping test {} due to failed dependency {}",
+            module_name, failed_test_module.module_name()))
+
+    def write_results(self):
+        ''' Write the results of the test modules as JSON next to the result file (and as JUnit
+        XML if --junit_results is given) '''
+        if self.log is None:
+            return
+        info = { "submission" : str(self.submission_lab_path), "execution_path" : str(self.execution_path),
+            "errors" : self.errors, "warnings" : self.warnings, "jobs" : self.args.jobs }
+        json_filepath = self.execution_path / self.TEST_RESULT_JSON_FILENAME
+        try:
+            self.results.write_json(json_filepath, info)
+            print("Results written to", json_filepath)
+            if self.args.junit_results:
+                self.results.write_junit(self.args.junit_results)
+                print("JUnit results written to", self.args.junit_results)
+        except IOError as e:
+            self.print_warning("Cannot write the results:", e)
+
     def clean_up_test(self):
         ''' Should be called at the end of a test. It closes the log file and deletes the temporary directory. '''
         if self.log:
             self.log.close()
+        self.process_runner.stop()
+        self.vivado_sessions.stop()
+        # Remove the (empty) directory of the test module work directories
+        if self.args.sandbox:
+            try:
+                os.rmdir(self.execution_path / SANDBOX_DIR_NAME)
+            except OSError:
+                pass
         # Delete temporary directories
         if self.args.clean:
             for directory in self.directories_to_delete:
@@ -765,7 +1276,8 @@ class lab_passoff_argparse(argparse.ArgumentParser):
         #self.DEFAULT_EXTRACT_DIR = "passoff_temp_dir"
         # Default passoff directory is in the /tmp folder so it doesn't gum up student caedm space
         #self.DEFAULT_EXTRACT_DIR = "/tmp/ecen323_passoff"
-        self.DEFAULT_EXTRACT_DIR = "/tmp/" + f"ecen323_{os.getlogin()}"
+        #   (getpass is used rather than os.getlogin as there is no login terminal for unattended runs)
+        self.DEFAULT_EXTRACT_DIR = "/tmp/" + f"ecen323_{getpass.getuser()}"
 
         # call parent initialization
         description = str.format('Create and test submission archive for lab {} (v {}).', \
@@ -775,6 +1287,11 @@ class lab_passoff_argparse(argparse.ArgumentParser):
         # GitHub URL for the student repository.
         self.add_argument("--git_repo", type=str, 
             help="GitHub Remote Repository. If no repository is specified, the URL of the current repo will be used.")
+        # Clone of the remote repository
+        self.add_argument("--shallow_clone", action="store_true",
+            help="Clone only the files of the lab at the commit of the tag (fetched on demand) rather than the entire repository")
+        self.add_argument("--reference_repo", type=str,
+            help="Local mirror of the starter code repository whose objects are borrowed by the clone (ignored if it does not exist)")
 
         # Disable tagging
         self.add_argument("--no_tag", action="store_true", 
@@ -793,6 +1310,10 @@ class lab_passoff_argparse(argparse.ArgumentParser):
             help="Temporary directory where repository will be extracted (relative to directory script is run)",
             default=self.DEFAULT_EXTRACT_DIR)
 
+        # Submission checked out before the passoff script is run
+        self.add_argument("--submission_dir", type=str,
+            help="Top directory of a submission that is already checked out (i.e., by roster_harvest.py) rather than cloning it")
+
         # Run directory
         self.add_argument("--run_dir", type=str,
             help="Temporary directory where all the tests are run (relative to script dir). Default is extract_dir for clones, script directory for local")
@@ -810,3 +1331,89 @@ class lab_passoff_argparse(argparse.ArgumentParser):
 
         # Check repository
         self.add_argument("--check_repo", action="store_true", help="Checks the repository for correctness (for local option only)")
+
+        # Number of test modules that can run at the same time
+        self.add_argument("-j", "--jobs", type=int, default=1,
+            help="Maximum number of independent test modules to run concurrently (default 1)")
+
+        # Answer for all prompts (used for unattended runs such as batch grading)
+        self.add_argument("--non_interactive", type=str, nargs="?", const="n", choices=["y", "n"],
+            help="Do not prompt for input: answer all questions with the given answer (default 'n')")
+
+        # Host capacity for admitting tool processes (vivado, xsim, rars, etc.)
+        self.add_argument("--max_memory", type=int,
+            help="Memory (MB) available to tool processes (default is the host memory)")
+        self.add_argument("--max_threads", type=int,
+            help="Threads available to tool processes (default is the number of host CPUs)")
+        self.add_argument("--resource_dir", type=str,
+            help="Directory of lock files for sharing the host capacity with other passoff scripts")
+
+        # Reuse Vivado processes
+        self.add_argument("--vivado_server", action="store_true",
+            help="Run the Vivado steps in long-lived Vivado tcl sessions rather than a new Vivado process per step")
+
+        # Cache of test module results
+        self.add_argument("--cache", action="store_true",
+            help="Restore the outputs of test modules whose inputs, options, and tools are unchanged from an earlier run")
+        self.add_argument("--cache_dir", type=str, default="~/.cache/ecen323_passoff",
+            help="Directory of the result cache. The cache may be shared by several users: they must be " +
+            "members of the group of the directory (its subdirectories are created group-writable and setgid)")
+        self.add_argument("--cache_size", type=int, default=2048,
+            help="Maximum size (MB) of the result cache before least recently used results are evicted (default 2048)")
+
+        # Precompiled simulation library of the HDL files in the resources directory
+        self.add_argument("--xsim_lib_dir", type=str, default="~/.cache/ecen323_passoff/xsim_lib",
+            help="Directory of the precompiled simulation libraries of the shared HDL files")
+        self.add_argument("--xsim_lib", action="store_true",
+            help="Link the simulations with a precompiled library of the shared HDL files rather than analyzing them in every simulation")
+
+        # Checks of the HDL files before running the tools
+        self.add_argument("--no_preflight", action="store_true",
+            help="Do not check the HDL files (top module, includes, ports) before running the tools " +
+            "(a module whose top module, included file or connected port is not found fails without running the tools)")
+
+        # Time budgets of the test modules (modules may set their own budgets)
+        self.add_argument("--wall_time", type=float,
+            help="Wall-clock time (seconds) allowed for the tool processes of each test module")
+        self.add_argument("--cpu_time", type=int,
+            help="CPU time (seconds) allowed for each tool process")
+        self.add_argument("--sim_time", type=str,
+            help="Simulated time allowed for testbench simulations (i.e., 10ms) rather than running until $finish")
+
+        # Stop testbench simulations at the first error rather than running to the end
+        self.add_argument("--abort_on_error", action="store_true",
+            help="Stop a testbench simulation as soon as it prints an error")
+
+        # Log storage
+        self.add_argument("--compress_logs", action="store_true",
+            help="Write the tool logs compressed (<log>.gz, view with zless or resources/compressed_log.py)")
+
+        # Tool output shown on the terminal (the logs always have all of the output)
+        self.add_argument("--output_mode", choices=terminal_output.OUTPUT_MODES,
+            default=terminal_output.DEFAULT_OUTPUT_MODE,
+            help="Tool output shown on the terminal: all of it (tee), none (file), one line per tool (summary) " +
+                "or a limited number of lines per second (ratelimit)")
+
+        # Results (the JSON results are always written next to the result file)
+        self.add_argument("--junit_results", type=str,
+            help="Also write the results of the test modules as JUnit XML to this file")
+
+        # Reference checkpoints of the bitstream builds
+        self.add_argument("--build_reference_dir", type=str, default="~/.cache/ecen323_passoff/build_reference",
+            help="Directory of the reference checkpoints used for incremental bitstream builds")
+        self.add_argument("--incremental_build", action="store_true",
+            help="Build designs incrementally from the reference checkpoints of the last build (a design " +
+                "whose sources are unchanged only has its memories updated and is not synthesized again)")
+
+        # Private work directory for each test module
+        self.add_argument("--sandbox", action="store_true",
+            help="Run each test module in its own work directory and publish its outputs to the execution directory")
+
+        # Record the tool runs or replay them rather than running the tools
+        record_group = self.add_mutually_exclusive_group()
+        record_group.add_argument("--record_dir", type=str,
+            help="Record each tool run (command, inputs, output and written files) in this directory " +
+                "(ignores --jobs, --xsim_lib, --incremental_build and --vivado_server)")
+        record_group.add_argument("--replay_dir", type=str,
+            help="Replay the tool runs recorded in this directory (with --record_dir) rather than running the tools " +
+                "(ignores --xsim_lib, --incremental_build and --vivado_server)")
@@ -24,7 +24,7 @@
 #
 # https://www.xilinx.com/support/answers/63041.html
 
-set version "1.7"
+set version "1.8"
 set debug 0
 
 # Get a list of the BRAMs that are used in a design
@@ -928,6 +928,111 @@ proc updateRiscvMemories2 { textFileName dataFileName bitstreamName { checkpoint
 	}
 }
 
+# Update the font ROM of the VGA controller with the contents of the font file
+proc updateFontMemory { fontFileName } {
+	#set bram vga/charGen/fontrom/addr_reg_reg
+	set bram iosystem/vga/charGen/fontrom/addr_reg_reg
+	load_mem_font $bram $fontFileName
+}
+
+# Update the character memory of the VGA controller with the contents of the background file
+proc updateBackgroundMemory { backgroundFileName } {
+	# Set background vga values
+	set bram0 iosystem/vga/charGen/charmem/BRAM_inst_0/bram
+	set bram1 iosystem/vga/charGen/charmem/BRAM_inst_1/bram
+	set bram2 iosystem/vga/charGen/charmem/BRAM_inst_2/bram
+	set bram3 iosystem/vga/charGen/charmem/BRAM_inst_3/bram
+	set bramList [ list $bram0 $bram1 $bram2 $bram3 ]
+	# Load memories
+	load_brams_interleaved_32hextext  $bramList $backgroundFileName
+}
+
+# Update the instruction and data memories with a program (same as updateRiscvMemories2
+# without writing the bitstream). Generates an error if the memories cannot be found.
+proc updateProgramMemory { textFileName dataFileName } {
+	set inst_0 [findMemoryWithBase "instruction_reg_0"]
+	set inst_1 [findMemoryWithBase "instruction_reg_1"]
+	set data_0 [findMemoryWithBase "data_memory_reg_0"]
+	set data_1 [findMemoryWithBase "data_memory_reg_1"]
+	puts "Instruction memories: $inst_0 $inst_1"
+	puts "Data memories: $data_0 $data_1"
+	if {[string equal "None" $inst_0] || [string equal "None" $inst_1] ||
+		[string equal "None" $data_0] || [string equal "None" $data_1]} {
+		error "Cannot find instruction memory"
+	}
+	load_brams_interleaved_32hextext [list $inst_0 $inst_1] $textFileName
+	load_brams_dict_32hextext [list $data_0 $data_1 ] "mem/dReadData" $dataFileName
+}
+
+# Update only the instruction memory with the contents of a .text file
+proc updateTextMemory { textFileName } {
+	set inst_0 [findMemoryWithBase "instruction_reg_0"]
+	set inst_1 [findMemoryWithBase "instruction_reg_1"]
+	puts "Instruction memories: $inst_0 $inst_1"
+	if {[string equal "None" $inst_0] || [string equal "None" $inst_1]} {
+		error "Cannot find instruction memory"
+	}
+	load_brams_interleaved_32hextext [list $inst_0 $inst_1] $textFileName
+}
+
+# Update only the data memory with the contents of a .data file
+proc updateDataMemory { dataFileName } {
+	set data_0 [findMemoryWithBase "data_memory_reg_0"]
+	set data_1 [findMemoryWithBase "data_memory_reg_1"]
+	puts "Data memories: $data_0 $data_1"
+	if {[string equal "None" $data_0] || [string equal "None" $data_1]} {
+		error "Cannot find data memory"
+	}
+	load_brams_dict_32hextext [list $data_0 $data_1 ] "mem/dReadData" $dataFileName
+}
+
+# Apply a list of updates to the open checkpoint. The updates are applied in order
+# to the design in memory so the checkpoint is only opened once. Each step is
+# one of the following:
+#   font <font file>
+#   background <background file>
+#   program <.text file> <.data file>
+#   text <.text file>             (instruction memory only)
+#   data <.data file>             (data memory only)
+#   bitstream <bitstream file>    (write a bitstream of the current memory contents)
+#   checkpoint <checkpoint file>  (write a checkpoint of the current memory contents)
+proc updateChain { steps } {
+	set i 0
+	while {$i < [llength $steps]} {
+		set step [lindex $steps $i]
+		switch -- $step {
+			font {
+				updateFontMemory [lindex $steps [incr i]]
+			}
+			background {
+				updateBackgroundMemory [lindex $steps [incr i]]
+			}
+			program {
+				set textFileName [lindex $steps [incr i]]
+				set dataFileName [lindex $steps [incr i]]
+				updateProgramMemory $textFileName $dataFileName
+			}
+			text {
+				updateTextMemory [lindex $steps [incr i]]
+			}
+			data {
+				updateDataMemory [lindex $steps [incr i]]
+			}
+			bitstream {
+				write_bitstream -force [lindex $steps [incr i]]
+			}
+			checkpoint {
+				puts "Generating new checkpoint file"
+				write_checkpoint [lindex $steps [incr i]] -force
+			}
+			default {
+				error "Unknown updateChain step: $step"
+			}
+		}
+		incr i
+	}
+}
+
 # Memory names
 #iosystem/vga/charGen/charmem/BRAM_inst_0/bram
 #iosystem/vga/charGen/charmem/BRAM_inst_1/bram 
@@ -1032,9 +1137,7 @@ if { [llength $argv] > 0 } {
 			} else {
 				# Load the .text file
 				set textFileName [lindex $argv 2]
-				#set bram vga/charGen/fontrom/addr_reg_reg
-				set bram iosystem/vga/charGen/fontrom/addr_reg_reg
-				load_mem_font $bram $textFileName
+				updateFontMemory $textFileName
 				# Write the bitfile
 				set bitstreamName [lindex $argv 3]
 				write_bitstream -force $bitstreamName
@@ -1053,15 +1156,7 @@ if { [llength $argv] > 0 } {
 			} else {
 				# Load the .text file
 				set textFileName [lindex $argv 2]
-				# Set background vga values
-				set bram0 iosystem/vga/charGen/charmem/BRAM_inst_0/bram
-				set bram1 iosystem/vga/charGen/charmem/BRAM_inst_1/bram
-				set bram2 iosystem/vga/charGen/charmem/BRAM_inst_2/bram
-				set bram3 iosystem/vga/charGen/charmem/BRAM_inst_3/bram
-				set bramList [ list $bram0 $bram1 $bram2 $bram3 ]
-
-				# Load memories
-				load_brams_interleaved_32hextext  $bramList $textFileName
+				updateBackgroundMemory $textFileName
 
 				# Write the bitfile
 				set bitstreamName [lindex $argv 3]
@@ -1073,6 +1168,10 @@ if { [llength $argv] > 0 } {
 					write_checkpoint $checkpointName -force
 				}
 			}
+		} elseif {[string equal $command "updateChain"]} {
+			#  updateChain <checkpoint> <step> ... (see 'updateChain' procedure)
+			puts "Executing 'updateChain' command"
+			updateChain [lrange $argv 2 end]
 		} else {
 			puts "Unknown command: $command"
 		}
@@ -1092,6 +1191,7 @@ if { [llength $argv] > 0 } {
 		puts " updateData <checkpoint file> <.data file> <bitstream file> \[Optional .dcp file\]"
 		puts " updateFont <checkpoint file> <font file> <bitfile> \[output checkpoint file\]"
 		puts " updateBackground <checkpoint file> <background file> <bitfile>"
+		puts " updateChain <checkpoint file> \[font <file>\] \[background <file>\] \[program <.text file> <.data file>\] \[text <.text file>\] \[data <.data file>\] \[bitstream <file>\] \[checkpoint <file>\] ..."
 	} else {
 		puts "Script loaded with current project $a"
 	}
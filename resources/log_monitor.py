@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+
+'''
+Analysis of the output of a tool process while it runs.
+
+Classes:
+  line_monitor: splits the output of a process into lines as it is read, matches each
+    line against the error signatures of the tool and keeps the last lines of output in memory
+
+The process runner passes the output of a process to its monitor as it is read so that
+messages of the tool (see log_signatures) are found without reading the log file again
+once the process completes. A
+monitor with 'abort_on_error' set asks the runner to stop the process at the first
+error (i.e., a testbench that reports an error early and would otherwise run to the
+end of the simulation). The last lines of output are kept in a ring buffer so that
+they can be shown when the process fails.
+'''
+
+import collections
+
+# Error signatures of the tools
+import log_signatures
+# Compressed log files
+import compressed_log
+# Phase timing of the tool output
+import log_timing
+
+# Number of lines of output kept by default
+DEFAULT_TAIL_LINES = 40
+# Maximum number of messages recorded
+MAX_FINDINGS = 100
+
+class line_monitor:
+    ''' Watches the lines of output of a process for the messages of a tool (the name of
+    a signature table of log_signatures) '''
+
+    def __init__(self, tool, abort_on_error=False, tail_lines=DEFAULT_TAIL_LINES):
+        self.signatures = log_signatures.signatures(tool)
+        self.abort_on_error = abort_on_error
+        self.tail = collections.deque(maxlen=tail_lines)
+        self.partial_line = ""
+        self.line_count = 0
+        # The messages (log_signatures.finding) and the error messages of the output
+        self.findings = []
+        self.errors = []
+        # Time and memory of each phase of the tool (from the timing lines of the output)
+        self.timing = log_timing.phase_timing()
+        # Set when the runner should stop the process
+        self.abort = False
+        # Set by the runner when the process was stopped because of 'abort'
+        self.aborted = False
+
+    def feed(self, text):
+        ''' Process output text (which may end in the middle of a line) '''
+        if text == "":
+            return
+        lines = (self.partial_line + text).split("\n")
+        self.partial_line = lines.pop()
+        for line in lines:
+            self.add_line(line)
+
+    def finish(self):
+        ''' Process the last line of output (if it does not end with a newline) '''
+        if self.partial_line:
+            self.add_line(self.partial_line)
+            self.partial_line = ""
+
+    def add_line(self, line):
+        line = line.rstrip("\r")
+        self.line_count += 1
+        self.tail.append(line)
+        if self.timing.add_line(line):
+            return
+        # The location printed on the line after a message
+        previous = self.findings[-1] if self.findings else None
+        if previous is not None and previous.log_line == self.line_count - 1 and \
+            self.signatures.add_location(previous, line):
+            return
+        finding = self.signatures.match(line, self.line_count)
+        if finding is None:
+            return
+        if len(self.findings) < MAX_FINDINGS:
+            self.findings.append(finding)
+            if finding.is_error():
+                self.errors.append(finding)
+        if finding.is_error() and self.abort_on_error:
+            self.abort = True
+
+    def scan_file(self, filepath):
+        ''' Process the output of a process saved in a log file (compressed or not) '''
+        with compressed_log.open_reader(filepath) as fp:
+            for line in fp:
+                self.feed(line)
+        self.finish()
+        return self
+
+    def first_error(self):
+        ''' Returns the first error (None if there are no errors) '''
+        return self.errors[0] if self.errors else None
+
+    def count(self, severity):
+        ''' Returns the number of messages of a severity that were recorded '''
+        return sum(1 for finding in self.findings if finding.severity == severity)
+
+    def tail_lines(self):
+        ''' Returns the last lines of output '''
+        return list(self.tail)
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+
+'''
+Error signatures of the tool logs.
+
+Classes:
+  finding: a message found in a tool log (severity, message code, source file and line)
+  signature_set: the signatures of a tool compiled into a single regular expression
+
+Each tool has a table of signatures. A signature is a regular expression for one kind of
+message of the tool with named groups for the parts of the message ('severity', 'code',
+'file', 'line' and 'message'). The signatures of a tool are combined into one regular
+expression (one alternative per signature) so that each line of a log is matched once
+against all of the signatures. The messages are matched by their structure (i.e.,
+"ERROR: [VRFC 10-2989] ... [file.sv:12]") rather than by searching for words such as
+"Error" so that a testbench printing "No Errors" is not reported as an error.
+
+Messages without a location that are followed by a location line (i.e., the 'Time: ...
+File: tb.sv Line: 52' line printed by xsim after an $error) are given that location.
+'''
+
+import functools
+import re
+
+# Severities in increasing order
+SEVERITIES = ("WARNING", "CRITICAL WARNING", "ERROR", "FATAL")
+# Severities that fail a step
+ERROR_SEVERITIES = ("ERROR", "FATAL")
+
+# Spellings of the severities used by the tools
+SEVERITY_NAMES = {
+    "WARNING" : "WARNING", "Warning" : "WARNING",
+    "CRITICAL WARNING" : "CRITICAL WARNING",
+    "ERROR" : "ERROR", "Error" : "ERROR", "Failure" : "ERROR",
+    "FATAL" : "FATAL", "FATAL_ERROR" : "FATAL", "Fatal" : "FATAL",
+}
+
+# Vivado style message: 'ERROR: [Synth 8-439] module 'foo' not found [/path/top.sv:12]'
+XILINX_MESSAGE = (r"^(?P<severity>ERROR|CRITICAL WARNING|WARNING): \[(?P<code>[^\]]+)\] (?P<message>.*?)"
+    r"(?: \[(?P<file>[^\[\]]+?):(?P<line>\d+)\])?\s*$")
+# Kernel errors of the simulator that are not in the Vivado format
+XSIM_FATAL = r"^(?P<severity>FATAL_ERROR): ?(?P<message>.*)$"
+# Messages of the SystemVerilog severity tasks ($error, $fatal, $warning) printed by xsim
+XSIM_SEVERITY_TASK = r"^(?P<severity>Fatal|Error|Failure|Warning): ?(?P<message>.*)$"
+# Errors printed by a testbench with $display. The word is a label: 'ERROR: ...',
+# '*** Error: ...' or 'Error - ...' (not 'No Errors' or '3 errors')
+TESTBENCH_ERROR = r"(?<![\w'])(?P<severity>ERROR|Error)(?![\w'])\s*[:\-]\s*(?P<message>.*)$"
+# RARS assembly and runtime errors: 'Error in /path/prog.s line 12 column 5: "foo": operand is of incorrect type'
+RARS_MESSAGE = (r"^(?P<severity>Error|Warning) in (?P<file>.*?)\s*:?\s*line (?P<line>\d+)"
+    r"(?: column \d+)?:\s*(?P<message>.*)$")
+
+# The signature tables: (code, severity, pattern). The code and severity are used when the
+# pattern does not have a 'code' or 'severity' group.
+SIGNATURES = {
+    "xvlog" : [
+        ("VRFC", None, XILINX_MESSAGE),
+        ("XSIM", None, XSIM_FATAL),
+    ],
+    "xvhdl" : [
+        ("VRFC", None, XILINX_MESSAGE),
+        ("XSIM", None, XSIM_FATAL),
+    ],
+    "xelab" : [
+        ("XSIM", None, XILINX_MESSAGE),
+        ("XSIM", None, XSIM_FATAL),
+        ("xelab", "ERROR", r"^(?P<message>Abnormal program termination.*)$"),
+    ],
+    "xsim" : [
+        ("XSIM", None, XILINX_MESSAGE),
+        ("XSIM", None, XSIM_FATAL),
+        ("$severity", None, XSIM_SEVERITY_TASK),
+    ],
+    "vivado" : [
+        ("Vivado", None, XILINX_MESSAGE),
+        ("Tcl", "ERROR", r"^(?P<message>invalid command name .*)$"),
+        ("Vivado", "FATAL", r"^(?P<message>Abnormal program termination.*)$"),
+    ],
+    "rars" : [
+        ("RARS", None, RARS_MESSAGE),
+        ("RARS", "ERROR", r"^(?P<message>Processing terminated due to errors.*)$"),
+        ("java", "ERROR", r"^(?P<message>(?:Exception in thread|Error: Unable to access jarfile) .*)$"),
+    ],
+}
+# A testbench simulation: the simulator messages and the errors printed by the testbench
+SIGNATURES["testbench"] = SIGNATURES["xsim"] + [ ("testbench", None, TESTBENCH_ERROR) ]
+
+# Location of the previous message
+LOCATION = re.compile(r"\bFile: (?P<file>\S+) Line: (?P<line>\d+)")
+
+class finding:
+    ''' A message in a tool log '''
+
+    def __init__(self, tool, severity, code, message, file=None, line=None, log_line=None, text=""):
+        self.tool = tool
+        self.severity = severity
+        self.code = code
+        self.message = message
+        self.file = file
+        self.line = line
+        # Line number of the message in the log
+        self.log_line = log_line
+        self.text = text
+
+    def is_error(self):
+        return self.severity in ERROR_SEVERITIES
+
+    def location(self):
+        ''' Returns 'file:line' (an empty string if the location is not known) '''
+        if self.file is None:
+            return ""
+        if self.line is None:
+            return self.file
+        return str.format("{}:{}", self.file, self.line)
+
+    def __str__(self):
+        text = str.format("{} [{}] {}", self.severity, self.code, self.message)
+        if self.file is not None:
+            text = self.location() + ": " + text
+        return text
+
+    def as_dict(self):
+        return { "tool" : self.tool, "severity" : self.severity, "code" : self.code,
+            "message" : self.message, "file" : self.file, "line" : self.line, "log_line" : self.log_line }
+
+class signature_set:
+    ''' The signatures of a tool compiled into one regular expression '''
+
+    def __init__(self, tool):
+        self.tool = tool
+        self.signatures = SIGNATURES[tool]
+        alternatives = []
+        for i, (_, _, pattern) in enumerate(self.signatures):
+            # The group names are made unique so that the signatures can be combined
+            pattern = re.sub(r"\(\?P<(\w+)>", str.format(r"(?P<s{}_\1>", i), pattern)
+            alternatives.append(str.format("(?P<s{}>{})", i, pattern))
+        self.regex = re.compile("|".join(alternatives))
+
+    def match(self, line, log_line=None):
+        ''' Returns the finding for a line of a log (None if the line has no message) '''
+        m = self.regex.search(line)
+        if m is None:
+            return None
+        # The group of the signature is the outermost group of the match
+        name = m.lastgroup
+        code, severity, _ = self.signatures[int(name[1:])]
+        groups = { key[len(name) + 1:] : value for key, value in m.groupdict().items()
+            if value is not None and key.startswith(name + "_") }
+        severity = SEVERITY_NAMES.get(groups.get("severity"), severity)
+        return finding(self.tool, severity, groups.get("code", code), groups.get("message", "").strip(),
+            groups.get("file"), int(groups["line"]) if "line" in groups else None, log_line, line)
+
+    def add_location(self, previous, line):
+        ''' Give the previous finding the location of a location line. Returns True if the
+        line is a location line. '''
+        if previous is None or previous.file is not None:
+            return False
+        m = LOCATION.search(line)
+        if m is None:
+            return False
+        previous.file = m.group("file")
+        previous.line = int(m.group("line"))
+        return True
+
+@functools.lru_cache(maxsize=None)
+def signatures(tool):
+    ''' Returns the compiled signatures of a tool '''
+    return signature_set(tool)
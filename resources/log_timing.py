@@ -0,0 +1,110 @@
+#!/usr/bin/python3
+
+'''
+Per-phase timing of the Vivado and xsim logs.
+
+Classes:
+  phase_timing: the CPU time, wall time and peak memory of each phase (command) found in
+    the output of a tool
+
+Vivado prints a timing line after each of its major commands and the simulator prints
+one after 'run':
+  synth_design: Time (s): cpu = 00:00:34 ; elapsed = 00:00:37 . Memory (MB): peak = 2543.887 ; gain = 1022.406
+The line starts with the name of the phase (synth_design, opt_design, place_design,
+route_design, write_bitstream, open_checkpoint, run, ...). A phase that is run more than
+once in a log (i.e., write_checkpoint) is reported with its total CPU and wall time
+and the largest peak memory.
+
+The timing is collected by the monitor of a tool (see log_monitor) as the output is
+produced and is added to the result of the test module (see test_results). The logs of
+earlier runs can be summarized with:
+  log_timing.py <log> [<log> ...]
+'''
+
+import argparse
+import re
+
+# Compressed log files
+import compressed_log
+
+# Timing line printed after a Vivado or xsim command
+TIMING_RE = re.compile(r"^(?P<phase>[A-Za-z_][\w]*): Time \(s\): cpu = (?P<cpu>[\d:.]+) ; "
+    r"elapsed = (?P<elapsed>[\d:.]+) \. Memory \(MB\): peak = (?P<peak>[\d.]+)(?: ; gain = (?P<gain>-?[\d.]+))?")
+# Text that all of the timing lines contain (checked before the regular expression)
+TIMING_MARKER = "Time (s):"
+
+def seconds(value):
+    ''' Returns the number of seconds of a 'hh:mm:ss' time (the fields may have fractions) '''
+    total = 0.0
+    for field in value.split(":"):
+        total = total * 60 + float(field)
+    return total
+
+class phase_timing:
+    ''' The timing of the phases of a tool run (in the order the phases first appear) '''
+
+    def __init__(self):
+        # Phase name to { "count", "cpu", "elapsed", "peak_mb", "gain_mb" }
+        self.phases = {}
+
+    def add_line(self, line):
+        ''' Record the timing of a line of output. Returns True if the line is a timing line. '''
+        if TIMING_MARKER not in line:
+            return False
+        m = TIMING_RE.match(line.strip())
+        if m is None:
+            return False
+        self.add(m.group("phase"), seconds(m.group("cpu")), seconds(m.group("elapsed")),
+            float(m.group("peak")), float(m.group("gain")) if m.group("gain") else 0.0)
+        return True
+
+    def add(self, phase, cpu, elapsed, peak_mb, gain_mb=0.0):
+        timing = self.phases.setdefault(phase, { "count" : 0, "cpu" : 0.0, "elapsed" : 0.0,
+            "peak_mb" : 0.0, "gain_mb" : 0.0 })
+        timing["count"] += 1
+        timing["cpu"] += cpu
+        timing["elapsed"] += elapsed
+        timing["peak_mb"] = max(timing["peak_mb"], peak_mb)
+        timing["gain_mb"] += gain_mb
+
+    def merge(self, other):
+        ''' Add the phases of another tool run '''
+        for phase, timing in other.phases.items():
+            self.add(phase, timing["cpu"], timing["elapsed"], timing["peak_mb"], timing["gain_mb"])
+            self.phases[phase]["count"] += timing["count"] - 1
+
+    def as_list(self):
+        return [ { "phase" : phase, "count" : timing["count"], "cpu" : round(timing["cpu"], 3),
+            "elapsed" : round(timing["elapsed"], 3), "peak_mb" : round(timing["peak_mb"], 3),
+            "gain_mb" : round(timing["gain_mb"], 3) } for phase, timing in self.phases.items() ]
+
+    def scan_file(self, filepath):
+        ''' Record the timing lines of a log file (compressed or not) '''
+        with compressed_log.open_reader(filepath) as fp:
+            for line in fp:
+                self.add_line(line)
+        return self
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the phase timing of Vivado and xsim logs")
+    parser.add_argument("logs", nargs="+", help="Tool logs (i.e., design_implementation.txt)")
+    args = parser.parse_args()
+    total = phase_timing()
+    for log in args.logs:
+        timing = phase_timing().scan_file(log)
+        total.merge(timing)
+        if len(args.logs) > 1:
+            print(log)
+        print_table(timing)
+    if len(args.logs) > 1:
+        print("Total")
+        print_table(total)
+
+def print_table(timing):
+    print(str.format("  {:<20} {:>5} {:>10} {:>10} {:>10}", "phase", "count", "cpu (s)", "wall (s)", "peak (MB)"))
+    for phase in timing.as_list():
+        print(str.format("  {:<20} {:>5} {:>10.1f} {:>10.1f} {:>10.1f}", phase["phase"], phase["count"],
+            phase["cpu"], phase["elapsed"], phase["peak_mb"]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+#!/usr/bin/python3
+
+'''
+Asyncio based engine for running the tool processes of a passoff script.
+
+Classes:
+  process_runner: supervises any number of tool processes from a single event loop
+    running in a background thread
+
+The output of each process is read in large binary chunks and written to the log file
+of the process through a large buffer (no flush per line). The output is also copied
+to the terminal according to the output mode of the process (see terminal_output) with
+an optional prefix on each line so that the output of concurrent jobs can be told apart.
+
+Processes are started with 'submit' which returns a concurrent.futures.Future for the
+return code of the process. The future can be waited on with 'result()' or awaited
+from a coroutine with 'asyncio.wrap_future'. A process run with the budget of its test
+module is stopped (with its process group) when the module runs out of wall-clock time.
+The logs may be written compressed (see compressed_log). The output of a recorded tool
+run (see tool_replay) is passed through the log, the monitor and the terminal with 'replay'
+without running the tool.
+'''
+
+import asyncio
+import codecs
+import concurrent.futures
+import contextlib
+import signal
+import threading
+
+# Time budgets of the test modules
+import watchdog
+# Compressed log files
+import compressed_log
+# Copies the tool output to the terminal
+import terminal_output
+
+# Size of the chunks read from the process output
+READ_CHUNK_SIZE = 64 * 1024
+# Size of the buffer used when writing the log files
+LOG_BUFFER_SIZE = 1024 * 1024
+# Interval for checking whether a process with a time budget has exited
+EXIT_POLL_SECONDS = 0.2
+
+class process_runner:
+    ''' Runs tool processes on an event loop in a background thread '''
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.start_lock = threading.Lock()
+
+    def start(self):
+        ''' Start the event loop thread (if it is not running) '''
+        with self.start_lock:
+            if self.loop is not None:
+                return
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self.loop.run_forever,
+                name="process_runner", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        ''' Stop the event loop thread '''
+        with self.start_lock:
+            if self.loop is None:
+                return
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+            self.loop.close()
+            self.loop = None
+            self.thread = None
+
+    async def run_process(self, proc_cmd, proc_cwd, log_filepath, prefix="", echo=True, budget=None,
+        monitor=None, compress=False, output_mode=terminal_output.DEFAULT_OUTPUT_MODE, capture=None):
+        ''' Coroutine that runs a process and copies its output to the log file (and the
+        terminal). Returns the return code of the process. A process that exceeds the
+        wall-clock budget of its test module (see watchdog) is stopped with its process group.
+        The output is also passed to the monitor (see log_monitor) if one is given and the
+        process is stopped if the monitor asks for it. The log is compressed if 'compress' is set.
+        The output is not copied to the terminal when 'echo' is False. The output is also written
+        to 'capture' (a binary file) if given. '''
+        limited = budget is not None and budget.is_limited()
+        abortable = monitor is not None and monitor.abort_on_error
+        # Processes that may be stopped run in a new process group so that their children are stopped too
+        supervised = limited or abortable
+        with compressed_log.open_writer(log_filepath, compress, LOG_BUFFER_SIZE) as fp:
+            # Print command to file
+            fp.write(command_header(proc_cmd, proc_cwd))
+            if limited and budget.remaining() == 0:
+                budget.wall_time_exceeded()
+                fp.write(str.format("Not started: {}\n", budget.timed_out).encode())
+                return -signal.SIGKILL
+            proc = await asyncio.create_subprocess_exec(
+                *[str(cmd) for cmd in proc_cmd],
+                cwd=proc_cwd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                start_new_session=supervised,
+            )
+            if limited:
+                budget.limit_process(proc.pid)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            terminal = terminal_output.terminal_sink(output_mode if echo else "file", prefix,
+                str(proc_cmd[0]), log_filepath)
+            def process_text(text):
+                if monitor is not None:
+                    monitor.feed(text)
+                    if monitor.abort and not monitor.aborted:
+                        monitor.aborted = True
+                        watchdog.kill_process_group(proc.pid)
+                terminal.write(text)
+            async def copy_output():
+                while True:
+                    chunk = await proc.stdout.read(READ_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    fp.write(chunk)
+                    if capture is not None:
+                        capture.write(chunk)
+                    process_text(decoder.decode(chunk))
+            if not supervised:
+                await copy_output()
+                # Wait until process is done
+                return_code = await proc.wait()
+            else:
+                reader = asyncio.ensure_future(copy_output())
+                with budget.charge() if limited else contextlib.nullcontext():
+                    try:
+                        return_code = await asyncio.wait_for(self.process_exit(proc),
+                            budget.remaining() if limited else None)
+                    except asyncio.TimeoutError:
+                        budget.wall_time_exceeded()
+                        return_code = await self.stop_process_group(proc)
+                # Children left behind by the tool would keep the output open
+                watchdog.kill_process_group(proc.pid)
+                await reader
+                await proc.wait()
+                if limited:
+                    budget.check_cpu_signal(return_code)
+                    if budget.timed_out:
+                        fp.write(str.format("\nStopped: {}\n", budget.timed_out).encode())
+            process_text(decoder.decode(b"", final=True))
+            if monitor is not None:
+                monitor.finish()
+                if monitor.aborted:
+                    fp.write(str.format("\nStopped at line {}: {}\n", monitor.first_error().log_line,
+                        monitor.first_error().text).encode())
+            terminal.close(return_code)
+            return return_code
+
+    async def process_exit(self, proc):
+        ''' Wait for a process to exit. Unlike 'wait' this does not wait for the output of the
+        process to be closed (the output may be held open by the children of the process). '''
+        while proc.returncode is None:
+            await asyncio.sleep(EXIT_POLL_SECONDS)
+        return proc.returncode
+
+    async def stop_process_group(self, proc):
+        ''' Stop a process and its children (SIGTERM, then SIGKILL if the process does not exit) '''
+        watchdog.kill_process_group(proc.pid, signal.SIGTERM)
+        try:
+            return await asyncio.wait_for(self.process_exit(proc), watchdog.KILL_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            watchdog.kill_process_group(proc.pid, signal.SIGKILL)
+            return await self.process_exit(proc)
+
+    def submit(self, proc_cmd, proc_cwd, log_filepath, prefix="", echo=True, before=None, after=None,
+        budget=None, monitor=None, compress=False, output_mode=terminal_output.DEFAULT_OUTPUT_MODE, capture=None):
+        ''' Start a process and return a concurrent.futures.Future for its return code.
+        The optional 'before' function is called (in a worker thread so that it can block)
+        before the process starts and the optional 'after' function is called with its
+        result once the process completes. The optional budget (watchdog.module_budget)
+        limits the time of the process and the optional monitor (log_monitor.line_monitor)
+        receives its output. '''
+        self.start()
+        async def run():
+            token = None
+            if before:
+                token = await self.loop.run_in_executor(None, before)
+            try:
+                return await self.run_process(proc_cmd, proc_cwd, log_filepath, prefix, echo, budget, monitor,
+                    compress, output_mode, capture)
+            finally:
+                if after:
+                    after(token)
+        return asyncio.run_coroutine_threadsafe(run(), self.loop)
+
+    def run(self, proc_cmd, proc_cwd, log_filepath, prefix="", echo=True, budget=None, monitor=None,
+        compress=False, output_mode=terminal_output.DEFAULT_OUTPUT_MODE):
+        ''' Run a process and wait for its return code '''
+        return self.submit(proc_cmd, proc_cwd, log_filepath, prefix, echo, budget=budget, monitor=monitor,
+            compress=compress, output_mode=output_mode).result()
+
+    def replay(self, proc_cmd, proc_cwd, log_filepath, output_filepath, return_code, prefix="", echo=True,
+        monitor=None, compress=False, output_mode=terminal_output.DEFAULT_OUTPUT_MODE):
+        ''' Write the recorded output of a tool run (see tool_replay) to the log file, the monitor
+        and the terminal as if the tool was run. Returns a completed concurrent.futures.Future
+        for the recorded return code (or the return code of a stopped process if the monitor
+        asks for the run to be stopped). '''
+        with compressed_log.open_writer(log_filepath, compress, LOG_BUFFER_SIZE) as fp:
+            fp.write(command_header(proc_cmd, proc_cwd))
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            terminal = terminal_output.terminal_sink(output_mode if echo else "file", prefix,
+                str(proc_cmd[0]), log_filepath)
+            with open(output_filepath, "rb") as output:
+                for chunk in iter(lambda: output.read(READ_CHUNK_SIZE), b""):
+                    fp.write(chunk)
+                    text = decoder.decode(chunk)
+                    if monitor is not None:
+                        monitor.feed(text)
+                        if monitor.abort and not monitor.aborted:
+                            # The output after the chunk would not have been produced
+                            monitor.aborted = True
+                            return_code = -signal.SIGKILL
+                    terminal.write(text)
+                    if monitor is not None and monitor.aborted:
+                        break
+            text = decoder.decode(b"", final=True)
+            if monitor is not None:
+                monitor.feed(text)
+                monitor.finish()
+                if monitor.aborted:
+                    fp.write(str.format("\nStopped at line {}: {}\n", monitor.first_error().log_line,
+                        monitor.first_error().text).encode())
+            terminal.write(text)
+            terminal.close(return_code)
+        future = concurrent.futures.Future()
+        future.set_result(return_code)
+        return future
+
+def command_header(proc_cmd, proc_cwd):
+    ''' The first lines of a tool log (the command and the directory it ran in) '''
+    header = "Executing the following command in directory:" + str(proc_cwd) + "\n\t"
+    header += "".join(str(cmd) + " " for cmd in proc_cmd) + "\n"
+    return header.encode()
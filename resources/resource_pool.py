@@ -0,0 +1,168 @@
+#!/usr/bin/python3
+
+'''
+Admission control for the tools run by the passoff scripts.
+
+Classes:
+  resource_pool: tracks the memory and threads of the host that are available to tool
+    processes and blocks a process from starting until its resources are available
+
+Each tool (vivado, xsim, rars, etc.) has an estimated memory and thread requirement
+(TOOL_RESOURCES). A tool process is only started once these resources can be
+reserved from the pool so that concurrent jobs do not push the host into swap.
+Requests are admitted in the order they are made so that a large request (i.e.,
+vivado) is not starved by a stream of smaller ones.
+
+By default the pool is shared by the threads of a single passoff script. When a
+lock directory is given, the resources are represented by lock files in that
+directory so that several passoff scripts (i.e., batch grading) share the same
+host capacity.
+'''
+
+import collections
+import fcntl
+import os
+import threading
+import time
+
+# Estimated resources needed by each tool: (memory in MB, threads)
+TOOL_RESOURCES = {
+    "vivado"    : (4096, 2),
+    "xelab"     : (1024, 1),
+    "xsim"      : (1024, 1),
+    "xvlog"     : (512, 1),
+    "xvhdl"     : (512, 1),
+    "java"      : (512, 1),
+}
+# Resources for tools that are not in the table
+DEFAULT_TOOL_RESOURCES = (512, 1)
+
+# Memory represented by each lock file when the pool is shared between processes
+MEMORY_TOKEN_MB = 256
+# Lock file held by the process whose request is being admitted
+ADMISSION_LOCK_FILENAME = "admission.lock"
+# Interval for checking whether the tokens held by other processes have been released
+TOKEN_POLL_SECONDS = 0.5
+
+def tool_resources(proc_cmd):
+    ''' Returns the (memory, threads) resources needed to run the given command '''
+    tool = os.path.basename(str(proc_cmd[0]))
+    return TOOL_RESOURCES.get(tool, DEFAULT_TOOL_RESOURCES)
+
+def host_memory_mb():
+    ''' Returns the physical memory of the host in MB '''
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") // (1024 * 1024)
+    except (ValueError, OSError):
+        return 8192
+
+class resource_pool:
+    ''' A pool of host memory and threads. '''
+
+    def __init__(self, memory_mb=None, threads=None, lock_dir=None):
+        self.memory_mb = memory_mb if memory_mb else host_memory_mb()
+        self.threads = threads if threads else os.cpu_count()
+        self.lock_dir = lock_dir
+        self.available_memory_mb = self.memory_mb
+        self.available_threads = self.threads
+        self.condition = threading.Condition()
+        # Requests waiting to be admitted (in order)
+        self.waiting = collections.deque()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+            self.memory_tokens = [ os.path.join(self.lock_dir, str.format("memory_{:04d}.lock", i))
+                for i in range(max(1, self.memory_mb // MEMORY_TOKEN_MB)) ]
+            self.thread_tokens = [ os.path.join(self.lock_dir, str.format("thread_{:04d}.lock", i))
+                for i in range(self.threads) ]
+
+    def clamp(self, memory_mb, threads):
+        ''' Limit a request to the size of the pool (a larger request could never be admitted) '''
+        return (min(memory_mb, self.memory_mb), min(threads, self.threads))
+
+    def acquire(self, memory_mb, threads):
+        ''' Blocks until the given resources are available and reserves them.
+        Returns a reservation that is passed to 'release'. '''
+        memory_mb, threads = self.clamp(memory_mb, threads)
+        if self.lock_dir:
+            return self.acquire_tokens(memory_mb, threads)
+        request = object()
+        with self.condition:
+            self.waiting.append(request)
+            while (self.waiting[0] is not request or self.available_memory_mb < memory_mb or
+                self.available_threads < threads):
+                self.condition.wait()
+            self.waiting.popleft()
+            self.available_memory_mb -= memory_mb
+            self.available_threads -= threads
+            # The next request may fit in what is left
+            self.condition.notify_all()
+        return (memory_mb, threads)
+
+    def release(self, reservation):
+        ''' Returns the resources of a reservation to the pool '''
+        if self.lock_dir:
+            for fd in reservation:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+                os.close(fd)
+            return
+        memory_mb, threads = reservation
+        with self.condition:
+            self.available_memory_mb += memory_mb
+            self.available_threads += threads
+            self.condition.notify_all()
+
+    def lock_tokens(self, token_filenames, count):
+        ''' Lock 'count' of the token files, keeping the tokens already locked while waiting
+        for the others to be released. Returns the list of locked file descriptors. '''
+        locked = {}
+        while True:
+            for token_filename in token_filenames:
+                if len(locked) == count:
+                    return list(locked.values())
+                if token_filename in locked:
+                    continue
+                fd = os.open(token_filename, os.O_RDWR | os.O_CREAT, 0o666)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    locked[token_filename] = fd
+                except OSError:
+                    os.close(fd)
+            if len(locked) == count:
+                return list(locked.values())
+            time.sleep(TOKEN_POLL_SECONDS)
+
+    def acquire_tokens(self, memory_mb, threads):
+        ''' Reserve the resources by locking token files (shared between processes). The
+        requests take turns through the admission lock and the request whose turn it is keeps
+        the tokens it has locked while it waits for the rest. Only that request waits while
+        holding tokens so the requests cannot deadlock. '''
+        memory_count = min(len(self.memory_tokens), -(-memory_mb // MEMORY_TOKEN_MB))
+        fd = os.open(os.path.join(self.lock_dir, ADMISSION_LOCK_FILENAME), os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            memory_fds = self.lock_tokens(self.memory_tokens, memory_count)
+            return memory_fds + self.lock_tokens(self.thread_tokens, threads)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def reserve(self, proc_cmd):
+        ''' Returns a context manager that holds the resources needed by the command '''
+        return resource_reservation(self, *tool_resources(proc_cmd))
+
+class resource_reservation:
+    ''' Context manager for holding resources of a pool while a tool runs '''
+
+    def __init__(self, pool, memory_mb, threads):
+        self.pool = pool
+        self.memory_mb = memory_mb
+        self.threads = threads
+        self.reservation = None
+
+    def __enter__(self):
+        self.reservation = self.pool.acquire(self.memory_mb, self.threads)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.pool.release(self.reservation)
+        return False
@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+
+'''
+Content-addressed cache of test module results.
+
+Classes:
+  result_cache: a local store of the output files of test modules indexed by a key
+    computed from everything that determines the outputs of the module
+
+The key of a test module is computed from the contents of the files it consumes, its
+options (generics, filenames, etc.), the version of the tools it runs, and the
+contents of the files used by the tools (i.e., rars1_4.jar and load_mem.tcl). When a
+module is run with a key that is in the cache, the output files of the module are
+restored from the cache rather than running the tools.
+
+Layout of the cache directory:
+  objects/xx/<sha256>  - the contents of the cached files (content addressed)
+  entries/<key>.json   - the files produced by a module with the given key
+  lock                 - lock file (shared for lookups and stores, exclusive for eviction)
+
+The modification time of an entry is updated whenever it is used and the least recently
+used entries are evicted when the size of the cache exceeds its limit. Files are written
+to a temporary name and renamed so that several processes can share the cache.
+
+The cache may be shared by the users of a group (i.e., the TAs grading on a shared
+machine): the directories of the cache are created group-writable with the setgid bit
+so that the files created in the cache belong to the group of the cache directory, and
+the lock, entries and objects are group-writable.
+'''
+
+import contextlib
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+
+# Size of the blocks used when hashing files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+def read_umask():
+    ''' Returns the umask of the process (from /proc/self/status when available since
+    setting the umask to read it affects every thread of the process) '''
+    with contextlib.suppress(OSError, ValueError):
+        with open("/proc/self/status") as fp:
+            for line in fp:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# Umask of the process (read when the module is imported, before the tests start threads)
+UMASK = read_umask()
+# Modes of the directories (setgid) and files of the cache (writable by the group of the cache)
+SHARED_DIR_MODE = 0o2000 | (0o777 & ~UMASK) | 0o070
+SHARED_FILE_MODE = (0o666 & ~UMASK) | 0o060
+
+def make_shared_dir(directory):
+    ''' Create a directory of the cache (and its missing parents). The mode of the directory
+    is only set when it is created by this process. '''
+    if os.path.isdir(directory):
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(directory)), exist_ok=True)
+    try:
+        os.mkdir(directory)
+    except FileExistsError:
+        return
+    # The mode given to mkdir is masked by the umask and does not set the setgid bit
+    os.chmod(directory, SHARED_DIR_MODE)
+
+def file_hash(filepath):
+    ''' Returns the sha256 of the contents of a file (None if the file does not exist) '''
+    h = hashlib.sha256()
+    try:
+        with open(filepath, "rb") as fp:
+            for block in iter(lambda: fp.read(HASH_BLOCK_SIZE), b""):
+                h.update(block)
+    except (FileNotFoundError, IsADirectoryError):
+        return None
+    return h.hexdigest()
+
+def tool_version(tool):
+    ''' Returns a string that identifies the installed version of a tool executable. The
+    resolved path of the executable (the Xilinx tools are installed in a directory named
+    after the version) along with its size and modification time are used so that the
+    tool does not need to be run. '''
+    tool_path = shutil.which(tool)
+    if tool_path is None:
+        return tool + ":missing"
+    tool_path = os.path.realpath(tool_path)
+    st = os.stat(tool_path)
+    return str.format("{}:{}:{}:{}", tool, tool_path, st.st_size, int(st.st_mtime))
+
+def object_options(obj):
+    ''' Returns the options of an object (the attributes set when the object was created)
+    as a dictionary. Nested objects (i.e., the steps of an update chain) are included. '''
+    options = { "__class__" : type(obj).__name__ }
+    for name, value in sorted(vars(obj).items()):
+        if name.endswith("_filepath"):
+            # Set while the module runs
+            continue
+        options[name] = value
+    return options
+
+def module_options(test_module):
+    ''' Returns the options of a test module as a string '''
+    def encode(value):
+        if hasattr(value, "__dict__"):
+            return object_options(value)
+        return str(value)
+    return json.dumps(object_options(test_module), sort_keys=True, default=encode)
+
+class result_cache:
+    ''' A size-bounded content-addressed cache of output files '''
+
+    def __init__(self, cache_dir, max_size_mb=2048):
+        self.cache_dir = str(cache_dir)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.objects_dir = os.path.join(self.cache_dir, "objects")
+        self.entries_dir = os.path.join(self.cache_dir, "entries")
+        for directory in (self.cache_dir, self.objects_dir, self.entries_dir):
+            make_shared_dir(directory)
+        self.lock_filepath = os.path.join(self.cache_dir, "lock")
+        if not os.path.exists(self.lock_filepath):
+            with contextlib.suppress(FileExistsError):
+                fd = os.open(self.lock_filepath, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o666 & ~UMASK)
+                try:
+                    os.fchmod(fd, SHARED_FILE_MODE)
+                finally:
+                    os.close(fd)
+
+    @contextlib.contextmanager
+    def locked(self, exclusive=False):
+        ''' Context manager that holds the lock of the cache '''
+        try:
+            fd = os.open(self.lock_filepath, os.O_RDWR | os.O_CREAT, 0o666 & ~UMASK)
+        except PermissionError:
+            # A lock file of another user that is not writable by the group (flock only
+            # needs the file to be open)
+            fd = os.open(self.lock_filepath, os.O_RDONLY)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def module_key(self, lab_test, test_module):
+        ''' Computes the key of a test module from its inputs, options and tools '''
+        h = hashlib.sha256()
+        h.update(module_options(test_module).encode())
+        # Files consumed by the module (glob patterns are matched in the execution path)
+        for input_file in sorted(set(str(f) for f in test_module.input_files(lab_test))):
+            if glob.has_magic(input_file):
+                matches = sorted(glob.glob(os.path.join(str(lab_test.execution_path), input_file)))
+                for filepath in matches:
+                    h.update(str.format("{}={}\n", os.path.basename(filepath), file_hash(filepath)).encode())
+            else:
+                filepath = os.path.join(str(lab_test.execution_path), input_file)
+                h.update(str.format("{}={}\n", os.path.normpath(input_file), file_hash(filepath)).encode())
+        # Test files that are read by the tools without being named in the options
+        for filename in sorted(lab_test.testfiles_dict.values()):
+            filepath = lab_test.submission_lab_path / filename
+            h.update(str.format("{}={}\n", os.path.normpath(filename), file_hash(filepath)).encode())
+        # Tools and the other files used by the tools (only the contents of files outside of
+        # the execution path are used so that the key does not depend on the extract directory)
+        for tool in test_module.cache_tools():
+            h.update(tool_version(tool).encode())
+        for filename in test_module.cache_files(lab_test):
+            filepath = os.path.join(str(lab_test.execution_path), str(filename))
+            h.update(str.format("{}={}\n", os.path.basename(str(filename)), file_hash(filepath)).encode())
+        return h.hexdigest()
+
+    def entry_filepath(self, key):
+        return os.path.join(self.entries_dir, key + ".json")
+
+    def object_filepath(self, file_hash_value):
+        return os.path.join(self.objects_dir, file_hash_value[:2], file_hash_value)
+
+    def write_atomic(self, filepath, src_filepath=None, data=None, shared=False):
+        ''' Write a file by copying the source file (or writing the data) to a temporary
+        file in the same directory and renaming it. Shared files (the entries and objects of
+        the cache) are writable by the group of the cache. '''
+        directory = os.path.dirname(filepath)
+        if shared:
+            make_shared_dir(directory)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        fd, tmp_filepath = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                if src_filepath is not None:
+                    with open(src_filepath, "rb") as src:
+                        shutil.copyfileobj(src, fp, HASH_BLOCK_SIZE)
+                else:
+                    fp.write(data)
+            os.chmod(tmp_filepath, SHARED_FILE_MODE if shared else 0o666 & ~UMASK)
+            os.replace(tmp_filepath, filepath)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_filepath)
+            raise
+
+    def lookup(self, key):
+        ''' Returns the entry of the key (a dictionary of output filename to object hash)
+        or None if the key is not in the cache '''
+        entry_filepath = self.entry_filepath(key)
+        with self.locked():
+            try:
+                with open(entry_filepath) as fp:
+                    entry = json.load(fp)
+            except (FileNotFoundError, ValueError):
+                return None
+            # Make sure all of the objects still exist
+            for file_hash_value in entry["files"].values():
+                if not os.path.exists(self.object_filepath(file_hash_value)):
+                    return None
+            # Mark the entry as recently used
+            with contextlib.suppress(OSError):
+                os.utime(entry_filepath)
+        return entry
+
+    def restore(self, entry, dest_dir):
+        ''' Restore the files of an entry into the destination directory. Returns the list
+        of files that were restored. '''
+        restored = []
+        with self.locked():
+            for filename, file_hash_value in sorted(entry["files"].items()):
+                self.write_atomic(os.path.join(str(dest_dir), filename),
+                    src_filepath=self.object_filepath(file_hash_value))
+                restored.append(filename)
+        return restored
+
+    def store(self, key, src_dir, output_files):
+        ''' Store the output files (relative to the source directory) under the key. Files
+        that do not exist (or are directories) are not stored. '''
+        entry = { "files" : {}, "time" : time.time() }
+        with self.locked():
+            for filename in output_files:
+                filepath = os.path.join(str(src_dir), str(filename))
+                if not os.path.isfile(filepath):
+                    continue
+                file_hash_value = file_hash(filepath)
+                object_filepath = self.object_filepath(file_hash_value)
+                if not os.path.exists(object_filepath):
+                    self.write_atomic(object_filepath, src_filepath=filepath, shared=True)
+                entry["files"][os.path.normpath(str(filename))] = file_hash_value
+            self.write_atomic(self.entry_filepath(key), data=json.dumps(entry, indent=1).encode(), shared=True)
+        self.evict()
+
+    def size(self):
+        ''' Returns the total size of the objects in the cache '''
+        total = 0
+        for root, _, files in os.walk(self.objects_dir):
+            for filename in files:
+                with contextlib.suppress(OSError):
+                    total += os.path.getsize(os.path.join(root, filename))
+        return total
+
+    def evict(self):
+        ''' Remove the least recently used entries (and the objects that are no longer
+        referenced) until the cache is within its size limit '''
+        if self.size() <= self.max_size:
+            return
+        with self.locked(exclusive=True):
+            entries = []
+            for entry_filename in os.listdir(self.entries_dir):
+                entry_filepath = os.path.join(self.entries_dir, entry_filename)
+                with contextlib.suppress(OSError, ValueError):
+                    with open(entry_filepath) as fp:
+                        entry = json.load(fp)
+                    entries.append((os.path.getmtime(entry_filepath), entry_filepath, entry))
+            entries.sort(key=lambda e: e[0])
+            # Size of each object and the number of entries that reference it
+            references = {}
+            for _, _, entry in entries:
+                for file_hash_value in set(entry["files"].values()):
+                    references[file_hash_value] = references.get(file_hash_value, 0) + 1
+            total = self.size()
+            for _, entry_filepath, entry in entries:
+                if total <= self.max_size:
+                    break
+                os.remove(entry_filepath)
+                for file_hash_value in set(entry["files"].values()):
+                    references[file_hash_value] -= 1
+                    if references[file_hash_value] == 0:
+                        object_filepath = self.object_filepath(file_hash_value)
+                        with contextlib.suppress(OSError):
+                            total -= os.path.getsize(object_filepath)
+                            os.remove(object_filepath)
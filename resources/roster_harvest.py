@@ -0,0 +1,246 @@
+#!/usr/bin/python3
+
+'''
+Harvest the submissions of a roster into a shared git object store.
+
+Classes:
+  harvest_store: a bare repository holding the objects of every submission of a roster
+    (and of the starter code) with one reference per submission tag
+  harvest_result: the outcome of harvesting a single submission
+
+The repositories of the students share most of their history with the starter code.
+Rather than cloning every repository on its own, the lab tag of every repository is
+fetched into a single bare repository (a limited number of fetches at a time) so that
+the shared objects are downloaded and stored once. The tag of a submission is stored as
+'refs/submissions/<name>/<tag>'. Each submission is then materialized as a worktree of
+the store (a checkout that shares the objects of the store and whose 'origin' is the
+repository of the student) or as a plain export of its files (--archive). The passoff
+scripts grade a materialized submission with the --submission_dir option.
+
+Usage:
+  roster_harvest.py <lab> <roster> [--store <dir>] [--output_dir <dir>] [--connections N]
+'''
+
+# Command line argunent parser
+import argparse
+import concurrent.futures
+import json
+import os
+# Manages file paths
+import pathlib
+# Shell utilities for removing directories
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import time
+
+# Roster of the submissions
+import batch_passoff
+
+# References of the submissions in the store
+SUBMISSION_REF_PREFIX = "refs/submissions"
+# References of the starter code in the store
+STARTER_REF_PREFIX = "refs/starter"
+# Summary of the materialized submissions (in the output directory)
+MANIFEST_FILENAME = "harvest.json"
+
+class harvest_result:
+    ''' The outcome of harvesting a single submission '''
+
+    def __init__(self, name, repo, tag):
+        self.name = name
+        self.repo = repo
+        self.tag = tag
+        self.commit = None
+        self.path = None
+        self.error = None
+        self.elapsed = 0.0
+
+    def as_dict(self):
+        return { "name" : self.name, "repo" : self.repo, "tag" : self.tag, "commit" : self.commit,
+            "path" : str(self.path) if self.path else None, "error" : self.error,
+            "elapsed" : round(self.elapsed, 3) }
+
+class harvest_store:
+    ''' A bare repository shared by the submissions of a roster '''
+
+    def __init__(self, store_path):
+        self.store_path = pathlib.Path(store_path).expanduser().absolute()
+        # Serializes the changes to the worktree list of the store
+        self.lock = threading.Lock()
+
+    def git(self, *args, **kwargs):
+        ''' Run a git command on the store '''
+        # No automatic garbage collection while fetches are running concurrently
+        cmd = ["git", "--git-dir", str(self.store_path), "-c", "gc.auto=0"] + list(args)
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True, **kwargs)
+
+    def create(self):
+        ''' Create the store (if it does not exist) '''
+        if not (self.store_path / "HEAD").exists():
+            self.store_path.mkdir(parents=True, exist_ok=True)
+            subprocess.run(["git", "init", "--quiet", "--bare", str(self.store_path)], check=True)
+        # The origin of each worktree is the repository of its student. With per-worktree
+        # configuration, 'core.bare' must only apply to the store (not to its worktrees).
+        if self.git("config", "--get", "extensions.worktreeConfig").stdout.strip() != "true":
+            self.git("config", "extensions.worktreeConfig", "true")
+            self.git("config", "--unset", "core.bare")
+            self.git("config", "--worktree", "core.bare", "true")
+
+    def seed(self, starter_repo):
+        ''' Fetch the starter code so that the fetches of the submissions only download the
+        objects of the students '''
+        p = self.git("fetch", "--quiet", "--no-tags", "--no-write-fetch-head", "--force", starter_repo,
+            "+refs/heads/*:" + STARTER_REF_PREFIX + "/*")
+        return p.returncode == 0
+
+    def submission_ref(self, name, tag):
+        return str.format("{}/{}/{}", SUBMISSION_REF_PREFIX, name, tag)
+
+    def fetch(self, result):
+        ''' Fetch the tag of a submission into the store '''
+        start_time = time.time()
+        # (FETCH_HEAD is not written: it would be rewritten by each of the concurrent fetches)
+        p = self.git("fetch", "--quiet", "--no-tags", "--no-write-fetch-head", "--force", result.repo,
+            str.format("+refs/tags/{}:{}", result.tag, self.submission_ref(result.name, result.tag)))
+        if p.returncode:
+            result.error = p.stderr.strip().splitlines()[0] if p.stderr.strip() else "git fetch failed"
+        else:
+            p = self.git("rev-parse", "--verify", "--quiet",
+                self.submission_ref(result.name, result.tag) + "^{commit}")
+            result.commit = p.stdout.strip()
+        result.elapsed = time.time() - start_time
+        return result
+
+    def add_worktree(self, result, path):
+        ''' Check out a submission as a worktree of the store at the given path '''
+        path = pathlib.Path(path).absolute()
+        with self.lock:
+            self.remove_worktree(path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            p = self.git("worktree", "add", "--force", "--detach", str(path), result.commit)
+        if p.returncode:
+            result.error = "git worktree add failed: " + p.stderr.strip()
+            return False
+        subprocess.run(["git", "config", "--worktree", "remote.origin.url", result.repo],
+            cwd=str(path), check=True)
+        result.path = path
+        return True
+
+    def remove_worktree(self, path):
+        ''' Remove an earlier checkout (worktree or export) at the given path '''
+        if path.exists():
+            if (path / ".git").is_file():
+                self.git("worktree", "remove", "--force", str(path))
+            shutil.rmtree(str(path), ignore_errors=True)
+        self.git("worktree", "prune")
+
+    def export(self, result, path):
+        ''' Export the files of a submission (without a repository) to the given path. The
+        archive of the submission is extracted with the 'data' filter of tarfile (no absolute
+        paths, links out of the export or special files). Without the filter (older versions
+        of Python), the files are checked out by git instead. '''
+        path = pathlib.Path(path).absolute()
+        with self.lock:
+            self.remove_worktree(path)
+        path.mkdir(parents=True)
+        if not hasattr(tarfile, "data_filter"):
+            return self.checkout_files(result, path)
+        cmd = ["git", "--git-dir", str(self.store_path), "archive", "--format=tar", result.commit]
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        try:
+            with tarfile.open(fileobj=proc.stdout, mode="r|") as archive:
+                archive.extractall(str(path), filter="data")
+        except tarfile.FilterError as e:
+            result.error = "unsafe file in submission: " + str(e)
+            proc.kill()
+        finally:
+            proc.stdout.close()
+        if proc.wait() and result.error is None:
+            result.error = "git archive failed"
+        if result.error:
+            return False
+        result.path = path
+        return True
+
+    def checkout_files(self, result, path):
+        ''' Check out the files of a submission to the given path (through a temporary index
+        so that the store is not changed) '''
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = dict(os.environ, GIT_INDEX_FILE=os.path.join(tmp_dir, "index"))
+            p = self.git("read-tree", result.commit, env=env)
+            if p.returncode == 0:
+                p = self.git("--work-tree", str(path), "checkout-index", "--all", env=env)
+        if p.returncode:
+            result.error = "git checkout-index failed: " + p.stderr.strip()
+            return False
+        result.path = path
+        return True
+
+def harvest(store, submissions, tag, output_path, connections=8, archive=False):
+    ''' Fetch the tag of every submission into the store (at most 'connections' fetches at
+    a time) and materialize each submission in '<output_path>/<name>/repo'.
+    Returns a list of 'harvest_result' objects (in the order of the submissions). '''
+    results = [ harvest_result(s.name, s.repo, tag) for s in submissions ]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=connections) as executor:
+        for result in executor.map(store.fetch, results):
+            if result.error:
+                print(str.format(" {}: {}", result.name, result.error))
+    for result in results:
+        if result.error:
+            continue
+        path = output_path / result.name / "repo"
+        if archive:
+            store.export(result, path)
+        else:
+            store.add_worktree(result, path)
+    with open(output_path / MANIFEST_FILENAME, "w") as fp:
+        json.dump([ r.as_dict() for r in results ], fp, indent=1)
+    return results
+
+def main():
+    ''' Main executable for script
+    '''
+
+    parser = argparse.ArgumentParser(description="Fetch the submissions of a roster into a shared object store")
+    parser.add_argument("lab", type=int, help="Lab number")
+    parser.add_argument("roster", type=str, help="Roster file (one repository URL or path per line)")
+    parser.add_argument("--store", type=str, default="~/.cache/ecen323_passoff/harvest_store",
+        help="Bare repository shared by the submissions")
+    parser.add_argument("--output_dir", type=str, default="batch_passoff",
+        help="Directory where each submission is checked out (<output_dir>/<name>/repo)")
+    parser.add_argument("-c", "--connections", type=int, default=8,
+        help="Number of repositories fetched at the same time (default 8)")
+    parser.add_argument("--starter_repo", type=str,
+        help="Starter code repository (URL or path) fetched into the store first")
+    parser.add_argument("--archive", action="store_true",
+        help="Export the files of each submission rather than checking it out as a worktree of the store")
+    args = parser.parse_args()
+
+    submissions = batch_passoff.read_roster(args.roster)
+    if len(submissions) == 0:
+        print("No submissions in roster", args.roster)
+        return 1
+    store = harvest_store(args.store)
+    store.create()
+    if args.starter_repo and not store.seed(args.starter_repo):
+        print("Cannot fetch the starter code", args.starter_repo)
+    output_path = pathlib.Path(args.output_dir).absolute()
+    output_path.mkdir(parents=True, exist_ok=True)
+
+    tag = str.format("lab{}_submission", args.lab)
+    print(str.format("Harvesting {} submissions for lab {} ({} at a time)",
+        len(submissions), args.lab, args.connections))
+    start_time = time.time()
+    results = harvest(store, submissions, tag, output_path, args.connections, args.archive)
+    failed = [ r for r in results if r.error ]
+    print(str.format("{} of {} submissions harvested in {:.1f}s into {}", len(results) - len(failed),
+        len(results), time.time() - start_time, output_path))
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
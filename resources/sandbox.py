@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+
+'''
+Private work directories for running test modules.
+
+Classes:
+  module_sandbox: a scratch directory that mirrors the part of the repository used by a
+    test module. The inputs of the module are linked into the sandbox and its outputs
+    are published back to the execution directory when it completes.
+
+The sandbox mirrors the directory tree that contains the repository and the execution
+directory so that the relative filenames used by the test modules (i.e., "../lab02/alu.sv")
+resolve to the same files in the sandbox. Input files are cloned (reflink) when the file
+system supports it, otherwise hard linked, otherwise copied. Files that are both an input
+and an output of the module are always copied so that the tools never write to a file that
+is shared with the execution directory. Outputs are published by linking (or copying) them
+to a temporary name in the execution directory and renaming them over the old files.
+'''
+
+import contextlib
+import fcntl
+import glob
+import os
+import pathlib
+import shutil
+import tempfile
+
+# ioctl for cloning a file on file systems with copy-on-write support (btrfs, xfs)
+FICLONE = 0x40049409
+
+def clone_file(src, dst):
+    ''' Clone a file (copy-on-write). Returns False if the file system does not support it. '''
+    try:
+        with open(src, "rb") as src_fp, open(dst, "wb") as dst_fp:
+            fcntl.ioctl(dst_fp.fileno(), FICLONE, src_fp.fileno())
+        shutil.copystat(src, dst)
+        return True
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(dst)
+        return False
+
+def link_file(src, dst, writable=False):
+    ''' Populate 'dst' with the contents of 'src' without copying the data if possible.
+    A 'writable' file is never hard linked. '''
+    if clone_file(src, dst):
+        return
+    if not writable:
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+
+class module_sandbox:
+    ''' The private work directory of a test module '''
+
+    def __init__(self, sandbox_root, execution_path, submission_lab_path, submission_top_path, name="module"):
+        self.real_execution_path = pathlib.Path(execution_path)
+        # The root of the mirrored directory tree
+        self.mirror_root = pathlib.Path(os.path.commonpath([ os.path.realpath(execution_path),
+            os.path.realpath(submission_lab_path), os.path.realpath(submission_top_path) ]))
+        os.makedirs(sandbox_root, exist_ok=True)
+        self.path = pathlib.Path(tempfile.mkdtemp(dir=str(sandbox_root), prefix=name + "_"))
+        self.execution_path = self.mirror_path(execution_path)
+        self.submission_lab_path = self.mirror_path(submission_lab_path)
+        self.submission_top_path = self.mirror_path(submission_top_path)
+        self.execution_path.mkdir(parents=True, exist_ok=True)
+
+    def mirror_path(self, path):
+        ''' Returns the location of a path in the sandbox '''
+        return self.path / os.path.relpath(os.path.realpath(path), self.mirror_root)
+
+    def link_inputs(self, filenames, output_filenames=[]):
+        ''' Link files (relative to the execution directory or absolute) into the sandbox.
+        Glob patterns are matched in the execution directory. Files outside of the mirrored
+        tree and files that do not exist are skipped. '''
+        outputs = set(os.path.normpath(str(f)) for f in output_filenames)
+        for filename in filenames:
+            filename = str(filename)
+            pattern = os.path.join(str(self.real_execution_path), filename)
+            matches = glob.glob(pattern) if glob.has_magic(filename) else [ pattern ]
+            for src in matches:
+                src = os.path.realpath(src) if os.path.islink(src) else os.path.normpath(src)
+                if not os.path.isfile(src):
+                    continue
+                if os.path.commonpath([ str(self.mirror_root), os.path.realpath(src) ]) != str(self.mirror_root):
+                    continue
+                dst = self.mirror_path(src)
+                if dst.exists():
+                    continue
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                writable = os.path.normpath(os.path.relpath(src, str(self.real_execution_path))) in outputs
+                link_file(src, str(dst), writable)
+
+    def publish(self, output_filenames):
+        ''' Move the outputs of the module (relative to the execution directory) from the sandbox
+        to the execution directory. Returns the list of files that were published. '''
+        published = []
+        for filename in output_filenames:
+            src = self.execution_path / filename
+            dst = self.real_execution_path / filename
+            if src.is_dir():
+                self.publish_dir(src, dst)
+            elif src.is_file():
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                tmp_dst = str.format("{}.{}.tmp", dst, os.getpid())
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(tmp_dst)
+                try:
+                    os.link(str(src), tmp_dst)
+                except OSError:
+                    shutil.copy2(str(src), tmp_dst)
+                os.replace(tmp_dst, str(dst))
+            else:
+                continue
+            published.append(str(filename))
+        return published
+
+    def publish_dir(self, src, dst):
+        ''' Replace a directory of the execution directory with a directory of the sandbox '''
+        tmp_dst = pathlib.Path(str.format("{}.{}.tmp", dst, os.getpid()))
+        shutil.rmtree(tmp_dst, ignore_errors=True)
+        shutil.move(str(src), str(tmp_dst))
+        old_dst = None
+        if dst.exists():
+            old_dst = pathlib.Path(str.format("{}.{}.old", dst, os.getpid()))
+            os.rename(dst, old_dst)
+        os.rename(tmp_dst, dst)
+        if old_dst:
+            shutil.rmtree(old_dst, ignore_errors=True)
+
+    def remove(self):
+        ''' Delete the sandbox '''
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+
+'''
+Routing of the tool output to the terminal.
+
+Classes:
+  terminal_sink: copies the output of one tool process to the terminal according to the
+    output mode of its test module
+
+The output of a tool is always written to its log file. The output mode selects what
+is shown on the terminal:
+  tee: all of the output (with the prefix of the test module on each line)
+  file: nothing
+  summary: one line when the tool completes (number of lines, return code and log file)
+    and the last lines of the output when the tool fails
+  ratelimit: the output up to RATE_LIMIT_LINES lines per second (with bursts of up to
+    RATE_LIMIT_BURST lines). The lines beyond the limit are counted and a progress line
+    with the number of lines that were not shown is printed every PROGRESS_SECONDS.
+
+The terminal is written with one write (and flush) per chunk of output so that a slow
+terminal (i.e., over ssh) does not slow down the tools more than necessary.
+'''
+
+import collections
+import os
+import sys
+import threading
+import time
+
+OUTPUT_MODES = ("tee", "file", "summary", "ratelimit")
+DEFAULT_OUTPUT_MODE = "tee"
+
+# Lines per second shown in 'ratelimit' mode and the size of the bursts that are shown
+RATE_LIMIT_LINES = 20
+RATE_LIMIT_BURST = 100
+# Interval between the progress lines of the output that is not shown
+PROGRESS_SECONDS = 5.0
+# Lines of output shown when a tool fails ('summary') or at the end of a limited output ('ratelimit')
+TAIL_LINES = 10
+
+# Serializes the terminal output of all of the tools
+terminal_lock = threading.Lock()
+
+def write_terminal(text):
+    with terminal_lock:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+class terminal_sink:
+    ''' Shows the output of a tool on the terminal '''
+
+    def __init__(self, mode=DEFAULT_OUTPUT_MODE, prefix="", tool="", log_filepath=None):
+        if mode not in OUTPUT_MODES:
+            raise ValueError(str.format("Unknown output mode {} (expected one of {})", mode, ", ".join(OUTPUT_MODES)))
+        self.mode = mode
+        self.prefix = prefix
+        self.tool = tool
+        self.log_filepath = log_filepath
+        self.partial_line = ""
+        # Set when the output copied to the terminal as is ('tee' without a prefix) ends in the middle of a line
+        self.open_line = False
+        self.line_count = 0
+        self.tail = collections.deque(maxlen=TAIL_LINES)
+        # Rate limit state
+        self.tokens = RATE_LIMIT_BURST
+        self.last_refill = time.monotonic()
+        self.last_progress = self.last_refill
+        self.suppressed = 0
+
+    def write(self, text):
+        ''' Process a chunk of output (which may end in the middle of a line) '''
+        if text == "" or self.mode == "file":
+            return
+        if self.mode == "tee" and not self.prefix:
+            write_terminal(text)
+            self.open_line = not text.endswith("\n")
+            return
+        lines = (self.partial_line + text).split("\n")
+        self.partial_line = lines.pop()
+        self.write_lines(lines)
+
+    def write_lines(self, lines):
+        self.line_count += len(lines)
+        if self.mode == "summary":
+            self.tail.extend(lines)
+            return
+        if self.mode == "ratelimit":
+            lines = self.limit(lines)
+        if lines:
+            write_terminal("".join(self.prefix + line + "\n" for line in lines))
+
+    def limit(self, lines):
+        ''' Returns the lines that may be shown and counts the others '''
+        now = time.monotonic()
+        self.tokens = min(RATE_LIMIT_BURST, self.tokens + (now - self.last_refill) * RATE_LIMIT_LINES)
+        self.last_refill = now
+        shown = lines[:int(self.tokens)]
+        self.tokens -= len(shown)
+        hidden = lines[len(shown):]
+        self.suppressed += len(hidden)
+        self.tail.extend(hidden)
+        if self.suppressed and now - self.last_progress >= PROGRESS_SECONDS:
+            shown.append(self.progress_line())
+        if shown:
+            self.last_progress = now
+        return shown
+
+    def progress_line(self):
+        line = str.format("... {} lines not shown ({} lines of output so far)", self.suppressed, self.line_count)
+        self.suppressed = 0
+        self.tail.clear()
+        return line
+
+    def close(self, return_code=0):
+        ''' The tool completed: show the end of its output (depending on the mode) '''
+        if self.open_line:
+            write_terminal("\n")
+            self.open_line = False
+        if self.partial_line:
+            self.write_lines([ self.partial_line ])
+            self.partial_line = ""
+        if self.mode == "summary":
+            summary = [ str.format("{} completed with return code {} ({} lines of output in {})", self.tool,
+                return_code, self.line_count, os.path.basename(str(self.log_filepath))) ]
+            if return_code != 0:
+                summary.extend(self.tail)
+            write_terminal("".join(self.prefix + line + "\n" for line in summary))
+        elif self.mode == "ratelimit" and self.suppressed:
+            last_lines = list(self.tail)
+            skipped = self.suppressed - len(last_lines)
+            lines = []
+            if skipped > 0:
+                self.suppressed = skipped
+                lines.append(self.progress_line())
+            lines.extend(last_lines)
+            write_terminal("".join(self.prefix + line + "\n" for line in lines))
@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+
+'''
+Machine readable results of a passoff run.
+
+Classes:
+  tool_run: a tool process run by a test module (step, exit code, duration, log, phase
+    timing, the errors found in its output and whether it was replayed)
+  module_result: the result of a test module (status, timestamps, cache hit and tool runs)
+  run_results: the results of all of the test modules of a run, written as JSON and
+    (optionally) as JUnit XML
+
+The JSON document is written next to the text result file (labN_test_result.json) so
+that batch runs can aggregate the results of many submissions and find the slow steps
+without parsing the terminal output. The status of a module is one of:
+  passed, failed, timeout: the module ran (or its outputs were restored from the cache)
+  skipped: the module was not run (a module it depends on failed or an earlier error)
+'''
+
+import datetime
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+# Phase timing of the tool output
+import log_timing
+
+# Maximum number of findings recorded for a tool run
+MAX_FINDINGS = 20
+
+# Step of the test module performed by each tool
+TOOL_STEPS = { "xvlog" : "analyze", "xvhdl" : "analyze", "xelab" : "elaborate", "xsim" : "simulate",
+    "vivado" : "build", "java" : "rars" }
+
+def timestamp():
+    ''' Returns the current time as an ISO 8601 string '''
+    return datetime.datetime.now().astimezone().isoformat(timespec="milliseconds")
+
+def tool_step(tool, log_filepath):
+    ''' Returns the step (analyze, elaborate, simulate, build, update, rars) of a tool run '''
+    tool = os.path.basename(str(tool))
+    step = TOOL_STEPS.get(tool, tool)
+    if step == "build" and str(log_filepath).endswith("_update.txt"):
+        return "update"
+    return step
+
+class tool_run:
+    ''' A tool process run by a test module '''
+
+    def __init__(self, proc_cmd, log_filepath, execution_path):
+        self.tool = os.path.basename(str(proc_cmd[0]))
+        self.step = tool_step(self.tool, log_filepath)
+        self.command = [ str(arg) for arg in proc_cmd ]
+        # The log relative to the execution directory (the logs of a sandbox are published there)
+        self.log = os.path.relpath(str(log_filepath), str(execution_path))
+        self.start = timestamp()
+        self.start_time = time.monotonic()
+        self.duration = None
+        self.exit_code = None
+        self.findings = []
+        self.error_count = 0
+        self.timing = log_timing.phase_timing()
+        # Set when the output of a recorded run was replayed (see tool_replay)
+        self.replayed = False
+
+    def started(self):
+        ''' The process started (after waiting for the host resources) '''
+        self.start = timestamp()
+        self.start_time = time.monotonic()
+
+    def finish(self, exit_code, monitor=None):
+        self.duration = round(time.monotonic() - self.start_time, 3)
+        self.exit_code = exit_code
+        if monitor is not None:
+            self.error_count = len(monitor.errors)
+            self.findings = [ finding.as_dict() for finding in monitor.findings
+                if finding.severity != "WARNING" ][:MAX_FINDINGS]
+            self.timing = monitor.timing
+
+    def as_dict(self):
+        return { "step" : self.step, "tool" : self.tool, "command" : self.command, "log" : self.log,
+            "start" : self.start, "duration" : self.duration, "exit_code" : self.exit_code,
+            "errors" : self.error_count, "findings" : self.findings, "phases" : self.timing.as_list(),
+            "replayed" : self.replayed }
+
+class module_result:
+    ''' The result of a test module '''
+
+    def __init__(self, name):
+        self.name = name
+        self.step = None
+        self.status = None
+        self.reason = None
+        self.start = timestamp()
+        self.start_time = time.monotonic()
+        self.end = None
+        self.duration = None
+        self.cached = False
+        self.restored_files = []
+        self.problems = []
+        self.tool_runs = []
+        # Tool runs are added from the process runner thread
+        self.lock = threading.Lock()
+
+    def add_tool_run(self, run):
+        with self.lock:
+            self.tool_runs.append(run)
+
+    def finish(self, status, reason=None):
+        self.status = status
+        self.reason = reason
+        self.end = timestamp()
+        self.duration = round(time.monotonic() - self.start_time, 3)
+
+    def step_durations(self):
+        ''' Returns the total duration of the tool runs of each step '''
+        durations = {}
+        with self.lock:
+            for run in self.tool_runs:
+                if run.duration is not None:
+                    durations[run.step] = round(durations.get(run.step, 0.0) + run.duration, 3)
+        return durations
+
+    def phases(self):
+        ''' Returns the timing of the phases of all of the tool runs (see log_timing) '''
+        timing = log_timing.phase_timing()
+        with self.lock:
+            for run in self.tool_runs:
+                timing.merge(run.timing)
+        return timing.as_list()
+
+    def first_error(self):
+        ''' Returns the first error finding of the module (None if there is none) '''
+        with self.lock:
+            for run in self.tool_runs:
+                for finding in run.findings:
+                    if finding["severity"] in ("ERROR", "FATAL"):
+                        return finding
+        return None
+
+    def as_dict(self):
+        with self.lock:
+            tool_runs = [ run.as_dict() for run in self.tool_runs ]
+        return { "name" : self.name, "step" : self.step, "status" : self.status, "reason" : self.reason,
+            "start" : self.start, "end" : self.end, "duration" : self.duration,
+            "step_durations" : self.step_durations(), "phases" : self.phases(), "cached" : self.cached,
+            "restored_files" : self.restored_files, "problems" : self.problems, "tool_runs" : tool_runs }
+
+class run_results:
+    ''' The results of the test modules of a passoff run '''
+
+    def __init__(self, lab_name):
+        self.lab_name = lab_name
+        self.start = timestamp()
+        self.start_time = time.monotonic()
+        self.modules = []
+        self.lock = threading.Lock()
+
+    def add_module(self, name):
+        result = module_result(name)
+        with self.lock:
+            self.modules.append(result)
+        return result
+
+    def counts(self):
+        counts = { "passed" : 0, "failed" : 0, "timeout" : 0, "skipped" : 0 }
+        for result in self.modules:
+            if result.status in counts:
+                counts[result.status] += 1
+        return counts
+
+    def as_dict(self, info={}):
+        document = { "lab" : self.lab_name, "start" : self.start, "end" : timestamp(),
+            "duration" : round(time.monotonic() - self.start_time, 3) }
+        document.update(info)
+        with self.lock:
+            document["summary"] = self.counts()
+            document["modules"] = [ result.as_dict() for result in self.modules ]
+        return document
+
+    def write_json(self, filepath, info={}):
+        tmp_filepath = str(filepath) + ".tmp"
+        with open(tmp_filepath, "w") as fp:
+            json.dump(self.as_dict(info), fp, indent=1)
+            fp.write("\n")
+        os.replace(tmp_filepath, str(filepath))
+
+    def write_junit(self, filepath):
+        ''' Write the results as a JUnit XML test suite (one test case per test module) '''
+        with self.lock:
+            modules = list(self.modules)
+            counts = self.counts()
+        suite = ET.Element("testsuite", name=self.lab_name, tests=str(len(modules)),
+            failures=str(counts["failed"] + counts["timeout"]), skipped=str(counts["skipped"]),
+            timestamp=self.start, time=str(round(time.monotonic() - self.start_time, 3)))
+        for result in modules:
+            case = ET.SubElement(suite, "testcase", classname=self.lab_name, name=result.name,
+                time=str(result.duration or 0))
+            if result.status in ("failed", "timeout"):
+                first_error = result.first_error()
+                message = result.reason or (first_error["message"] if first_error else "")
+                failure = ET.SubElement(case, "failure", type=result.status, message=message)
+                if first_error is not None:
+                    failure.text = str.format("{} [{}] {}", first_error["severity"], first_error["code"],
+                        first_error["message"])
+                    if first_error["file"] is not None:
+                        failure.text = str.format("{}:{}: {}", first_error["file"], first_error["line"], failure.text)
+            elif result.status == "skipped":
+                ET.SubElement(case, "skipped", message=result.reason or "")
+            with result.lock:
+                logs = [ run.log for run in result.tool_runs ]
+            if logs:
+                ET.SubElement(case, "system-out").text = "\n".join(logs)
+        root = ET.Element("testsuites")
+        root.append(suite)
+        ET.ElementTree(root).write(str(filepath), encoding="utf-8", xml_declaration=True)
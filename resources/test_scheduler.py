@@ -0,0 +1,176 @@
+#!/usr/bin/python3
+
+'''
+Dependency-graph scheduler for running the test modules of a lab passoff.
+
+Classes:
+  test_node: a single test module within the dependency graph
+  test_scheduler: builds the graph from the files each test module consumes and
+    produces and runs the ready modules on a bounded pool of workers
+
+Each test module declares the files it consumes ('input_files') and the files it
+produces ('output_files'). A module depends on the most recent earlier module that
+produces one of its inputs (read after write): it only runs if that module passed and
+it is cancelled otherwise. A module that produces a file also runs after the earlier
+modules that produced or consumed that file (write after write, write after read) so
+that the registration order is preserved for shared files. These ordering edges do not
+carry data: the module runs once the earlier modules have finished, whether or not
+they passed. Input names may be glob patterns (i.e., "*.mem") to depend on every
+earlier module producing a matching file; a later module producing a matching file
+runs after the modules that consumed the pattern.
+
+When the modules run in their own work directories (sandboxed), a module never sees
+the files being written by another module, so only the read after write dependencies
+are needed.
+'''
+
+import concurrent.futures
+import fnmatch
+import glob
+import os
+
+class test_node:
+    ''' Represents a single test module within the dependency graph '''
+
+    def __init__(self, index, test_module):
+        self.index = index
+        self.test_module = test_module
+        # Nodes that produce the inputs of this node (they must pass before this node can run)
+        self.dependencies = set()
+        # Nodes that consume the outputs of this node
+        self.dependents = set()
+        # Nodes that must finish (whatever their result) before this node can run
+        self.predecessors = set()
+        # One of "pending", "running", "passed", "failed", "cancelled"
+        self.state = "pending"
+        # The node that caused this node to be cancelled
+        self.cancelled_by = None
+
+    def add_dependency(self, node):
+        ''' Add a dependency on an earlier node that produces an input of this node '''
+        if node is self:
+            return
+        self.dependencies.add(node)
+        node.dependents.add(self)
+        self.predecessors.discard(node)
+
+    def add_predecessor(self, node):
+        ''' Add an ordering edge from an earlier node (no data flows between the nodes) '''
+        if node is self or node in self.dependencies:
+            return
+        self.predecessors.add(node)
+
+    def is_finished(self):
+        ''' Returns True if this node has passed, failed or been cancelled '''
+        return self.state in ("passed", "failed", "cancelled")
+
+    def is_ready(self):
+        ''' Returns True if all of the dependencies of this node have passed and all of its
+        predecessors have finished '''
+        return self.state == "pending" and \
+            all(dep.state == "passed" for dep in self.dependencies) and \
+            all(pred.is_finished() for pred in self.predecessors)
+
+class test_scheduler:
+    ''' Builds a dependency graph between test modules and executes the graph.
+    '''
+
+    def __init__(self, lab_test, test_modules, sandboxed=False):
+        self.lab_test = lab_test
+        self.sandboxed = sandboxed
+        self.nodes = [test_node(i, test_module) for i, test_module in enumerate(test_modules)]
+        self.build_graph()
+
+    @staticmethod
+    def normalize_filename(filename):
+        ''' Normalize filenames so that different spellings of the same path match '''
+        return os.path.normpath(str(filename))
+
+    def build_graph(self):
+        ''' Create the dependency edges between the nodes based on the order in which
+        they were registered and the files that they consume and produce. '''
+        # The node that last produced each file
+        last_writer = {}
+        # The nodes that consumed a file since it was last produced
+        readers = {}
+        # The nodes that consumed the files matching a glob pattern (whenever they are produced)
+        pattern_readers = {}
+        for node in self.nodes:
+            test_module = node.test_module
+            inputs = [self.normalize_filename(f) for f in test_module.input_files(self.lab_test)]
+            outputs = [self.normalize_filename(f) for f in test_module.output_files(self.lab_test)]
+            # Read after write
+            for input_file in inputs:
+                if glob.has_magic(input_file):
+                    for filename in fnmatch.filter(list(last_writer.keys()), input_file):
+                        node.add_dependency(last_writer[filename])
+                    pattern_readers.setdefault(input_file, []).append(node)
+                else:
+                    if input_file in last_writer:
+                        node.add_dependency(last_writer[input_file])
+                    readers.setdefault(input_file, []).append(node)
+            # Write after write and write after read (ordering only)
+            for output_file in outputs:
+                if not self.sandboxed:
+                    if output_file in last_writer:
+                        node.add_predecessor(last_writer[output_file])
+                    for reader in readers.get(output_file, []):
+                        node.add_predecessor(reader)
+                    for pattern, nodes in pattern_readers.items():
+                        if fnmatch.fnmatch(output_file, pattern):
+                            for reader in nodes:
+                                node.add_predecessor(reader)
+                last_writer[output_file] = node
+                readers[output_file] = []
+
+    def cancel_dependents(self, failed_node):
+        ''' Cancel all of the nodes that consume the outputs (directly or indirectly) of a
+        failed node. The nodes that are only ordered after it still run. '''
+        to_visit = list(failed_node.dependents)
+        while to_visit:
+            node = to_visit.pop()
+            if node.state != "pending":
+                continue
+            node.state = "cancelled"
+            node.cancelled_by = failed_node
+            self.lab_test.skip_test_module(node.test_module, failed_node.test_module)
+            to_visit.extend(node.dependents)
+
+    def run_node(self, node):
+        ''' Execute a single node (called from a worker thread) '''
+        self.lab_test.print_step_message(node.test_module.module_name())
+        return self.lab_test.execute_test_module(node.test_module)
+
+    def run(self, max_workers=1):
+        ''' Run all of the nodes in the graph using at most 'max_workers' concurrent workers.
+        Ready nodes are started in registration order as soon as a worker is available
+        (a single worker runs the nodes in the order they were registered).
+        Returns True if all of the nodes passed. '''
+        running = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                # Start the ready nodes while there are free workers
+                for node in self.nodes:
+                    if len(running) >= max_workers:
+                        break
+                    if node.is_ready():
+                        node.state = "running"
+                        running[executor.submit(self.run_node, node)] = node
+                if not running:
+                    break
+                done, _ = concurrent.futures.wait(running.keys(),
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                # Process completed nodes in registration order
+                for future in sorted(done, key=lambda f: running[f].index):
+                    node = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        self.lab_test.print_error("Exception in", node.test_module.module_name(), ":", e)
+                        result = False
+                    if result:
+                        node.state = "passed"
+                    else:
+                        node.state = "failed"
+                        self.cancel_dependents(node)
+        return all(node.state == "passed" for node in self.nodes)
@@ -16,6 +16,7 @@ Classes:
   update_bitstream_mem:
   update_font_mem:
   update_background_mem:
+  update_mem_chain: applies a sequence of font/background/program updates to a checkpoint
   
 '''
 
@@ -26,6 +27,16 @@ import shutil
 import subprocess
 # For os.remove
 import os
+# Precompiled simulation library of the shared HDL files
+import xsim_library
+# Incremental analysis of the HDL files
+import hdl_analysis
+# Time budgets of the test modules
+import watchdog
+# Error checking of the tool output as it is produced
+import log_monitor
+# Compressed log files
+import compressed_log
 
 import lab_passoff
 from lab_passoff import TermColor
@@ -42,6 +53,106 @@ class tester_module():
         lab_test.print_print_warning("This should be overridden")
         return False
 
+    def input_files(self, lab_test):
+        ''' returns a list of the files (relative to the execution path) consumed by this module.
+        Glob patterns (i.e., "*.mem") may be used. Used to order the test modules. '''
+        return []
+
+    def output_files(self, lab_test):
+        ''' returns a list of the files (relative to the execution path) produced by this module.
+        Used to order the test modules. '''
+        return []
+
+    def cache_tools(self):
+        ''' returns a list of the tool executables run by this module. The version of each tool
+        is part of the result cache key of the module. An empty list means the module is never cached. '''
+        return []
+
+    def cache_files(self, lab_test):
+        ''' returns a list of additional files (i.e., tool scripts and include files) whose contents
+        are part of the result cache key of the module. '''
+        return []
+
+    def set_budget(self, wall_time=None, cpu_time=None, sim_time=None):
+        ''' Set the budgets of this module (see watchdog): the wall-clock time (seconds) of its
+        tool processes, the CPU time (seconds) of each tool process, and the simulated time of
+        a testbench simulation (an xsim time such as "10ms"). Budgets that are not given default
+        to the --wall_time, --cpu_time and --sim_time options. Returns the module. '''
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.sim_time = sim_time
+        return self
+
+    def budget(self, lab_test):
+        ''' returns the budget (watchdog.module_budget) for a run of this module '''
+        def setting(name):
+            value = getattr(self, name, None)
+            return value if value is not None else getattr(lab_test.args, name)
+        return watchdog.module_budget(setting("wall_time"), setting("cpu_time"), setting("sim_time"))
+
+    def set_output_mode(self, output_mode):
+        ''' Set the tool output shown on the terminal for this module (see terminal_output),
+        rather than the --output_mode option. Returns the module. '''
+        self.output_mode_setting = output_mode
+        return self
+
+    def output_mode(self, lab_test):
+        ''' returns the output mode (see terminal_output) of the tools run by this module '''
+        output_mode = getattr(self, "output_mode_setting", None)
+        return output_mode if output_mode is not None else lab_test.args.output_mode
+
+    def preflight(self, lab_test, design):
+        ''' returns a list of the problems (hdl_preflight.preflight_problem) with the files of this module that can be found
+        without running the tools (see hdl_preflight). 'design' is the hdl_design of the lab. '''
+        return []
+
+def include_dir_files(lab_test, include_dirs):
+    ''' Returns the files (relative to the execution path) in the include directories (relative to
+    the lab directory) '''
+    files = []
+    rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+    for include_dir in include_dirs:
+        include_path = lab_test.execution_path / rel_path / include_dir
+        if include_path.is_dir():
+            for include_file in sorted(include_path.iterdir()):
+                if include_file.is_file():
+                    files.append(os.path.join(rel_path, include_dir, include_file.name))
+    return files
+
+def generic_filenames(generics):
+    ''' Returns the filenames given as the value of "*FILENAME" generics (i.e., the memory
+    files in "TEXT_MEMORY_FILENAME=final_text.mem") '''
+    filenames = []
+    for generic in generics:
+        name, _, value = generic.partition("=")
+        if "FILENAME" in name.upper() and value != "":
+            filenames.append(value.strip('"'))
+    return filenames
+
+def memory_filenames(lab_test, hdl_filenames, generics):
+    ''' Returns the memory files read by a design: the files given by the "*FILENAME" generics
+    and the default memory files of the parameters that are not set by a generic (see
+    hdl_analysis.memory_filenames) '''
+    filenames = generic_filenames(generics)
+    overridden = set(generic.partition("=")[0] for generic in generics)
+    for hdl_filename in hdl_filenames:
+        for name, filename in hdl_analysis.memory_filenames(lab_test.execution_path / hdl_filename):
+            if name not in overridden and filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+def tool_log_ok(lab_test, monitor, return_code):
+    ''' Returns True if a tool completed without error: a zero return code and no error
+    messages in its output (see log_signatures). The first error message is printed. '''
+    first_error = monitor.first_error()
+    if first_error is not None:
+        print(str.format("  {} ({} error(s) and {} critical warning(s) in the output)", first_error,
+            len(monitor.errors), monitor.count("CRITICAL WARNING")))
+    return return_code == 0 and first_error is None
+
+# Printed by a testbench simulation that reaches its simulated time budget
+SIM_TIME_MARKER = "Simulated time budget of"
+
 class simulation_module(tester_module):
     ''' A tester module that performs simulations with Vivado tools. This includes functions
     for analyzing, elaborating, and simulating. This should be extended.
@@ -52,90 +163,238 @@ class simulation_module(tester_module):
     def __init__(self, sim_top_module_name, hdl_sim_keylist, include_dirs=[], generics=[], vhdl_files=[], use_glbl=False ):
         ''' Initialize the top module name and the keylist for simulation HDL files '''
         self.sim_top_module = sim_top_module_name
+        # Base name of the log files (made unique by lab_test.add_test_module when several
+        # modules simulate the same top module)
+        self.log_name = sim_top_module_name
         self.hdl_sim_keylist = hdl_sim_keylist
         self.include_dirs = include_dirs
         self.generics = generics
         self.vhdl_files = vhdl_files
         self.use_glbl = use_glbl
 
-    def analyze_hdl_files(self, lab_test, hdl_filename_list, log_basename, analyze_cmd,consider_include=True):
+    def input_files(self, lab_test):
+        ''' The HDL files and the memory files read by the simulation '''
+        files = lab_test.get_filenames_from_keylist(self.hdl_sim_keylist)
+        files.extend(lab_test.get_filenames_from_keylist(self.vhdl_files))
+        files.extend(memory_filenames(lab_test, lab_test.get_filenames_from_keylist(self.hdl_sim_keylist),
+            self.generics))
+        return files
+
+    def output_files(self, lab_test):
+        ''' The log files, the snapshot and the work library of the simulation (the xsim.dir of
+        the execution path is shared by the simulations unless each module has its own work
+        directory). Simulations of different top modules do not share any outputs. '''
+        files = [ self.log_name + "_analyze.txt", self.log_name + "_elaborate.txt",
+            self.log_name + "_simulation.txt" ]
+        if not lab_test.args.sandbox:
+            files.append(os.path.join("xsim.dir", self.sim_top_module))
+            files.append(os.path.join("xsim.dir", self.work_library()))
+        if len(self.vhdl_files) > 0:
+            files.append(self.log_name + "_vhdl_analyze.txt")
+        return files
+
+    def work_library(self):
+        ''' The library that the files of the simulation are analyzed into. Each top module has
+        its own library so that simulations of different designs do not replace the design
+        units of each other (i.e., two versions of 'regfile'). '''
+        return "work_" + self.sim_top_module
+
+    def cache_tools(self):
+        return [ "xvlog", "xvhdl", "xelab", "xsim" ]
+
+    def cache_files(self, lab_test):
+        return include_dir_files(lab_test, self.include_dirs)
+
+    def preflight(self, lab_test, design):
+        filenames = lab_test.get_filenames_from_keylist(self.hdl_sim_keylist)
+        filenames.extend(lab_test.get_filenames_from_keylist(self.vhdl_files))
+        return design.check_design(self.sim_top_module, filenames, self.include_dir_paths(lab_test))
+
+    def shared_library(self, lab_test):
+        ''' Returns the precompiled library of the shared files (resources directory) used
+        by the simulation or None if all of the files are analyzed by the simulation '''
+        sv_filenames = lab_test.get_filenames_from_keylist(self.hdl_sim_keylist)
+        vhdl_filenames = lab_test.get_filenames_from_keylist(self.vhdl_files)
+        return lab_test.get_xsim_library(
+            [ f for f in sv_filenames if xsim_library.is_shared_file(lab_test, f) ],
+            [ f for f in vhdl_filenames if xsim_library.is_shared_file(lab_test, f) ])
+
+    def local_files(self, lab_test, hdl_filename_list):
+        ''' Returns the files that need to be analyzed by the simulation (the files that
+        are not in the precompiled library) '''
+        if self.shared_library(lab_test) is None:
+            return hdl_filename_list
+        return [ f for f in hdl_filename_list if not xsim_library.is_shared_file(lab_test, f) ]
+
+    def include_dir_paths(self, lab_test):
+        ''' Returns the include directories relative to the execution path '''
+        # Need to adjust include path relative to execution path
+        rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+        return [ os.path.join(rel_path,include_dir) for include_dir in self.include_dirs ]
+
+    def analyze_hdl_files(self, lab_test, hdl_filename_list, log_basename, analyze_cmd,consider_include=True,
+        library="work", record=None, vhdl=False):
         ''' Perform HDL analysis on a set of files. This is a generic function and should
-        be called by another function to specify the actual command.  '''
+        be called by another function to specify the actual command. Only the files that have
+        changed since they were last analyzed in the execution path are analyzed (see hdl_analysis). '''
         
         # See if the executable is even in the path
-        if not lab_test.check_executable_existence(["xvlog", "--version"]):
+        if not lab_test.check_executable_existence([analyze_cmd[0], "--version"]):
             return False
 
         # Analyze all of the files associated with the TCL simulation set
         lab_test.print_info(TermColor.BLUE, " Analyzing source files")
 
         analyze_log_filename = str(log_basename + "_analyze.txt")
-        self.analyze_log_filepath = lab_test.execution_path / analyze_log_filename
-        for filename in hdl_filename_list:
-            analyze_cmd.append(filename)
+        analyze_log_filepath = lab_test.execution_path / analyze_log_filename
+        # Copy the command so that the list given by the caller is not modified
+        analyze_cmd = analyze_cmd + [ "--work", library ]
 
         # Add Include DIRS
-        if len(self.include_dirs) > 0 and consider_include:
-            # Need to adjust include path relative to execution path
-            rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
-            for include_dir in self.include_dirs:
-                analyze_cmd.append("-i")
-                rel_include_dir = os.path.join(rel_path,include_dir)
-                analyze_cmd.append(rel_include_dir)
+        include_dir_paths = self.include_dir_paths(lab_test) if consider_include else []
+        for rel_include_dir in include_dir_paths:
+            analyze_cmd.append("-i")
+            analyze_cmd.append(rel_include_dir)
+
+        # Only analyze the files whose contents (or included files) have changed
+        if record is None:
+            record = hdl_analysis.analysis_record(lab_test.execution_path)
+        file_keys = record.file_keys(library, hdl_filename_list, analyze_cmd, include_dir_paths, vhdl)
+        changed_file_keys = [ (filename, key, units) for filename, key, units in file_keys
+            if record.needs_analysis(library, filename, key, units) ]
+        if len(changed_file_keys) == 0:
+            with compressed_log.open_writer(analyze_log_filepath, lab_test.args.compress_logs) as fp:
+                fp.write(str.format("All {} files are up to date in library {}\n", len(file_keys), library).encode())
+            lab_test.print_info(str.format("  {} files already analyzed", len(file_keys)))
+            return True
+        for filename, _, _ in changed_file_keys:
+            analyze_cmd.append(filename)
 
         #print(analyze_cmd)
         #print(lab_test.execution_path)
-        return_code = lab_test.subprocess_file_print(self.analyze_log_filepath, analyze_cmd, lab_test.execution_path )
-        if return_code != 0 :
+        monitor = log_monitor.line_monitor(analyze_cmd[0])
+        return_code = lab_test.subprocess_file_print(analyze_log_filepath, analyze_cmd, lab_test.execution_path,
+            monitor=monitor)
+        analyzed = tool_log_ok(lab_test, monitor, return_code)
+        record.update(library, changed_file_keys, analyzed)
+        if not analyzed:
             lab_test.print_error("Failed analyze")
             return False
 
         return True
 
-    def analyze_sv_files(self, lab_test, log_basename):
+    def analyze_sv_files(self, lab_test, log_basename, record=None):
         ''' Perform HDL analysis on a set of files '''
         
-        # Resolve the filenames
-        hdl_filename_list = lab_test.get_filenames_from_keylist(self.hdl_sim_keylist)
+        # Resolve the filenames (the shared files are in the precompiled library)
+        hdl_filename_list = self.local_files(lab_test, lab_test.get_filenames_from_keylist(self.hdl_sim_keylist))
+        if len(hdl_filename_list) == 0:
+            return True
 
         sv_xvlog_cmd = ["xvlog", "--nolog", "-sv", ]
         # (include DIRS added in analyze_hdl_files)
-        return self.analyze_hdl_files(lab_test, hdl_filename_list, log_basename, sv_xvlog_cmd)
+        return self.analyze_hdl_files(lab_test, hdl_filename_list, log_basename, sv_xvlog_cmd,
+            library=self.work_library(), record=record)
+
+    def local_vhdl_files(self, lab_test):
+        ''' The VHDL files analyzed by the simulation '''
+        return self.local_files(lab_test, lab_test.get_filenames_from_keylist(self.vhdl_files))
 
-    def analyze_vhdl_files(self, lab_test, log_basename):
+    def analyze_vhdl_files(self, lab_test, log_basename, record=None):
         ''' Perform HDL analysis on a set of files '''
         
-        # Resolve the filenames
-        hdl_filename_list = lab_test.get_filenames_from_keylist(self.vhdl_files)
+        # Resolve the filenames (the shared files are in the precompiled library)
+        hdl_filename_list = self.local_vhdl_files(lab_test)
+        if len(hdl_filename_list) == 0:
+            return True
 
         xvhdl_cmd = ["xvhdl", "--nolog", ]
-        return self.analyze_hdl_files(lab_test, hdl_filename_list, log_basename, xvhdl_cmd,consider_include=False)
+        return self.analyze_hdl_files(lab_test, hdl_filename_list, log_basename + "_vhdl", xvhdl_cmd,
+            consider_include=False, library=self.work_library(), record=record, vhdl=True)
+
+    def analyze(self, lab_test):
+        ''' Analyze the SystemVerilog and then the VHDL files of the simulation into its work
+        library. The VHDL files are analyzed after the SystemVerilog files since they may
+        instantiate SystemVerilog modules (i.e., bramMacro in charColorMem3BRAM.vhd). '''
+        record = hdl_analysis.analysis_record(lab_test.execution_path)
+        if not self.analyze_sv_files(lab_test, self.log_name, record):
+            return False
+        if len(self.vhdl_files) == 0:
+            return True
+        return self.analyze_vhdl_files(lab_test, self.log_name, record)
+
+    def runtime_generics(self, lab_test):
+        ''' Returns the generics that the top-level module reads from plusargs at run time
+        (i.e., $value$plusargs("USE_MEMORY=%d", use_memory)). These generics are passed to xsim
+        rather than xelab so that simulations that only differ in these generics share a snapshot. '''
+        plusargs = set()
+        for filename in lab_test.get_filenames_from_keylist(self.hdl_sim_keylist):
+            filepath = lab_test.execution_path / filename
+            _, _, units = hdl_analysis.scan_hdl_file(filepath)
+            if self.sim_top_module in units:
+                plusargs |= hdl_analysis.plusarg_names(filepath)
+        return [ generic for generic in self.generics if generic.partition("=")[0] in plusargs ]
+
+    def elaboration_files(self, lab_test):
+        ''' The (library, filename) of the files analyzed by the simulation '''
+        library = self.work_library()
+        files = [ (library, f) for f in self.local_files(lab_test, lab_test.get_filenames_from_keylist(self.hdl_sim_keylist)) ]
+        files.extend([ (library, f) for f in self.local_vhdl_files(lab_test) ])
+        return files
 
     def elaborate(self, lab_test):
         # Elaborate design
         design_name = self.sim_top_module
         lab_test.print_info(TermColor.BLUE, " Elaborating")
-        elaborate_log_filename = str(self.sim_top_module + "_elaborate.txt")
+        elaborate_log_filename = str(self.log_name + "_elaborate.txt")
         self.elaborate_log_filepath = lab_test.execution_path / elaborate_log_filename
+        runtime_generics = self.runtime_generics(lab_test)
 
         #xelab_cmd = ["xelab", "--debug", "typical", "--nolog", "-L", "unisims_ver", design_name, "work.glbl" ]
-        xelab_cmd = ["xelab", "--debug", "typical", "--nolog", "-L", "unisims_ver"]
+        work_library = self.work_library()
+        xelab_cmd = ["xelab", "--debug", "typical", "--nolog", "-L", work_library, "-L", "unisims_ver"]
+        library = self.shared_library(lab_test)
+        if library:
+            xelab_cmd.extend(library.link_option())
         if len(self.generics) > 0:
-            # Add generic options
+            # Add generic options (the generics read from plusargs are given to xsim)
             for generic in self.generics:
+                if generic in runtime_generics:
+                    continue
                 xelab_cmd.append("-generic_top")
                 #xelab_cmd.append(str.format("\"{}\"",generic))
                 xelab_cmd.append(str.format("{}",generic))
-        xelab_cmd.append( design_name )
-        #xelab_cmd.append( str.format("work.{}",design_name ))
+        #xelab_cmd.append( design_name )
+        xelab_cmd.append( str.format("{}.{}", work_library, design_name ))
         if self.use_glbl:
             #xelab_cmd.extend( ["-L", "unisims_ver", "work.glbl" ])
             #xelab_cmd.extend( ["-L", "unisims_ver", "--relax", "work.glbl" ])
-            xelab_cmd.extend( ["-L", "unisims_ver", "--relax", "glbl", "-s", str.format("work.{}",design_name ) ])
-
-        return_code = lab_test.subprocess_file_print(self.elaborate_log_filepath, xelab_cmd, lab_test.execution_path )
-
-        if return_code != 0:
+            glbl_unit = str.format("{}.glbl", work_library)
+            if library and library.contains("glbl.v"):
+                glbl_unit = str.format("{}.glbl", xsim_library.LIBRARY_NAME)
+            xelab_cmd.extend( ["-L", "unisims_ver", "--relax", glbl_unit ])
+        # The snapshot is named after the top module (xsim.dir/<top module>)
+        xelab_cmd.extend( ["-s", design_name ])
+
+        # Reuse the snapshot if it was elaborated from the same files with the same options
+        record = hdl_analysis.analysis_record(lab_test.execution_path)
+        snapshot_key = record.elaboration_key(self.elaboration_files(lab_test), xelab_cmd)
+        if record.snapshot_is_current(design_name, snapshot_key):
+            with compressed_log.open_writer(self.elaborate_log_filepath, lab_test.args.compress_logs) as fp:
+                fp.write(str.format("Snapshot {} is up to date (elaborated with the same files and options):\n\t{}\n",
+                    design_name, " ".join(str(c) for c in xelab_cmd)).encode())
+            lab_test.print_info(str.format("  Reusing elaborated snapshot {}", design_name))
+            return True
+        record.update_snapshot(design_name, None)
+
+        monitor = log_monitor.line_monitor("xelab")
+        return_code = lab_test.subprocess_file_print(self.elaborate_log_filepath, xelab_cmd, lab_test.execution_path,
+            monitor=monitor)
+        elaborated = tool_log_ok(lab_test, monitor, return_code)
+        if elaborated:
+            record.update_snapshot(design_name, snapshot_key)
+
+        if not elaborated:
             lab_test.print_error("Failed Elaborate")
             print(xelab_cmd)
             print(lab_test.execution_path)
@@ -143,20 +402,32 @@ class simulation_module(tester_module):
 
         return True
 
-    def simulate(self,lab_test,xsim_opts=[]):
+    def simulate(self,lab_test,xsim_opts=[],monitor=None):
+        ''' Run the simulation. The output is checked for simulator errors unless a monitor
+        is given (the caller checks the output of the monitor). '''
         # Simulate
         #extract_lab_path = lab_test.submission_lab_path
         lab_test.print_info(TermColor.BLUE, " Starting Simulation")
-        simulation_log_filename = str(self.sim_top_module + "_simulation.txt")
+        simulation_log_filename = str(self.log_name + "_simulation.txt")
         self.simulation_log_filepath = lab_test.execution_path / simulation_log_filename
         # default simulation commands
         xsim_cmd = ["xsim", "-nolog", self.sim_top_module,]
+        # Generics that are resolved at run time
+        for generic in self.runtime_generics(lab_test):
+            xsim_cmd.extend(["--testplusarg", generic])
         # Add options from function parameters
         for opt in xsim_opts:
             xsim_cmd.append(opt)
 
-        return_code = lab_test.subprocess_file_print(self.simulation_log_filepath, xsim_cmd, lab_test.execution_path )
-        if return_code != 0:
+        sim_monitor = monitor if monitor is not None else log_monitor.line_monitor("xsim")
+        return_code = lab_test.subprocess_file_print(self.simulation_log_filepath, xsim_cmd, lab_test.execution_path,
+            monitor=sim_monitor)
+        if monitor is None:
+            simulated = tool_log_ok(lab_test, sim_monitor, return_code)
+        else:
+            # A simulation stopped by its monitor is reported by the caller
+            simulated = return_code == 0 or monitor.aborted
+        if not simulated:
             lab_test.print_error("Failed simulation")
             print(xsim_cmd)
             print(lab_test.execution_path)
@@ -178,6 +449,16 @@ class tcl_simulation(simulation_module):
         ''' returns a string indicating the name of the module. Used for logging. '''
         return str.format("TCL Simulation ({})",self.tcl_filename_key)
 
+    def input_files(self, lab_test):
+        files = super().input_files(lab_test)
+        files.append(lab_test.get_filename_from_key(self.tcl_filename_key))
+        return files
+
+    def output_files(self, lab_test):
+        files = super().output_files(lab_test)
+        files.append(self.log_name + "_tempsim2.tcl")
+        return files
+
     def perform_test(self, lab_test):
         ''' 
         Perform a simulation of a module with a Tcl script.
@@ -186,12 +467,9 @@ class tcl_simulation(simulation_module):
         '''
 
         # Analyze hdl		
-        if not self.analyze_sv_files(lab_test,self.sim_top_module):
+        if not self.analyze(lab_test):
             return False
         debug = False
-        if len(self.vhdl_files) > 0:
-            if not self.analyze_vhdl_files(lab_test,self.sim_top_module):
-                return False
         if debug:
             input("Pause after analyze")
 
@@ -206,10 +484,10 @@ class tcl_simulation(simulation_module):
         tcl_filename = lab_test.get_filename_from_key(self.tcl_filename_key)
 
         # Create a temporary tcl script that calls the student script
-        temp_tcl_filename = str(design_name + "_tempsim2.tcl")
+        temp_tcl_filename = str(self.log_name + "_tempsim2.tcl")
         src_tcl = lab_test.execution_path / tcl_filename
         tmp_tcl = lab_test.execution_path / temp_tcl_filename
-        log = open(tmp_tcl, 'a')
+        log = open(tmp_tcl, 'w')
         log.write('# Temporary script that sources TCL file\n')
         log.write(str.format('if {{ [ catch {{ source {} }} ] }} {{\n',tcl_filename))
         log.write("    puts \"Error with TCL Script\"\n")
@@ -231,12 +509,14 @@ class testbench_simulation(simulation_module):
     ''' An object that represents a testbench simulation.
     '''
     def __init__(self, testbench_description, testbench_top, hdl_sim_keylist, xe_options_list, \
-        include_dirs=[], generics=[], vhdl_files=[], use_glbl = False ):
+        include_dirs=[], generics=[], vhdl_files=[], use_glbl = False, abort_on_error = None ):
         super().__init__(testbench_top,hdl_sim_keylist,include_dirs,generics,vhdl_files,use_glbl=use_glbl)
         self.testbench_description = testbench_description
         #self.testbench_top = testbench_top
         #self.hdl_sim_keylist = hdl_sim_keylist
         self.xe_options_list = xe_options_list
+        # Stop the simulation at the first error (None to use the --abort_on_error option)
+        self.abort_on_error = abort_on_error
 
     def module_name(self):
         ''' returns a string indicating the name of the module. Used for logging. '''
@@ -249,31 +529,64 @@ class testbench_simulation(simulation_module):
             tcl_list: the list of items associated with a tcl simulation
         '''
         
-        if not self.analyze_sv_files(lab_test,self.sim_top_module):
+        if not self.analyze(lab_test):
             return False
-        if len(self.vhdl_files) > 0:
-            if not self.analyze_vhdl_files(lab_test,self.sim_top_module):
-                return False
         if not self.elaborate(lab_test):
             return False
         
         # Simulate
         #tb_sim_opts = [ "-runall", "--onerror", "quit" ]
         tb_sim_opts = [ "-runall", ]
-        sim_result = self.simulate(lab_test, xsim_opts=tb_sim_opts)
+        sim_time = self.budget(lab_test).sim_time
+        if sim_time:
+            # Run for at most the simulated time budget ($finish ends the simulation earlier)
+            run_tcl_filename = self.log_name + "_run.tcl"
+            with open(lab_test.execution_path / run_tcl_filename, "w") as fp:
+                fp.write('# Run the testbench for at most the simulated time budget\n')
+                fp.write(str.format('run {}\n', sim_time))
+                fp.write(str.format('puts "{} {} reached before \\$finish"\n', SIM_TIME_MARKER, sim_time))
+                fp.write('quit\n')
+            tb_sim_opts = [ "-tclbatch", run_tcl_filename, "-onfinish", "quit" ]
+        # The simulation output is checked for errors as it is produced
+        abort_on_error = self.abort_on_error if self.abort_on_error is not None else lab_test.args.abort_on_error
+        monitor = log_monitor.line_monitor("testbench", abort_on_error=abort_on_error)
+        sim_result = self.simulate(lab_test, xsim_opts=tb_sim_opts, monitor=monitor)
         if not sim_result:
             return False
+        if sim_time and self.sim_time_exceeded(monitor):
+            lab_test.expire_budget(str.format("simulated time budget of {} exceeded", sim_time))
+            return False
 
-        # Parse the simulation output to see if there are errors
-        return self.check_for_no_errors(lab_test,["Errors", "Error", "ERROR"])
-
-    def check_for_no_errors(self, lab_test, error_strings):
-        with open(self.simulation_log_filepath) as sim_file:
-            for line in sim_file:
-                for error_string in error_strings:
-                    if error_string in line:
-                        lab_test.print_error("Error in simulation:",line)
-                        return False
+        # Check the errors found in the simulation output
+        return self.check_for_no_errors(lab_test, monitor)
+
+    def output_files(self, lab_test):
+        files = super().output_files(lab_test)
+        if self.budget(lab_test).sim_time:
+            files.append(self.log_name + "_run.tcl")
+        return files
+
+    def sim_time_exceeded(self, monitor):
+        ''' Returns True if the end of the simulation output shows that the simulated time budget ran out '''
+        return any(line.startswith(SIM_TIME_MARKER) for line in monitor.tail_lines())
+
+    def check_for_no_errors(self, lab_test, monitor=None):
+        ''' Report the first error of the simulation. The errors found by the monitor of the
+        simulation are used when given, otherwise the simulation log is scanned. '''
+        if monitor is None:
+            monitor = log_monitor.line_monitor("testbench").scan_file(self.simulation_log_filepath)
+        if monitor.errors:
+            first_error = monitor.first_error()
+            lab_test.print_error("Error in simulation:",first_error.text.strip())
+            if first_error.file is not None:
+                print("  at", first_error.location())
+            if monitor.aborted:
+                lab_test.print_warning(str.format("Simulation stopped at the first error (line {} of the output)",
+                    first_error.log_line))
+            print(str.format("Last {} lines of the simulation output:", len(monitor.tail_lines())))
+            for tail_line in monitor.tail_lines():
+                print("  " + tail_line)
+            return False
         print("No errors in testbench simulation")
         #tb_sim_opts = [ "-runall", "--onerror", "quit" ]
         return True
@@ -297,8 +610,123 @@ class build_bitstream(tester_module):
         ''' returns a string indicating the name of the module. Used for logging. '''
         return str.format("Synthesis/Bitstream Gen ({})",self.design_name)
 
+    def input_files(self, lab_test):
+        ''' The HDL and constraint files and the memory files read during synthesis '''
+        files = lab_test.get_filenames_from_keylist(self.hdl_key_list)
+        files.extend(lab_test.get_filenames_from_keylist(self.vhdl_key_list))
+        if self.implement_build:
+            files.extend(lab_test.get_filenames_from_keylist(self.xdl_key_list))
+        files.extend(memory_filenames(lab_test, lab_test.get_filenames_from_keylist(self.hdl_key_list),
+            self.generics))
+        return files
+
+    def output_files(self, lab_test):
+        files = [ self.design_name + "_buildscript.tcl", self.design_name + "_implementation.txt" ]
+        if self.implement_build:
+            files.append(self.design_name + ".bit")
+        if self.implement_build or self.create_dcp:
+            files.append(self.design_name + ".dcp")
+        return files
+
+    def cache_tools(self):
+        return [ "vivado" ]
+
+    def cache_files(self, lab_test):
+        return include_dir_files(lab_test, self.include_dirs)
+
+    def preflight(self, lab_test, design):
+        filenames = lab_test.get_filenames_from_keylist(self.hdl_key_list)
+        filenames.extend(lab_test.get_filenames_from_keylist(self.vhdl_key_list))
+        rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+        include_dirs = [ os.path.join(rel_path,include_dir) for include_dir in self.include_dirs ]
+        return design.check_design(self.design_name, filenames, include_dirs)
+
     def perform_test(self, lab_test):
 
+        bitfile_filename = str(self.design_name + ".bit")
+        lab_test.print_info("Attempting to build bitfile",bitfile_filename)
+
+        # See if the executable is even in the path
+        if not lab_test.check_executable_existence(["vivado", "-version"]):
+            return False
+
+        reference = lab_test.get_build_reference(self.design_name) if self.implement_build else None
+        if reference is None:
+            if not self.build(lab_test):
+                lab_test.print_error("Failed Implemeneetation")
+                return False
+            return True
+
+        rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+        sources_key = reference.sources_key(lab_test.execution_path,
+            self.input_files(lab_test) + self.cache_files(lab_test) +
+            [ os.path.join(rel_path,lab_test.NEW_PROJECT_SETTINGS_FILENAME) ],
+            self.generics, [ lab_test.BASYS3_PART, self.create_dcp ])
+        memory_hashes = reference.memory_hashes(lab_test.execution_path, self.generics)
+        # Only the memory contents changed: update the BRAMs of the routed reference
+        memory_updates, routed_checkpoint = reference.copy_for_update(sources_key, lab_test.execution_path,
+            self.generics)
+        if memory_updates is not None:
+            lab_test.print_info(" Sources unchanged since reference build: updating the memories of",
+                reference.routed_checkpoint)
+            try:
+                updated = self.update_reference(lab_test, routed_checkpoint, memory_updates)
+            finally:
+                os.remove(routed_checkpoint)
+            if updated:
+                return True
+            lab_test.print_warning("Failed to update the reference checkpoint: building the design")
+        synth_checkpoint = reference.temporary_checkpoint()
+        try:
+            checkpoints = reference.incremental_checkpoints()
+            if checkpoints is not None:
+                lab_test.print_info(" Incremental build from", reference.path)
+            built = self.build(lab_test, checkpoints, synth_checkpoint)
+            if not built and checkpoints is not None and self.incremental_failure(lab_test):
+                lab_test.print_warning("Incremental build failed: building the design without the reference")
+                reference.discard()
+                built = self.build(lab_test, None, synth_checkpoint)
+            if not built:
+                lab_test.print_error("Failed Implemeneetation")
+                return False
+            reference.save(sources_key, memory_hashes, synth_checkpoint,
+                lab_test.execution_path / str(self.design_name + ".dcp"))
+        finally:
+            if synth_checkpoint.exists():
+                os.remove(synth_checkpoint)
+        return True
+
+    def implementation_log_filepath(self, lab_test):
+        return lab_test.execution_path / str(self.design_name + "_implementation.txt")
+
+    def incremental_failure(self, lab_test):
+        ''' Returns True if the build log shows that the reference checkpoints caused the failure '''
+        try:
+            monitor = log_monitor.line_monitor("vivado").scan_file(self.implementation_log_filepath(lab_test))
+        except FileNotFoundError:
+            return False
+        return any("ncremental" in finding.message for finding in monitor.errors)
+
+    def update_reference(self, lab_test, routed_checkpoint, memory_updates):
+        ''' Write the bitstream (and checkpoint) of the design by loading new memory contents
+        into a copy of the routed reference checkpoint (no synthesis or implementation) '''
+        tclargs = [ "updateChain", str(routed_checkpoint) ] + memory_updates
+        tclargs.extend([ "checkpoint", str(self.design_name + ".dcp"),
+            "bitstream", str(self.design_name + ".bit") ])
+        # The build script is not used (written so that the outputs of the module are complete)
+        with open(lab_test.execution_path / str(self.design_name + "_buildscript.tcl"), 'w') as script:
+            script.write('# Bitfile generated from the reference checkpoint with load_mem.tcl\n')
+            script.write('# ' + ' '.join(tclargs) + '\n')
+        monitor = log_monitor.line_monitor("vivado")
+        return_code = lab_test.vivado_script_print(self.implementation_log_filepath(lab_test),
+            load_mem_script_path(lab_test), lab_test.execution_path, tclargs, monitor)
+        return tool_log_ok(lab_test, monitor, return_code)
+
+    def build(self, lab_test, reference_checkpoints=None, synth_checkpoint=None):
+        ''' Synthesize (and implement) the design. The reference checkpoints (synthesized, routed)
+        are used for an incremental build when given. The synthesized design is written to
+        'synth_checkpoint' when given. '''
+
         part = lab_test.BASYS3_PART
         bitfile_filename = str(self.design_name + ".bit")
         dcp_filename = str(self.design_name + ".dcp")
@@ -315,7 +743,6 @@ class build_bitstream(tester_module):
         rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
         new_path = os.path.join(rel_path,lab_test.NEW_PROJECT_SETTINGS_FILENAME)
         pre_script_filenames = [ new_path ]
-        lab_test.print_info("Attempting to build bitfile",bitfile_filename)
 
         # Create tcl build script (the build will involve executing this script)
         tcl_build_script_filename = str(self.design_name + "_buildscript.tcl")
@@ -346,6 +773,9 @@ class build_bitstream(tester_module):
             log.write('# Add XDC file\n')
             for xdc_filename in xdl_filenames:
                 log.write('read_xdc ' + xdc_filename + '\n')
+        if reference_checkpoints is not None:
+            log.write('# Incremental synthesis from the reference checkpoint\n')
+            log.write('read_checkpoint -incremental ' + str(reference_checkpoints[0]) + '\n')
         log.write('# Synthesize design\n')
         # Create synthesis command
         synth_command = 'synth_design -top ' + self.design_name + ' -part ' + part
@@ -363,8 +793,13 @@ class build_bitstream(tester_module):
                 synth_command += str.format(" -generic {}",generic)
         synth_command += '\n'
         log.write(synth_command)
+        if synth_checkpoint is not None:
+            log.write('write_checkpoint -force ' + str(synth_checkpoint) + '\n')
 
         if self.implement_build:    
+            if reference_checkpoints is not None:
+                log.write('# Incremental place and route from the reference checkpoint\n')
+                log.write('read_checkpoint -incremental ' + str(reference_checkpoints[1]) + '\n')
             log.write('# Implement Design\n')
             log.write('place_design\n')
             log.write('route_design\n')
@@ -377,20 +812,12 @@ class build_bitstream(tester_module):
         log.write('# End of build script\n')
         log.close()
 
-        # See if the executable is even in the path
-        if not lab_test.check_executable_existence(["vivado", "-version"]):
-            return False
-
-        implementation_log_filename = str(self.design_name + "_implementation.txt")
-        implementation_log_filepath = lab_test.execution_path / implementation_log_filename
-        build_cmd = ["vivado", "-nolog", "-mode", "batch", "-nojournal", "-source", tcl_build_script_filename]
-
+        implementation_log_filepath = self.implementation_log_filepath(lab_test)
 
-        return_code = lab_test.subprocess_file_print(implementation_log_filepath, build_cmd, lab_test.execution_path )
-        if return_code != 0:
-            lab_test.print_error("Failed Implemeneetation")
-            return False
-        return True
+        monitor = log_monitor.line_monitor("vivado")
+        return_code = lab_test.vivado_script_print(implementation_log_filepath, tcl_build_script_filename,
+            lab_test.execution_path, monitor=monitor)
+        return tool_log_ok(lab_test, monitor, return_code)
 
 
 class rars_raw(tester_module):
@@ -413,6 +840,18 @@ class rars_raw(tester_module):
         ''' returns a string indicating the name of the module. Used for logging. '''
         return str.format("RARS with file ({})",self.asm_filekey)
 
+    def input_files(self, lab_test):
+        return [ lab_test.get_filename_from_key(self.asm_filekey) ]
+
+    def output_files(self, lab_test):
+        return [ self.asm_filekey + "_exec.txt" ]
+
+    def cache_tools(self):
+        return [ "java" ]
+
+    def cache_files(self, lab_test):
+        return [ lab_test.submission_top_path / self.RARS_FILENAME ]
+
     def perform_test(self, lab_test):
         asm_filename = lab_test.get_filename_from_key(self.asm_filekey)
 
@@ -430,8 +869,10 @@ class rars_raw(tester_module):
         #if proc.returncode:
         #	lab_test.print_warning("Failed to simulate assembler files")
         #	return False
-        return_code = lab_test.subprocess_file_print(rars_log_filepath, rars_cmd, lab_test.execution_path )
-        if return_code:
+        monitor = log_monitor.line_monitor("rars")
+        return_code = lab_test.subprocess_file_print(rars_log_filepath, rars_cmd, lab_test.execution_path,
+            monitor=monitor)
+        if not tool_log_ok(lab_test, monitor, return_code):
             lab_test.print_warning("Failed to simulate assembler files")
             return False
         return True
@@ -450,6 +891,11 @@ class rars_sim_print(rars_raw):
         ''' returns a string indicating the name of the module. Used for logging. '''
         return str.format("RARS assembly and run with file ({})",self.asm_filekey)
 
+    def output_files(self, lab_test):
+        files = super().output_files(lab_test)
+        files.append(str.format("{}.txt",self.asm_filekey))
+        return files
+
     def perform_test(self, lab_test):
         # Bug! Using key for filename rather than actual file
         asm_filename = lab_test.get_filename_from_key(self.asm_filekey)
@@ -483,13 +929,24 @@ class rars_mem_file(rars_raw):
         ''' returns a string indicating the name of the module. Used for logging. '''
         return str.format("RARS memory generation with file ({})",self.asm_filekey)
 
-    def perform_test(self, lab_test):
+    def mem_filenames(self, lab_test):
+        ''' Returns the names of the instruction and data memory files generated from the assembly file '''
         asm_filename = lab_test.get_filename_from_key(self.asm_filekey)
-        asm_path = pathlib.Path(asm_filename)
-        asm_basename = asm_path.stem
-        asm_rootname = asm_path.name
-        i_mem_filename = str.format("{}_text.mem",asm_basename)		
-        d_mem_filename = str.format("{}_data.mem",asm_basename)		
+        asm_basename = pathlib.Path(asm_filename).stem
+        i_mem_filename = str.format("{}_text.mem",asm_basename)
+        d_mem_filename = str.format("{}_data.mem",asm_basename)
+        return (i_mem_filename, d_mem_filename)
+
+    def output_files(self, lab_test):
+        files = super().output_files(lab_test)
+        i_mem_filename, d_mem_filename = self.mem_filenames(lab_test)
+        files.append(i_mem_filename)
+        if self.generate_data_mem:
+            files.append(d_mem_filename)
+        return files
+
+    def perform_test(self, lab_test):
+        i_mem_filename, d_mem_filename = self.mem_filenames(lab_test)
         # Initial options "ae1" - return a 1 return code with assembly error
         self.rars_options = ["ae1", "mc", "CompactTextAtZero", "a", "dump", ".text", "HexText", i_mem_filename]
         # Add options for data memory
@@ -503,6 +960,14 @@ class rars_mem_file(rars_raw):
             return False
         return True
 
+def update_log_filename(bitstream_filename):
+    ''' Returns the name of the log file for a bitstream update '''
+    return str(pathlib.Path(bitstream_filename).stem + "_update.txt")
+
+def load_mem_script_path(lab_test):
+    ''' Returns the path of the 'load_mem.tcl' script used to update bitstreams '''
+    return lab_test.submission_top_path / "resources/load_mem.tcl"
+
 class update_bistream(tester_module):
     ''' 
     A base update bitstream class for generating a new bitstream using the 'load_mem.tcl' vivado script
@@ -531,21 +996,37 @@ class update_bitstream_mem(tester_module):
         return str.format("Bitstream Updating with ({},{})",
             self.text_mem_filename, self.data_mem_filename)
 
+    def input_files(self, lab_test):
+        return [ self.input_dcp_filename, self.text_mem_filename, self.data_mem_filename ]
+
+    def output_files(self, lab_test):
+        files = [ self.bitstream_filename, update_log_filename(self.bitstream_filename) ]
+        if self.output_dcp != "":
+            files.append(self.output_dcp)
+        return files
+
+    def cache_tools(self):
+        return [ "vivado" ]
+
+    def cache_files(self, lab_test):
+        return [ load_mem_script_path(lab_test) ]
+
     def perform_test(self, lab_test):
 
         #print( "RARS execution of", asm_filename,"with options",self.rars_options)
 
-        load_mem_path = lab_test.submission_top_path / "resources/load_mem.tcl"
+        load_mem_path = load_mem_script_path(lab_test)
 
-        updatemem_cmd = ["vivado", "-mode", "batch", "-source", str(load_mem_path), 
-             "-tclargs", "updateMem2",
+        updatemem_args = [ "updateMem2",
             self.input_dcp_filename, self.text_mem_filename, self.data_mem_filename, 
             self.bitstream_filename]
         if self.output_dcp != "":
-            updatemem_cmd.append(self.output_dcp)
-        print(updatemem_cmd)
-        proc = subprocess.run(updatemem_cmd, cwd=lab_test.execution_path,check=False)
-        if proc.returncode:
+            updatemem_args.append(self.output_dcp)
+        print(updatemem_args)
+        monitor = log_monitor.line_monitor("vivado")
+        return_code = lab_test.vivado_script_print(lab_test.execution_path / update_log_filename(self.bitstream_filename),
+            load_mem_path, lab_test.execution_path, updatemem_args, monitor)
+        if not tool_log_ok(lab_test, monitor, return_code):
             lab_test.print_warning("Failed to update bitfile")
             return False
         return True
@@ -568,29 +1049,47 @@ class update_font_mem(tester_module):
         return str.format("Bitstream Font Update with ({})",
             self.font_file)
 
+    def input_files(self, lab_test):
+        # The memory file is relative to the lab directory
+        rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+        return [ self.input_dcp_filename, os.path.join(rel_path,self.font_file) ]
+
+    def output_files(self, lab_test):
+        files = [ self.bitstream_filename, update_log_filename(self.bitstream_filename) ]
+        if self.output_dcp != "":
+            files.append(self.output_dcp)
+        return files
+
+    def cache_tools(self):
+        return [ "vivado" ]
+
+    def cache_files(self, lab_test):
+        return [ load_mem_script_path(lab_test) ]
+
     def perform_test(self, lab_test):
 
         #print( "RARS execution of", asm_filename,"with options",self.rars_options)
 
-        load_mem_path = lab_test.submission_top_path / "resources/load_mem.tcl"
+        load_mem_path = load_mem_script_path(lab_test)
 
         # Determine relative path to the font memory
         rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
         font_path = os.path.join(rel_path,self.font_file)
 
-        updatemem_cmd = ["vivado", "-mode", "batch", "-source", str(load_mem_path), 
-             "-tclargs", "updateFont",
+        updatemem_args = [ "updateFont",
             self.input_dcp_filename, 
             #self.font_file,
             font_path,
             self.bitstream_filename]
 
         if self.output_dcp != "":
-            updatemem_cmd.append(self.output_dcp)
-        print(updatemem_cmd)
+            updatemem_args.append(self.output_dcp)
+        print(updatemem_args)
         print(lab_test.execution_path)
-        proc = subprocess.run(updatemem_cmd, cwd=lab_test.execution_path,check=False)
-        if proc.returncode:
+        monitor = log_monitor.line_monitor("vivado")
+        return_code = lab_test.vivado_script_print(lab_test.execution_path / update_log_filename(self.bitstream_filename),
+            load_mem_path, lab_test.execution_path, updatemem_args, monitor)
+        if not tool_log_ok(lab_test, monitor, return_code):
             lab_test.print_warning("Failed to update bitfile")
             return False
         return True
@@ -612,28 +1111,196 @@ class update_background_mem(tester_module):
         return str.format("Bitstream Background Update with ({})",
             self.background_file)
 
+    def input_files(self, lab_test):
+        # The memory file is relative to the lab directory
+        rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+        return [ self.input_dcp_filename, os.path.join(rel_path,self.background_file) ]
+
+    def output_files(self, lab_test):
+        files = [ self.bitstream_filename, update_log_filename(self.bitstream_filename) ]
+        if self.output_dcp != "":
+            files.append(self.output_dcp)
+        return files
+
+    def cache_tools(self):
+        return [ "vivado" ]
+
+    def cache_files(self, lab_test):
+        return [ load_mem_script_path(lab_test) ]
+
     def perform_test(self, lab_test):
 
         #print( "RARS execution of", asm_filename,"with options",self.rars_options)
 
-        load_mem_path = lab_test.submission_top_path / "resources/load_mem.tcl"
+        load_mem_path = load_mem_script_path(lab_test)
 
         # Determine relative path to the background memory
         rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
         background_path = os.path.join(rel_path,self.background_file)
 
-        updatemem_cmd = ["vivado", "-mode", "batch", "-source", str(load_mem_path), 
-             "-tclargs", "updateBackground",
+        updatemem_args = [ "updateBackground",
             self.input_dcp_filename, 
             #self.background_file,
             background_path,
             self.bitstream_filename]
         if self.output_dcp != "":
-            updatemem_cmd.append(self.output_dcp)
-        print(updatemem_cmd)
+            updatemem_args.append(self.output_dcp)
+        print(updatemem_args)
         print(lab_test.execution_path)
-        proc = subprocess.run(updatemem_cmd, cwd=lab_test.execution_path,check=False)
-        if proc.returncode:
+        monitor = log_monitor.line_monitor("vivado")
+        return_code = lab_test.vivado_script_print(lab_test.execution_path / update_log_filename(self.bitstream_filename),
+            load_mem_path, lab_test.execution_path, updatemem_args, monitor)
+        if not tool_log_ok(lab_test, monitor, return_code):
+            lab_test.print_warning("Failed to update bitfile")
+            return False
+        return True
+
+class mem_update_step():
+    '''
+    A single memory update applied by an 'update_mem_chain' module. A bitstream and/or a
+    checkpoint of the design can be written after the update (leave the filename empty
+    to not write the file).
+    '''
+
+    def __init__(self, bitstream_filename = "", output_dcp = ""):
+        self.bitstream_filename = bitstream_filename
+        self.output_dcp = output_dcp
+
+    def description(self):
+        return "BASE UPDATE"
+
+    def mem_filenames(self, lab_test):
+        ''' returns the memory files (relative to the execution path) used by the update '''
+        return []
+
+    def update_tclargs(self, lab_test):
+        ''' returns the 'updateChain' arguments for the update (see load_mem.tcl) '''
+        return []
+
+    def tclargs(self, lab_test):
+        ''' returns the 'updateChain' arguments for the update and the files written after it '''
+        args = self.update_tclargs(lab_test)
+        if self.bitstream_filename != "":
+            args.extend(["bitstream", self.bitstream_filename])
+        if self.output_dcp != "":
+            args.extend(["checkpoint", self.output_dcp])
+        return args
+
+    def output_files(self, lab_test):
+        files = []
+        if self.bitstream_filename != "":
+            files.append(self.bitstream_filename)
+        if self.output_dcp != "":
+            files.append(self.output_dcp)
+        return files
+
+class font_update(mem_update_step):
+    ''' Update of the VGA font ROM with a font file (relative to the lab directory) '''
+
+    def __init__(self, font_memory_file, bitstream_filename = "", output_dcp = ""):
+        super().__init__(bitstream_filename, output_dcp)
+        self.font_file = font_memory_file
+
+    def description(self):
+        return str.format("font {}", self.font_file)
+
+    def mem_filenames(self, lab_test):
+        rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+        return [ os.path.join(rel_path,self.font_file) ]
+
+    def update_tclargs(self, lab_test):
+        return [ "font" ] + self.mem_filenames(lab_test)
+
+class background_update(mem_update_step):
+    ''' Update of the VGA character memory with a background file (relative to the lab directory) '''
+
+    def __init__(self, background_memory_file, bitstream_filename = "", output_dcp = ""):
+        super().__init__(bitstream_filename, output_dcp)
+        self.background_file = background_memory_file
+
+    def description(self):
+        return str.format("background {}", self.background_file)
+
+    def mem_filenames(self, lab_test):
+        rel_path = os.path.relpath(os.path.relpath(lab_test.submission_lab_path,lab_test.execution_path))
+        return [ os.path.join(rel_path,self.background_file) ]
+
+    def update_tclargs(self, lab_test):
+        return [ "background" ] + self.mem_filenames(lab_test)
+
+class program_update(mem_update_step):
+    ''' Update of the riscv instruction and data memories (files relative to the execution path) '''
+
+    def __init__(self, text_mem_filename, data_mem_filename, bitstream_filename = "", output_dcp = ""):
+        super().__init__(bitstream_filename, output_dcp)
+        self.text_mem_filename = text_mem_filename
+        self.data_mem_filename = data_mem_filename
+
+    def description(self):
+        return str.format("program {},{}", self.text_mem_filename, self.data_mem_filename)
+
+    def mem_filenames(self, lab_test):
+        return [ self.text_mem_filename, self.data_mem_filename ]
+
+    def update_tclargs(self, lab_test):
+        return [ "program" ] + self.mem_filenames(lab_test)
+
+class update_mem_chain(tester_module):
+    '''
+    A tester module that applies a sequence of memory updates (font, background, program) to
+    a checkpoint. The checkpoint is opened once and the updates are applied to the design in
+    memory with the 'updateChain' command of 'load_mem.tcl'. Bitstreams and intermediate
+    checkpoints are only written for the steps that request them.
+    '''
+
+    def __init__(self, input_dcp_filename, update_steps):
+        self.input_dcp_filename = input_dcp_filename
+        self.update_steps = update_steps
+
+    def module_name(self):
+        ''' returns a string indicating the name of the module. Used for logging. '''
+        return str.format("Bitstream Update Chain on {} ({})", self.input_dcp_filename,
+            "; ".join(step.description() for step in self.update_steps))
+
+    def log_filename(self):
+        ''' The log is named after the last file written by the chain '''
+        output_files = []
+        for step in self.update_steps:
+            output_files.extend(step.output_files(None))
+        if len(output_files) == 0:
+            return update_log_filename(self.input_dcp_filename)
+        return update_log_filename(output_files[-1])
+
+    def input_files(self, lab_test):
+        files = [ self.input_dcp_filename ]
+        for step in self.update_steps:
+            files.extend(step.mem_filenames(lab_test))
+        return files
+
+    def output_files(self, lab_test):
+        files = [ self.log_filename() ]
+        for step in self.update_steps:
+            files.extend(step.output_files(lab_test))
+        return files
+
+    def cache_tools(self):
+        return [ "vivado" ]
+
+    def cache_files(self, lab_test):
+        return [ load_mem_script_path(lab_test) ]
+
+    def perform_test(self, lab_test):
+
+        load_mem_path = load_mem_script_path(lab_test)
+
+        updatemem_args = [ "updateChain", self.input_dcp_filename ]
+        for step in self.update_steps:
+            updatemem_args.extend(step.tclargs(lab_test))
+        print(updatemem_args)
+        monitor = log_monitor.line_monitor("vivado")
+        return_code = lab_test.vivado_script_print(lab_test.execution_path / self.log_filename(),
+            load_mem_path, lab_test.execution_path, updatemem_args, monitor)
+        if not tool_log_ok(lab_test, monitor, return_code):
             lab_test.print_warning("Failed to update bitfile")
             return False
         return True
@@ -0,0 +1,251 @@
+#!/usr/bin/python3
+
+'''
+Record and replay of the tool runs of the passoff scripts.
+
+Classes:
+  tool_invocation: the identity of a tool run (command, directory, the hashes of the
+    files it reads and the earlier tool runs of its test module)
+  tool_recording: captures the output and the files written by a tool run that is in
+    progress and stores them in the recording directory
+  tool_recorder: the recording directory of a passoff run (--record_dir or --replay_dir)
+
+When a passoff script is run with '--record_dir <dir>', every tool run (xvlog, xelab,
+xsim, vivado, rars) is stored in the directory: the command, the directory it ran in,
+the hashes of its input files, its return code, its output and the files it wrote.
+When the script is run with '--replay_dir <dir>', the tools are not run: the output
+of the recorded run with the same command and inputs is passed through the log, the
+monitor and the terminal as if the tool had produced it and the files it wrote are
+restored. The results of a cohort can then be graded again with new error checks or
+reports in seconds and without the tools being installed.
+
+The paths in the commands are stored relative to the execution directory, the top of
+the submission and the home directory so that a recording made in one extract
+directory can be replayed in another. The passoff script must be replayed with the
+same options as the recording (i.e., --sandbox) since the options change the tool runs. The input files of a run are the files named
+on its command line and the files named in the scripts it runs (-source, -tclbatch).
+The files read implicitly (i.e., the xsim.dir libraries read by xelab and xsim) are
+covered by the identity of the earlier tool runs of the same test module.
+The tool runs must not depend on state outside of the submission: the precompiled
+simulation library and the reference checkpoints are not used when recording or
+replaying, and the tools are recorded one at a time so that the files written by a
+tool can be told apart from the files written by another tool.
+
+Layout of the recording directory:
+  <key>/invocation.json  - command, directory, inputs, return code and written files
+  <key>/output.txt       - the output of the tool
+  <key>/files/...        - the files written by the tool (relative to its directory)
+
+Usage (list the recorded runs):
+  tool_replay.py <dir>
+'''
+
+import argparse
+import hashlib
+import json
+import os
+import pathlib
+import re
+import shutil
+import tempfile
+import time
+
+# Hashes of the input files
+import result_cache
+# Compressed log files
+import compressed_log
+
+INVOCATION_FILENAME = "invocation.json"
+OUTPUT_FILENAME = "output.txt"
+FILES_DIRNAME = "files"
+# Options of the tools that name a script (the files named in the script are inputs)
+SCRIPT_OPTIONS = ("-source", "-tclbatch")
+# Separators of the file names in scripts and options (i.e., -generic TEXT_MEMORY_FILENAME=a.mem)
+NAME_SEPARATORS = re.compile(r"[\s{}\"'=;]+")
+
+def path_roots(execution_path, submission_top_path):
+    ''' Returns the (placeholder, path) pairs used to make the paths of a tool run relative '''
+    roots = [ ("{exec}", os.path.abspath(str(execution_path))),
+        ("{top}", os.path.abspath(str(submission_top_path))),
+        ("{home}", os.path.abspath(os.path.expanduser("~"))) ]
+    # The longest path first (the execution directory is in the submission)
+    return sorted(roots, key=lambda root: len(root[1]), reverse=True)
+
+def relative_name(value, roots):
+    ''' Replace the first root path found in a string by its placeholder '''
+    value = str(value)
+    for placeholder, root in roots:
+        if root in value:
+            return value.replace(root, placeholder)
+    return value
+
+def file_names(value):
+    return [ name for name in NAME_SEPARATORS.split(str(value)) if name ]
+
+class tool_invocation:
+    ''' A tool run identified by its command, directory and input files '''
+
+    def __init__(self, proc_cmd, proc_cwd, roots, previous=()):
+        proc_cwd = os.path.abspath(str(proc_cwd))
+        self.command = [ relative_name(os.path.normpath(str(arg)) if os.path.isabs(str(arg)) else arg, roots)
+            for arg in proc_cmd ]
+        self.cwd = relative_name(proc_cwd, roots)
+        self.tool = os.path.basename(str(proc_cmd[0]))
+        # Keys of the earlier tool runs of the test module
+        self.previous = list(previous)
+        self.inputs = {}
+        names = [ str(arg) for arg in proc_cmd[1:] ]
+        for option, script in zip(names, names[1:]):
+            if option in SCRIPT_OPTIONS:
+                try:
+                    with open(os.path.join(proc_cwd, script), errors="replace") as fp:
+                        names.extend(name for line in fp if not line.lstrip().startswith("#")
+                            for name in file_names(line))
+                except OSError:
+                    pass
+        for arg in names:
+            for name in file_names(arg):
+                filepath = os.path.normpath(os.path.join(proc_cwd, name))
+                if os.path.isfile(filepath):
+                    self.inputs[relative_name(filepath, roots)] = result_cache.file_hash(filepath)
+        h = hashlib.sha256()
+        h.update(json.dumps([ self.command, self.cwd, sorted(self.inputs.items()), self.previous ]).encode())
+        self.key = h.hexdigest()[:32]
+
+    def as_dict(self):
+        return { "key" : self.key, "tool" : self.tool, "command" : self.command, "cwd" : self.cwd,
+            "inputs" : self.inputs, "previous" : self.previous }
+
+def directory_state(path, skip):
+    ''' Returns the size and modification time of the files in a directory tree '''
+    state = {}
+    for root, dirs, files in os.walk(path):
+        dirs[:] = [ d for d in dirs if os.path.join(root, d) not in skip ]
+        for filename in files:
+            filepath = os.path.join(root, filename)
+            if filepath in skip:
+                continue
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                continue
+            state[os.path.relpath(filepath, path)] = (st.st_size, st.st_mtime_ns)
+    return state
+
+class tool_recording:
+    ''' A tool run that is being recorded '''
+
+    def __init__(self, recorder, invocation, proc_cwd, log_filepath):
+        self.recorder = recorder
+        self.invocation = invocation
+        self.proc_cwd = os.path.realpath(str(proc_cwd))
+        self.tmp_path = pathlib.Path(tempfile.mkdtemp(dir=str(recorder.record_path), prefix="tmp_"))
+        # The log of the run and the recording directory are not outputs of the tool
+        self.skip = { os.path.realpath(str(recorder.record_path)) }
+        self.skip.update(os.path.realpath(f) for f in compressed_log.stored_files([ str(log_filepath) ]))
+        self.before = directory_state(self.proc_cwd, self.skip)
+        # Receives the output of the tool (see process_runner)
+        self.output = open(self.tmp_path / OUTPUT_FILENAME, "wb")
+
+    def finish(self, return_code):
+        ''' Store the recording (with the files the tool wrote) '''
+        self.output.close()
+        written = []
+        for filename, state in sorted(directory_state(self.proc_cwd, self.skip).items()):
+            if self.before.get(filename) == state:
+                continue
+            target = self.tmp_path / FILES_DIRNAME / filename
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(os.path.join(self.proc_cwd, filename), str(target))
+            written.append(filename)
+        entry = self.invocation.as_dict()
+        entry.update({ "return_code" : return_code, "files" : written,
+            "recorded" : time.strftime("%Y-%m-%d %H:%M:%S") })
+        with open(self.tmp_path / INVOCATION_FILENAME, "w") as fp:
+            json.dump(entry, fp, indent=1)
+        self.recorder.store(self.tmp_path, self.invocation.key)
+
+    def discard(self):
+        self.output.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+class tool_recorder:
+    ''' The recorded tool runs of a passoff script '''
+
+    def __init__(self, record_dir, replaying=False):
+        self.record_path = pathlib.Path(record_dir).expanduser().absolute()
+        self.replaying = replaying
+        self.record_path.mkdir(parents=True, exist_ok=True)
+
+    def invocation(self, proc_cmd, proc_cwd, execution_path, submission_top_path, previous=()):
+        return tool_invocation(proc_cmd, proc_cwd, path_roots(execution_path, submission_top_path), previous)
+
+    def start(self, invocation, proc_cwd, log_filepath):
+        ''' Start recording a tool run '''
+        return tool_recording(self, invocation, proc_cwd, log_filepath)
+
+    def store(self, tmp_path, key):
+        entry_path = self.record_path / key
+        if entry_path.exists():
+            # Recorded again (i.e., the same run in another module): the latest recording is kept
+            shutil.rmtree(entry_path, ignore_errors=True)
+        try:
+            os.rename(tmp_path, entry_path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def lookup(self, invocation):
+        ''' Returns the recording of an invocation (None if it was not recorded) '''
+        try:
+            with open(self.record_path / invocation.key / INVOCATION_FILENAME) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return None
+
+    def output_filepath(self, entry):
+        return self.record_path / entry["key"] / OUTPUT_FILENAME
+
+    def restore_files(self, entry, proc_cwd):
+        ''' Restore the files written by a recorded run. Returns the names of the files. '''
+        files_path = self.record_path / entry["key"] / FILES_DIRNAME
+        for filename in entry["files"]:
+            target = os.path.join(str(proc_cwd), filename)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(str(files_path / filename), target)
+        return entry["files"]
+
+    def entries(self):
+        entries = []
+        for filepath in sorted(self.record_path.glob("*/" + INVOCATION_FILENAME)):
+            try:
+                with open(filepath) as fp:
+                    entries.append(json.load(fp))
+            except (OSError, ValueError):
+                continue
+        return entries
+
+    def mismatch(self, invocation):
+        ''' Describe why an invocation was not recorded: the inputs that differ from a
+        recording of the same command (None if the command was never recorded) '''
+        for entry in self.entries():
+            if entry["command"] != invocation.command or entry["cwd"] != invocation.cwd:
+                continue
+            changed = [ name for name in sorted(set(entry["inputs"]) | set(invocation.inputs))
+                if entry["inputs"].get(name) != invocation.inputs.get(name) ]
+            if changed:
+                return "inputs changed since the recording: " + ", ".join(changed)
+            return "earlier tool runs of the test module differ from the recording"
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="List the recorded tool runs of a recording directory")
+    parser.add_argument("record_dir", help="Recording directory (--record_dir of the passoff scripts)")
+    args = parser.parse_args()
+    entries = tool_recorder(args.record_dir).entries()
+    for entry in entries:
+        print(str.format("{} {:<7} rc={:<4} files={:<3} {}", entry["key"][:12], entry["tool"],
+            entry["return_code"], len(entry["files"]), " ".join(entry["command"][1:])[:100]))
+    print(len(entries), "recorded tool runs")
+
+if __name__ == "__main__":
+    main()
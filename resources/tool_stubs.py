@@ -0,0 +1,295 @@
+#!/usr/bin/python3
+
+'''
+Deterministic stand-ins for the tools run by the passoff scripts.
+
+Classes:
+  stub_tool: one run of a stand-in tool (output, latency, output files and the ledger
+    entry of the run)
+
+The stand-ins replace xvlog, xvhdl, xelab, xsim, vivado (batch mode) and 'java -jar rars'
+so that the passoff scripts can be run end to end on a host without the Xilinx tools
+(see harness_benchmark). Each tool prints a log with the volume and the kind of lines
+of the real tool (INFO/WARNING messages, simulation output, the timing lines of the
+Vivado commands) and takes the latency of the real tool on a small design. The output
+and the latency only depend on the command line so that two runs of a stand-in are
+identical. The output files read by the later steps are created (the xsim.dir
+directory, checkpoints, bitstreams and the memory files dumped by RARS).
+
+The stand-ins are installed in a directory that is put at the front of PATH:
+  tool_stubs.py --install <bin_dir>
+A tool is then run as usual (i.e., 'xvlog --nolog -sv alu.sv'). The following
+environment variables change the behavior of the stand-ins:
+  TOOL_STUB_LATENCY_SCALE: factor applied to the latencies (default 1.0, 0 for none)
+  TOOL_STUB_VOLUME_SCALE: factor applied to the number of lines of output (default 1.0)
+  TOOL_STUB_LEDGER: file where a JSON line is appended for each run (tool, command,
+    elapsed time, lines and bytes of output) so that the time spent in the tools can be
+    told apart from the time spent in the passoff script
+'''
+
+import argparse
+import json
+import os
+import pathlib
+import sys
+import time
+import zlib
+
+# Tools replaced by the stand-ins
+TOOLS = ("xvlog", "xvhdl", "xelab", "xsim", "vivado", "java")
+
+# Latency (seconds) and lines of output of the Vivado commands on one of the lab designs
+VIVADO_PHASES = {
+    "link_design" : (12.0, 250),
+    "synth_design" : (95.0, 4000),
+    "opt_design" : (15.0, 350),
+    "place_design" : (60.0, 2500),
+    "route_design" : (85.0, 3000),
+    "write_checkpoint" : (4.0, 20),
+    "read_checkpoint" : (6.0, 60),
+    "open_checkpoint" : (20.0, 200),
+    "write_bitstream" : (35.0, 400),
+}
+# Latency and lines of output of each memory loaded by load_mem.tcl
+MEMORY_UPDATE = (3.0, 150)
+# Start up of Vivado and of the JVM running RARS
+VIVADO_STARTUP = (8.0, 25)
+RARS_STARTUP = (1.0, 2)
+# Analysis (per file), elaboration and simulation
+ANALYZE_FILE = (0.4, 6)
+ANALYZE_STARTUP = (1.2, 4)
+ELABORATE = (6.0, 60)
+TESTBENCH_SIMULATION = (5.0, 4000)
+TCL_SIMULATION = (4.0, 1500)
+# Number of bursts the output of a step is written in (the latency is spread over them)
+BURSTS = 8
+# Number of different lines in the output of a step
+PATTERN_LINES = 5000
+# Words written in each memory file dumped by RARS
+DUMP_WORDS = 256
+
+def scale(name, default=1.0):
+    try:
+        return max(0.0, float(os.environ.get(name, default)))
+    except ValueError:
+        return default
+
+def hms(seconds):
+    ''' Returns the 'hh:mm:ss' form of a duration (as printed in the Vivado timing lines) '''
+    seconds = int(round(seconds))
+    return str.format("{:02d}:{:02d}:{:02d}", seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+def word(seed, index):
+    ''' A deterministic 32-bit value (used for simulated signals and memory contents) '''
+    return (seed * 1103515245 + index * 2654435761 + 12345) & 0xffffffff
+
+class stub_tool:
+    ''' A run of a stand-in tool '''
+
+    def __init__(self, tool, args):
+        self.tool = tool
+        self.args = args
+        self.latency_scale = scale("TOOL_STUB_LATENCY_SCALE")
+        self.volume_scale = scale("TOOL_STUB_VOLUME_SCALE")
+        self.seed = zlib.crc32(" ".join([tool] + args).encode())
+        self.lines = 0
+        self.bytes = 0
+        self.start_time = time.monotonic()
+
+    def write(self, lines):
+        data = "".join(line + "\n" for line in lines).encode()
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        self.lines += len(lines)
+        self.bytes += len(data)
+
+    def step(self, latency, line_count, make_line):
+        ''' Write the output of a step (scaled number of lines made by 'make_line(i)') in
+        bursts spread over the (scaled) latency of the step '''
+        line_count = max(1, int(line_count * self.volume_scale))
+        bursts = min(BURSTS, line_count)
+        delay = latency * self.latency_scale / bursts
+        # A large output repeats its first lines (so that the tool is not slowed down by formatting)
+        pattern = [ make_line(i) for i in range(min(line_count, PATTERN_LINES)) ]
+        for burst in range(bursts):
+            if delay > 0:
+                time.sleep(delay)
+            first = line_count * burst // bursts
+            last = line_count * (burst + 1) // bursts
+            self.write([ pattern[i % len(pattern)] for i in range(first, last) ])
+
+    def run(self):
+        if "-version" in self.args or "--version" in self.args:
+            self.write([ str.format("{} v2020.2 (64-bit) [stand-in]", self.tool) ])
+            return 0
+        return getattr(self, "run_" + self.tool)()
+
+    def record(self, return_code):
+        ''' Append the ledger entry of the run '''
+        ledger = os.environ.get("TOOL_STUB_LEDGER")
+        if not ledger:
+            return
+        entry = { "tool" : self.tool, "args" : self.args[:8], "cwd" : os.getcwd(),
+            "elapsed" : round(time.monotonic() - self.start_time, 6), "lines" : self.lines,
+            "bytes" : self.bytes, "return_code" : return_code }
+        # A single write of a line (opened for append) so that concurrent tools do not interleave
+        with open(ledger, "a") as fp:
+            fp.write(json.dumps(entry) + "\n")
+
+    def option_value(self, option, default=None):
+        if option in self.args:
+            index = self.args.index(option)
+            if index + 1 < len(self.args):
+                return self.args[index + 1]
+        return default
+
+    def run_xvlog(self, language="SystemVerilog"):
+        files = [ arg for arg in self.args if arg.endswith((".sv", ".v", ".vh", ".vhd", ".vhdl")) ]
+        work = self.option_value("--work", "work")
+        library, _, library_dir = work.partition("=")
+        library_path = pathlib.Path(library_dir) if library_dir else pathlib.Path("xsim.dir") / library
+        library_path.mkdir(parents=True, exist_ok=True)
+        self.step(*ANALYZE_STARTUP, lambda i: str.format("INFO: [XSIM 43-3496] Using init file passed via -initfile option {}", i))
+        for filename in files:
+            stem = pathlib.Path(filename).stem
+            self.step(*ANALYZE_FILE, lambda i: str.format(
+                "INFO: [VRFC 10-2263] Analyzing {0} file \"{1}\" into library {2}" if i == 0 else
+                "INFO: [VRFC 10-311] analyzing module {3}_{4}", language, os.path.abspath(filename), library, stem, i))
+            (library_path / (stem + ".sdb")).write_text(stem + "\n")
+        return 0
+
+    def run_xvhdl(self):
+        return self.run_xvlog("VHDL")
+
+    def run_xelab(self):
+        snapshot = self.option_value("-s")
+        if snapshot is None:
+            positional = [ arg for arg in self.args if not arg.startswith("-") and "=" not in arg ]
+            snapshot = positional[-1] if positional else "snapshot"
+        snapshot = snapshot.split(".")[-1]
+        self.write([ "Vivado Simulator v2020.2", "Copyright 1986-1999, 2001-2020 Xilinx, Inc. All Rights Reserved.",
+            "Running: xelab " + " ".join(self.args), "Multi-threading is on. Using 2 slave threads.",
+            "Starting static elaboration" ])
+        self.step(*ELABORATE, lambda i: str.format("Compiling module work.{}_{}", snapshot, i))
+        snapshot_path = pathlib.Path("xsim.dir") / snapshot
+        snapshot_path.mkdir(parents=True, exist_ok=True)
+        (snapshot_path / "xsimk").write_text(" ".join(self.args) + "\n")
+        self.write([ "Built simulation snapshot " + snapshot ])
+        return 0
+
+    def run_xsim(self):
+        snapshot = next((arg for arg in self.args if not arg.startswith("-")), "snapshot")
+        self.write([ "", "****** xsim v2020.2 (64-bit)", "  **** SW Build 3064766 on Wed Nov 18 09:12:47 MST 2020",
+            "", "source xsim.dir/" + snapshot + "/xsim_script.tcl", "# xsim {" + snapshot + "} -autoloadwcfg" ])
+        if "-tclbatch" in self.args:
+            latency, line_count = TCL_SIMULATION
+            make_line = lambda i: str.format("# add_force {{/{}/in_{}}} {:d} ; run 10 ns", snapshot, i % 16,
+                word(self.seed, i) & 1)
+        else:
+            latency, line_count = TESTBENCH_SIMULATION
+            make_line = lambda i: str.format("[{} ns] cycle {}: PC=0x{:08x} instruction=0x{:08x} result=0x{:08x}",
+                i * 10, i, i * 4, word(self.seed, i), word(self.seed, i + 1))
+        self.step(latency, line_count, make_line)
+        self.write([ "Simulation completed with 0 errors",
+            str.format("run: Time (s): cpu = {} ; elapsed = {} . Memory (MB): peak = 1820.448 ; gain = 14.605",
+                hms(latency * 0.9), hms(latency)),
+            "INFO: [Common 17-206] Exiting xsim at " + time.strftime("%a %b %d %H:%M:%S %Y", time.gmtime(0)) ])
+        return 0
+
+    def vivado_phase(self, phase, latency, line_count):
+        self.step(latency, line_count, lambda i: str.format(
+            "INFO: [{} 8-{}] {} step {} of design" if i % 25 else "WARNING: [{} 8-{}] {} step {} has an unconnected port",
+            phase.split("_")[0].capitalize(), 6000 + i % 300, phase, i))
+        self.write([ str.format("{}: Time (s): cpu = {} ; elapsed = {} . Memory (MB): peak = {:.3f} ; gain = {:.3f} ;"
+            " free physical = 9000 ; free virtual = 12000", phase, hms(latency * 0.8), hms(latency),
+            1500.0 + line_count / 4.0, line_count / 8.0) ])
+
+    def run_vivado(self):
+        if self.option_value("-mode") != "batch" or "-source" not in self.args:
+            self.write([ "ERROR: [Common 17-69] Command failed: the stand-in Vivado only runs scripts in batch mode" ])
+            return 1
+        script = self.option_value("-source")
+        tclargs = self.args[self.args.index("-tclargs") + 1:] if "-tclargs" in self.args else []
+        self.step(*VIVADO_STARTUP, lambda i: str.format("INFO: [Common 17-{}] Loading Vivado stand-in component {}", 1000 + i, i))
+        self.write([ "source " + script ])
+        if os.path.basename(script) == "load_mem.tcl":
+            return self.update_memories(tclargs)
+        with open(script) as fp:
+            commands = [ line.split() for line in fp if line.strip() and not line.startswith("#") ]
+        for command in commands:
+            self.write([ "# " + " ".join(command) ])
+            if command[0] not in VIVADO_PHASES:
+                continue
+            self.vivado_phase(command[0], *VIVADO_PHASES[command[0]])
+            if command[0] in ("write_checkpoint", "write_bitstream"):
+                self.write_output([ arg for arg in command[1:] if not arg.startswith("-") ])
+        self.write([ "INFO: [Common 17-206] Exiting Vivado" ])
+        return 0
+
+    def update_memories(self, tclargs):
+        ''' The load_mem.tcl updates: the memories are loaded in the input checkpoint and the
+        bitstreams (.bit) and checkpoints (.dcp) named in the arguments are written '''
+        if len(tclargs) < 2 or not os.path.exists(tclargs[1]):
+            self.write([ str.format("ERROR: [Common 17-55] checkpoint {} does not exist", tclargs[1] if len(tclargs) > 1 else "") ])
+            return 1
+        self.vivado_phase("open_checkpoint", *VIVADO_PHASES["open_checkpoint"])
+        outputs = [ arg for arg in tclargs[2:] if arg.endswith((".bit", ".dcp")) ]
+        memories = [ arg for arg in tclargs[2:] if arg not in outputs and os.path.isfile(arg) ]
+        for memory in memories:
+            self.step(*MEMORY_UPDATE, lambda i: str.format("INFO: Updating memory from {} word {}", memory, i))
+        for output in outputs:
+            self.vivado_phase("write_bitstream" if output.endswith(".bit") else "write_checkpoint",
+                *VIVADO_PHASES["write_bitstream" if output.endswith(".bit") else "write_checkpoint"])
+        self.write_output(outputs)
+        return 0
+
+    def write_output(self, filenames):
+        for filename in filenames:
+            with open(filename, "w") as fp:
+                fp.write(str.format("{} output of the stand-in {} ({:08x})\n", filename, self.tool, self.seed))
+
+    def run_java(self):
+        if "-jar" not in self.args:
+            self.write([ "Error: the stand-in java only runs RARS" ])
+            return 1
+        options = self.args[self.args.index("-jar") + 2:]
+        self.write([ "RARS 1.4  Copyright 2003-2019 Pete Sanderson and Kenneth Vollmar", "" ])
+        self.step(*RARS_STARTUP, lambda i: str.format("Program output line {}", i))
+        for i, option in enumerate(options):
+            if option == "dump" and i + 3 < len(options):
+                with open(options[i + 3], "w") as fp:
+                    for index in range(DUMP_WORDS):
+                        fp.write(str.format("{:08x}\n", word(self.seed, index)))
+        self.write([ "", "Program terminated by dropping off the bottom." ])
+        return 0
+
+def install(bin_dir):
+    ''' Write an executable for each tool in 'bin_dir' that runs its stand-in '''
+    bin_path = pathlib.Path(bin_dir)
+    bin_path.mkdir(parents=True, exist_ok=True)
+    for tool in TOOLS:
+        tool_path = bin_path / tool
+        tool_path.write_text(str.format('#!/bin/sh\nexec "{}" "{}" --tool {} -- "$@"\n', sys.executable,
+            os.path.abspath(__file__), tool))
+        tool_path.chmod(0o755)
+    return bin_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Deterministic stand-ins for the Xilinx tools and RARS")
+    parser.add_argument("--install", type=str, help="Install the stand-ins in the given directory")
+    parser.add_argument("--tool", choices=TOOLS, help="Tool to run (used by the installed stand-ins)")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments of the tool")
+    args = parser.parse_args()
+    if args.install:
+        print("Stand-in tools installed in", install(args.install))
+        return 0
+    if args.tool is None:
+        parser.error("--install or --tool is required")
+    tool_args = args.args[1:] if args.args[:1] == ["--"] else args.args
+    tool = stub_tool(args.tool, tool_args)
+    return_code = tool.run()
+    tool.record(return_code)
+    return return_code
+
+if __name__ == "__main__":
+    sys.exit(main())
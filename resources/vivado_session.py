@@ -0,0 +1,213 @@
+#!/usr/bin/python3
+
+'''
+Long-lived Vivado Tcl sessions that are reused by the test modules.
+
+Classes:
+  vivado_session: a single 'vivado -mode tcl' process that executes commands sent over a pipe
+  vivado_session_pool: a set of sessions so that concurrent test modules each get their own session
+
+Starting Vivado takes tens of seconds. Rather than starting a new 'vivado -mode batch'
+process for every build and memory update, the commands are sent to a running Vivado
+process. Each command is wrapped in a 'catch' and followed by a marker line that reports
+the completion and the status of the command. A session that exits or crashes is
+restarted before the next command.
+'''
+
+import atexit
+import itertools
+import os
+import re
+import select
+import subprocess
+import threading
+import time
+
+# Time budgets of the test modules
+import watchdog
+# Compressed log files
+import compressed_log
+# Copies the tool output to the terminal
+import terminal_output
+
+# Marker printed after every command: "@@PASSOFF_DONE <command id> <catch status>"
+DONE_MARKER = "@@PASSOFF_DONE"
+DONE_MARKER_RE = re.compile(DONE_MARKER + r" (\d+) (\d+)")
+# Prompt printed by Vivado in tcl mode (not followed by a newline)
+PROMPT_RE = re.compile(r"^(Vivado% )+")
+# Size of the buffer used when writing the log files
+LOG_BUFFER_SIZE = 1024 * 1024
+
+def tcl_quote(value):
+    ''' Quote a string as a Tcl word '''
+    return "{" + str(value) + "}"
+
+class vivado_session:
+    ''' A Vivado process running in tcl mode '''
+
+    def __init__(self, vivado_cmd=("vivado", "-mode", "tcl", "-nolog", "-nojournal")):
+        self.vivado_cmd = list(vivado_cmd)
+        self.proc = None
+        self.command_ids = itertools.count(1)
+        # Output received from the process that has not yet been split into lines
+        self.pending_output = b""
+
+    def is_running(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def start(self):
+        ''' Start the Vivado process and wait until it is ready for commands '''
+        # A new process group so that a session that exceeds the budget of a test module can
+        # be stopped along with its children
+        self.proc = subprocess.Popen(self.vivado_cmd,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+            start_new_session=True)
+        self.pending_output = b""
+        # Discard the startup banner
+        return self.execute("puts ready", None) == 0
+
+    def stop(self):
+        ''' Exit the Vivado process '''
+        if self.is_running():
+            try:
+                self.proc.stdin.write(b"exit\n")
+                self.proc.stdin.flush()
+                self.proc.wait(timeout=60)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proc.kill()
+                self.proc.wait()
+        self.proc = None
+
+    def execute(self, tcl_command, output_fn, timeout=None):
+        ''' Execute a tcl command in the session. Every line of output is passed to
+        'output_fn' (if given). Returns 0 if the command completed, 1 if the command
+        generated a Tcl error, -1 if the Vivado process exited, and -2 if the command did
+        not complete within the timeout (seconds) and the process was stopped. '''
+        command_id = next(self.command_ids)
+        wrapped = str.format('set __passoff_rc [catch {{ {} }} __passoff_msg]; '
+            'if {{$__passoff_rc}} {{ puts "ERROR: $__passoff_msg" }}; '
+            'puts "{} {} $__passoff_rc"; flush stdout\n', tcl_command, DONE_MARKER, command_id)
+        try:
+            self.proc.stdin.write(wrapped.encode())
+            self.proc.stdin.flush()
+        except OSError:
+            return -1
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        for line in self.read_lines(deadline):
+            match = DONE_MARKER_RE.search(line)
+            if match and int(match.group(1)) == command_id:
+                # Output without a newline that preceded the marker
+                if output_fn and line[:match.start()].strip():
+                    output_fn(line[:match.start()] + "\n")
+                return 1 if int(match.group(2)) else 0
+            if output_fn:
+                output_fn(line)
+        if deadline is not None and self.proc.poll() is None:
+            # Stopped reading at the deadline
+            watchdog.kill_process_group(self.proc.pid)
+            self.proc.wait()
+            return -2
+        # The process exited before the command completed
+        self.proc.wait()
+        return -1
+
+    def read_lines(self, deadline=None):
+        ''' Generator for the lines of output from the process. Ends when the process exits
+        (the exit is detected even if a child process keeps the output pipe open) or when
+        the deadline (time.monotonic) passes. '''
+        fd = self.proc.stdout.fileno()
+        while True:
+            while b"\n" in self.pending_output:
+                raw_line, self.pending_output = self.pending_output.split(b"\n", 1)
+                yield PROMPT_RE.sub("", raw_line.decode(errors="replace")) + "\n"
+            ready, _, _ = select.select([fd], [], [], 1.0)
+            if ready:
+                data = os.read(fd, 65536)
+                if not data:
+                    break
+                self.pending_output += data
+            elif self.proc.poll() is not None:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+        if self.pending_output:
+            yield PROMPT_RE.sub("", self.pending_output.decode(errors="replace")) + "\n"
+            self.pending_output = b""
+
+    def run_script(self, tcl_filename, proc_cwd, tclargs, output_fn, timeout=None):
+        ''' Source a tcl script from the given directory with the given arguments (the same
+        as 'vivado -mode batch -source <script> -tclargs <args>'). Any designs opened by
+        the script are closed when it completes. Returns the status from 'execute'. '''
+        if not self.is_running():
+            output_fn("Starting Vivado tcl session\n")
+            if not self.start():
+                return -1
+        tcl_command = str.format("cd {}; set argv [list {}]; set argc {}; source -notrace {}",
+            tcl_quote(proc_cwd), " ".join(tcl_quote(arg) for arg in tclargs), len(tclargs),
+            tcl_quote(tcl_filename))
+        status = self.execute(tcl_command, output_fn, timeout)
+        if status >= 0:
+            # Leave the session clean for the next command
+            self.execute("while {[current_design -quiet] ne \"\"} { close_design }", None)
+        else:
+            output_fn("Vivado tcl session exited (will be restarted)\n")
+            self.proc = None
+        return status
+
+class vivado_session_pool:
+    ''' A set of Vivado sessions. A command runs in an idle session or a new session is
+    started when all of the sessions are busy. '''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle_sessions = []
+        self.all_sessions = []
+        # The sessions run in their own process groups and are not stopped by a Ctrl-C
+        atexit.register(self.stop)
+
+    def run_script(self, log_filepath, tcl_filename, proc_cwd, tclargs=[], prefix="", echo=True,
+        budget=None, monitor=None, compress=False, output_mode=terminal_output.DEFAULT_OUTPUT_MODE):
+        ''' Run a tcl script in a session and write the output to the log file (and stdout).
+        Returns 0 when the script completes without error and a non-zero value otherwise.
+        The session is stopped if the script exceeds the wall-clock budget of its test module.
+        The output is also passed to the monitor (log_monitor.line_monitor) if one is given.
+        The log is compressed if 'compress' is set and the output mode (see terminal_output)
+        selects the output shown on the terminal. '''
+        with self.lock:
+            if self.idle_sessions:
+                session = self.idle_sessions.pop()
+            else:
+                session = vivado_session()
+                self.all_sessions.append(session)
+        terminal = terminal_output.terminal_sink(output_mode if echo else "file", prefix, "vivado", log_filepath)
+        with compressed_log.open_writer(log_filepath, compress, LOG_BUFFER_SIZE) as fp:
+            fp.write(str.format("Executing the following script in a Vivado tcl session in directory:{}\n\t{} {}\n",
+                proc_cwd, tcl_filename, " ".join(str(arg) for arg in tclargs)).encode())
+            def output_fn(line):
+                fp.write(line.encode())
+                if monitor is not None:
+                    monitor.feed(line)
+                terminal.write(line)
+            if budget is None or budget.wall_time is None:
+                status = session.run_script(tcl_filename, proc_cwd, tclargs, output_fn)
+            else:
+                with budget.charge():
+                    status = session.run_script(tcl_filename, proc_cwd, tclargs, output_fn,
+                        budget.remaining())
+                if status == -2:
+                    budget.wall_time_exceeded()
+                    fp.write(str.format("\nStopped: {}\n", budget.timed_out).encode())
+        if monitor is not None:
+            monitor.finish()
+        terminal.close(status)
+        with self.lock:
+            self.idle_sessions.append(session)
+        return 0 if status == 0 else 1
+
+    def stop(self):
+        ''' Exit all of the sessions '''
+        with self.lock:
+            for session in self.all_sessions:
+                session.stop()
+            self.idle_sessions = []
+            self.all_sessions = []
@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+'''
+Time budgets of the test modules.
+
+Classes:
+  module_budget: the wall-clock, CPU and simulated time budgets of a running test module
+    and the reason the module was stopped (if it ran out of time)
+
+The wall-clock budget covers the tool processes run by a test module: the time each
+process runs is charged to the budget of the module (time spent waiting for the host
+resources is not) and a process that is still running when the budget is used up is
+stopped along with all of its children (the process runs in its own process group).
+The CPU budget limits each tool process (RLIMIT_CPU, set with prlimit once the process
+has started) so that a process spinning in a loop is stopped by the kernel. The simulated time budget is used by the testbench
+simulations to run xsim for a bounded amount of simulated time rather than '-runall'.
+'''
+
+import contextlib
+import os
+import resource
+import signal
+import threading
+import time
+
+# Time given to a process to exit after SIGTERM before it is killed
+KILL_GRACE_SECONDS = 10
+
+class module_budget:
+    ''' The budgets of a test module (None for no limit). Times are in seconds except the
+    simulated time which is an xsim time string (i.e., "10ms"). '''
+
+    def __init__(self, wall_time=None, cpu_time=None, sim_time=None):
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.sim_time = sim_time
+        # Wall-clock time used by the tool processes of the module
+        self.used_time = 0.0
+        self.lock = threading.Lock()
+        # Set to a description of the budget that was exceeded
+        self.timed_out = None
+
+    def is_limited(self):
+        return self.wall_time is not None or self.cpu_time is not None
+
+    def remaining(self):
+        ''' Returns the wall-clock time left (None if there is no wall-clock budget) '''
+        if self.wall_time is None:
+            return None
+        with self.lock:
+            return max(0.0, self.wall_time - self.used_time)
+
+    @contextlib.contextmanager
+    def charge(self):
+        ''' Context manager that charges the time of a tool process to the wall-clock budget '''
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.used_time += time.monotonic() - start
+
+    def expire(self, reason):
+        if self.timed_out is None:
+            self.timed_out = reason
+
+    def wall_time_exceeded(self):
+        self.expire(str.format("wall-clock budget of {} s exceeded", self.wall_time))
+
+    def check_cpu_signal(self, return_code):
+        ''' Record a timeout if the process was stopped by the CPU time limit. Only SIGXCPU
+        (the soft limit) is attributed to the limit: SIGKILL is also sent by the wall-clock
+        budget and by the log monitors. '''
+        if self.cpu_time is not None and return_code == -signal.SIGXCPU:
+            self.expire(str.format("CPU budget of {} s exceeded", self.cpu_time))
+
+    def limit_process(self, pid):
+        ''' Set the CPU time limit of a started tool process. The limit is set from the
+        parent rather than in the child before exec since running Python code between fork
+        and exec is not safe while other threads are running. '''
+        if self.cpu_time is None:
+            return
+        cpu_time = int(self.cpu_time)
+        # SIGXCPU at the soft limit and SIGKILL at the hard limit
+        with contextlib.suppress(ProcessLookupError):
+            resource.prlimit(pid, resource.RLIMIT_CPU, (cpu_time, cpu_time + KILL_GRACE_SECONDS))
+
+def kill_process_group(pid, sig=signal.SIGKILL):
+    ''' Send a signal to the process group of a process started in a new session '''
+    with contextlib.suppress(ProcessLookupError, PermissionError):
+        os.killpg(pid, sig)
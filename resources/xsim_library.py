@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+
+'''
+Precompiled xsim library of the HDL files in the resources directory.
+
+Classes:
+  xsim_library: a versioned, read-only xsim library of the shared HDL files (iosystem,
+    I/O cores, VGA VHDL, glbl.v) that is built once on a host and reused by all simulations
+
+The simulations of the labs with the I/O system analyze the same instructor files every
+time. These files are analyzed once into a library directory named after a hash of the
+file contents and the tool versions. The simulations then only analyze the student files
+and link the library with '-L <name>=<directory>'. A library is built in a temporary
+directory and renamed into place so that concurrent passoff scripts on the same host
+never see a partial library. Once built, the library is made read-only.
+The library is only used when the passoff script is run with --xsim_lib.
+'''
+
+import contextlib
+import fcntl
+import hashlib
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+
+# Error checking of the tool output
+import log_monitor
+import result_cache
+
+# Name of the library used by xelab to find the precompiled modules
+LIBRARY_NAME = "resources_lib"
+
+def is_shared_file(lab_test, filename):
+    ''' Returns True if the file (relative to the execution path) is one of the instructor
+    files in the resources directory '''
+    resources_path = os.path.realpath(lab_test.submission_top_path / "resources")
+    filepath = os.path.realpath(lab_test.execution_path / filename)
+    return os.path.commonpath([resources_path, filepath]) == resources_path
+
+class xsim_library:
+    ''' A precompiled xsim library of a set of shared SystemVerilog/Verilog and VHDL files '''
+
+    def __init__(self, library_root, sv_filepaths, vhdl_filepaths, resources_path):
+        self.library_root = pathlib.Path(library_root)
+        self.sv_filepaths = [ pathlib.Path(f) for f in sv_filepaths ]
+        self.vhdl_filepaths = [ pathlib.Path(f) for f in vhdl_filepaths ]
+        self.build_lock = threading.Lock()
+        # Set when the build fails so that it is not attempted by every simulation
+        self.build_failed = False
+        # The version depends on the contents of the files (named relative to the resources
+        # directory so that every extract directory on the host shares the library) and the tools
+        h = hashlib.sha256()
+        h.update(LIBRARY_NAME.encode())
+        for tool in ("xvlog", "xvhdl"):
+            h.update(result_cache.tool_version(tool).encode())
+        for kind, filepaths in (("sv", self.sv_filepaths), ("vhdl", self.vhdl_filepaths)):
+            for filepath in filepaths:
+                h.update(str.format("{}:{}={}\n", kind, os.path.relpath(filepath, resources_path),
+                    result_cache.file_hash(filepath)).encode())
+        self.version = h.hexdigest()[:16]
+        self.library_path = self.library_root / self.version
+
+    def library_dir(self):
+        ''' The directory of the compiled library (passed to xelab with -L) '''
+        return self.library_path / LIBRARY_NAME
+
+    def link_option(self):
+        ''' The xelab option for linking the library '''
+        return [ "-L", str.format("{}={}", LIBRARY_NAME, self.library_dir()) ]
+
+    def contains(self, basename):
+        ''' Returns True if a file with the given name is compiled in the library '''
+        return any(f.name == basename for f in self.sv_filepaths + self.vhdl_filepaths)
+
+    def is_built(self):
+        return self.library_path.is_dir()
+
+    def build(self, lab_test):
+        ''' Build the library (if it has not already been built on this host). Returns True
+        if the library is available. '''
+        with self.build_lock:
+            if self.is_built():
+                return True
+            if self.build_failed:
+                return False
+            self.library_root.mkdir(parents=True, exist_ok=True)
+            lock_fd = os.open(str(self.library_root / (self.version + ".lock")), os.O_RDWR | os.O_CREAT, 0o666)
+            try:
+                # Another passoff script may be building the same library
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+                if self.is_built():
+                    return True
+                self.build_failed = not self.build_locked(lab_test)
+                return not self.build_failed
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+                os.close(lock_fd)
+
+    def build_locked(self, lab_test):
+        ''' Analyze the files into a temporary directory and rename it into place '''
+        lab_test.print_info(str.format(" Building precompiled simulation library {} in {}",
+            LIBRARY_NAME, self.library_path))
+        tmp_path = pathlib.Path(tempfile.mkdtemp(dir=str(self.library_root), prefix=self.version + ".tmp_"))
+        work_option = [ "--work", str.format("{}={}", LIBRARY_NAME, tmp_path / LIBRARY_NAME) ]
+        steps = []
+        if self.sv_filepaths:
+            steps.append((["xvlog", "--nolog", "-sv"] + work_option + self.sv_filepaths, "analyze_sv.txt"))
+        if self.vhdl_filepaths:
+            steps.append((["xvhdl", "--nolog"] + work_option + self.vhdl_filepaths, "analyze_vhdl.txt"))
+        for analyze_cmd, log_filename in steps:
+            monitor = log_monitor.line_monitor(analyze_cmd[0])
+            return_code = lab_test.subprocess_file_print(tmp_path / log_filename, analyze_cmd, tmp_path,
+                monitor=monitor)
+            if return_code != 0 or monitor.errors:
+                lab_test.print_warning("Failed to build precompiled simulation library (see",
+                    tmp_path / log_filename, ")")
+                if monitor.errors:
+                    print(" ", monitor.first_error())
+                return False
+        with open(tmp_path / "files.txt", "w") as fp:
+            for filepath in self.sv_filepaths + self.vhdl_filepaths:
+                fp.write(str(filepath) + "\n")
+        try:
+            os.rename(tmp_path, self.library_path)
+        except OSError:
+            # Built by another host sharing the directory
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return self.is_built()
+        # The library is never modified once it is built
+        for root, dirs, files in os.walk(self.library_path, topdown=False):
+            for filename in files:
+                with contextlib.suppress(OSError):
+                    os.chmod(os.path.join(root, filename), 0o444)
+            with contextlib.suppress(OSError):
+                os.chmod(root, 0o555)
+        return True
@@ -0,0 +1,172 @@
+#!/usr/bin/python3
+
+'''
+Tests of the reference checkpoints of the incremental bitstream builds (build_reference)
+and of a bitstream build module that uses them (run with the stand-in tools of tool_stubs).
+
+Usage:
+  python3 -m unittest tests.test_build_reference
+'''
+
+import contextlib
+import io
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import build_reference
+import lab_passoff
+import tester_module
+import tool_stubs
+
+GENERICS = [ "TEXT_MEMORY_FILENAME=prog_text.mem", "DATA_MEMORY_FILENAME=prog_data.mem", "DEBOUNCE_DELAY_US=150" ]
+
+TOP_SV = '''
+module top(input logic clk, output logic [15:0] led);
+    assign led = 16'h0;
+endmodule
+'''
+
+class build_reference_test(unittest.TestCase):
+    ''' The reference is used for a memory update only when the sources are unchanged '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name)
+        self.exec_path = self.path / "lab10"
+        self.exec_path.mkdir()
+        for filename in ("top.sv", "top.xdc", "prog_text.mem", "prog_data.mem"):
+            (self.exec_path / filename).write_text(filename + "\n")
+        self.reference = build_reference.build_reference(self.path / "references", "lab10", "top")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def key(self, generics=GENERICS):
+        return self.reference.sources_key(self.exec_path, [ "top.sv", "*.xdc", "*.mem" ], generics, [ "xc7a35ticpg236-1" ])
+
+    def save(self):
+        synth_checkpoint = self.reference.temporary_checkpoint()
+        synth_checkpoint.write_text("synth\n")
+        routed_checkpoint = self.exec_path / "top.dcp"
+        routed_checkpoint.write_text("routed\n")
+        self.reference.save(self.key(), self.reference.memory_hashes(self.exec_path, GENERICS),
+            synth_checkpoint, routed_checkpoint)
+        self.assertFalse(synth_checkpoint.exists())
+
+    def test_split_generics(self):
+        self.assertEqual(build_reference.split_generics(GENERICS + [ 'TEXT_MEMORY_FILENAME=""' ]),
+            ({ "TEXT_MEMORY_FILENAME" : "prog_text.mem", "DATA_MEMORY_FILENAME" : "prog_data.mem" },
+            [ "DEBOUNCE_DELAY_US=150", 'TEXT_MEMORY_FILENAME=""' ]))
+
+    def test_sources_key(self):
+        key = self.key()
+        # The contents of the memory files are not part of the key
+        (self.exec_path / "prog_text.mem").write_text("changed\n")
+        self.assertEqual(self.key(), key)
+        (self.exec_path / "top.xdc").write_text("changed\n")
+        self.assertNotEqual(self.key(), key)
+        self.assertNotEqual(self.key(GENERICS[:2] + [ "DEBOUNCE_DELAY_US=100" ]), self.key())
+
+    def test_memory_updates(self):
+        self.assertIsNone(self.reference.memory_updates(self.key(), self.exec_path, GENERICS))
+        self.save()
+        self.assertEqual(self.reference.memory_updates(self.key(), self.exec_path, GENERICS), [])
+        (self.exec_path / "prog_text.mem").write_text("new program\n")
+        self.assertEqual(self.reference.memory_updates(self.key(), self.exec_path, GENERICS),
+            [ "text", "prog_text.mem" ])
+        (self.exec_path / "top.sv").write_text("changed\n")
+        self.assertIsNone(self.reference.memory_updates(self.key(), self.exec_path, GENERICS))
+
+    def test_copy_for_update(self):
+        self.save()
+        (self.exec_path / "prog_data.mem").write_text("new data\n")
+        updates, checkpoint = self.reference.copy_for_update(self.key(), self.exec_path, GENERICS)
+        self.assertEqual(updates, [ "data", "prog_data.mem" ])
+        self.assertEqual(checkpoint.parent, self.reference.path)
+        self.assertEqual(checkpoint.read_text(), "routed\n")
+        os.remove(checkpoint)
+        # Another build of the design reads the saved reference
+        other = build_reference.build_reference(self.path / "references", "lab10", "top")
+        self.assertEqual(other.incremental_checkpoints(), (other.synth_checkpoint, other.routed_checkpoint))
+
+    def test_discard(self):
+        self.save()
+        self.reference.record["vivado"] = "vivado:other"
+        self.assertIsNone(self.reference.incremental_checkpoints())
+        self.reference.discard()
+        self.assertFalse(self.reference.has_checkpoints())
+        self.assertEqual(self.reference.copy_for_update(self.key(), self.exec_path, GENERICS), (None, None))
+
+class incremental_build_test(unittest.TestCase):
+    ''' A design is built, its memories updated in the reference and built incrementally '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.tmp_dir.name)
+        self.lab_path = root / "repo" / "lab10"
+        self.lab_path.mkdir(parents=True)
+        (root / "repo" / "resources").mkdir()
+        for filename in ("load_mem.tcl", "new_project_settings.tcl"):
+            shutil.copy(str(REPO_ROOT_PATH / "resources" / filename), str(root / "repo" / "resources"))
+        (self.lab_path / "top.sv").write_text(TOP_SV)
+        for filename in ("top.xdc", "prog_text.mem", "prog_data.mem"):
+            (self.lab_path / filename).write_text(filename + "\n")
+        self.environ = dict(os.environ)
+        os.environ["PATH"] = str(tool_stubs.install(root / "bin")) + os.pathsep + os.environ.get("PATH", "")
+        os.environ["TOOL_STUB_LATENCY_SCALE"] = "0"
+        os.environ["TOOL_STUB_VOLUME_SCALE"] = "0.01"
+        os.environ.pop("TOOL_STUB_LEDGER", None)
+        self.lab_test = lab_passoff.lab_test(self.lab_path, 10)
+        self.lab_test.args = self.lab_test.parser.parse_args([ "--local", "--output_mode", "file",
+            "--incremental_build", "--build_reference_dir", str(root / "references") ])
+        self.lab_test.submission_top_path = root / "repo"
+        self.lab_test.submission_lab_path = self.lab_path
+        self.lab_test.execution_path = self.lab_path
+        self.lab_test.set_lab_fileset({ "top" : "top.sv", "xdc" : "top.xdc" }, {})
+
+    def tearDown(self):
+        self.lab_test.process_runner.stop()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.tmp_dir.cleanup()
+
+    def build(self):
+        ''' Build the design. Returns (result, implementation log). '''
+        module = tester_module.build_bitstream("top", [ "xdc" ], [ "top" ], create_dcp=True, generics=GENERICS)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = self.lab_test.execute_test_module(module)
+        self.assertTrue((self.lab_path / "top.bit").exists())
+        return result, (self.lab_path / "top_implementation.txt").read_text()
+
+    def test_incremental_build(self):
+        result, log = self.build()
+        self.assertTrue(result)
+        self.assertIn("synth_design", log)
+        reference = self.lab_test.get_build_reference("top")
+        self.assertTrue(reference.has_checkpoints())
+
+        # Only a memory changed: the memory is loaded into the routed reference
+        (self.lab_path / "prog_text.mem").write_text("new program\n")
+        result, log = self.build()
+        self.assertTrue(result)
+        self.assertNotIn("synth_design", log)
+        self.assertIn("Updating memory from prog_text.mem", log)
+        self.assertNotIn("prog_data.mem", log)
+        self.assertEqual(list(reference.path.glob(".tmp_*")), [])
+
+        # A source changed: incremental build from the reference checkpoints
+        (self.lab_path / "top.sv").write_text(TOP_SV.replace("16'h0", "16'h1"))
+        result, log = self.build()
+        self.assertTrue(result)
+        self.assertIn("synth_design", log)
+        self.assertIn(str(reference.synth_checkpoint), (self.lab_path / "top_buildscript.tcl").read_text())
+
+if __name__ == "__main__":
+    unittest.main()
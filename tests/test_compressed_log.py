@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+'''
+Tests of the compressed tool logs (compressed_log).
+
+Usage:
+  python3 -m unittest tests.test_compressed_log
+'''
+
+import gzip
+import os
+import pathlib
+import sys
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import compressed_log
+
+class compressed_log_test(unittest.TestCase):
+    ''' Writing framed logs and reading their last lines through the index '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.log_path = pathlib.Path(self.tmp_dir.name) / "tb_simulation.txt"
+        self.lines = [ str.format("[{} ns] cycle {}: PC=0x{:08x}", i * 10, i, i * 4) for i in range(1000) ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_log(self, frame_size=1024):
+        with compressed_log.log_writer(self.log_path, frame_size=frame_size) as writer:
+            for line in self.lines:
+                writer.write((line + "\n").encode())
+        return compressed_log.read_index(self.log_path)
+
+    def test_frames(self):
+        frames = self.write_log()
+        self.assertGreater(len(frames), 10)
+        self.assertEqual(sum(frame[3] for frame in frames), len(self.lines))
+        # The frames end at the end of a line and the members form a regular gzip file
+        with gzip.open(compressed_log.compressed_path(self.log_path), "rt") as fp:
+            text = fp.read()
+        self.assertEqual(text.splitlines(), self.lines)
+        for _, _, uncompressed_offset, _ in frames[1:]:
+            self.assertEqual(text.encode()[uncompressed_offset - 1:uncompressed_offset], b"\n")
+        with compressed_log.open_reader(self.log_path) as fp:
+            self.assertEqual(fp.read(), text)
+
+    def test_tail_lines_index(self):
+        frames = self.write_log()
+        with mock.patch.object(compressed_log.zlib, "decompress", wraps=zlib.decompress) as decompress:
+            self.assertEqual(compressed_log.tail_lines(self.log_path, 5), self.lines[-5:])
+        # Only the last frames are decompressed
+        self.assertLessEqual(decompress.call_count, 2)
+        self.assertLess(decompress.call_count, len(frames))
+        self.assertEqual(compressed_log.tail_lines(self.log_path, 200), self.lines[-200:])
+        self.assertEqual(compressed_log.tail_lines(self.log_path, 5000), self.lines)
+        self.assertEqual(compressed_log.tail_lines(self.log_path, 0), [])
+
+    def test_long_line(self):
+        # A line longer than a frame is split between frames
+        self.lines[-2] = "x" * 5000
+        self.write_log()
+        self.assertEqual(compressed_log.tail_lines(self.log_path, 3), self.lines[-3:])
+
+    def test_stale_index(self):
+        # An index that does not cover the compressed log is not used
+        self.write_log()
+        with open(compressed_log.index_path(self.log_path)) as fp:
+            index_lines = fp.readlines()
+        with open(compressed_log.index_path(self.log_path), "w") as fp:
+            fp.writelines(index_lines[:-1])
+        self.assertIsNone(compressed_log.read_index(self.log_path))
+        self.assertEqual(compressed_log.tail_lines(self.log_path, 5), self.lines[-5:])
+
+    def test_uncompressed(self):
+        # The most recent form of the log is read
+        self.write_log()
+        with compressed_log.open_writer(self.log_path) as fp:
+            fp.write(b"first\nsecond\nlast\n")
+        self.assertFalse(compressed_log.is_compressed(self.log_path))
+        self.assertFalse(os.path.exists(compressed_log.index_path(self.log_path)))
+        self.assertEqual(compressed_log.tail_lines(self.log_path, 2), [ "second", "last" ])
+
+if __name__ == "__main__":
+    unittest.main()
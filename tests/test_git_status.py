@@ -0,0 +1,150 @@
+#!/usr/bin/python3
+
+'''
+Tests of the repository status read from the index and reference files (git_status),
+compared with the output of git in a temporary repository.
+
+Usage:
+  python3 -m unittest tests.test_git_status
+'''
+
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import git_status
+
+# Identity of the commits of the test repository
+GIT_ENV = { "GIT_AUTHOR_NAME" : "student", "GIT_AUTHOR_EMAIL" : "student@example.com",
+    "GIT_COMMITTER_NAME" : "student", "GIT_COMMITTER_EMAIL" : "student@example.com" }
+
+class git_status_test(unittest.TestCase):
+    ''' The status of a repository matches the output of git '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        path = pathlib.Path(self.tmp_dir.name)
+        self.origin_path = path / "origin.git"
+        self.repo_path = path / "repo"
+        self.lab_path = self.repo_path / "lab01"
+        self.lab_path.mkdir(parents=True)
+        self.git("init", "--quiet", "--bare", str(self.origin_path), cwd=path)
+        self.git("init", "--quiet", "--initial-branch", "main")
+        self.write("lab01/arithmetic.sv", "module arithmetic();\nendmodule\n")
+        self.write("lab01/tb.sv", "module tb();\nendmodule\n")
+        self.write("README.md", "ECEN 323\n")
+        self.git("add", "-A")
+        self.git("commit", "--quiet", "-m", "starter")
+        self.git("remote", "add", "origin", str(self.origin_path))
+        self.git("push", "--quiet", "origin", "main")
+        self.git("remote", "set-head", "origin", "main")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def git(self, *args, cwd=None, check=True):
+        return subprocess.run(["git"] + list(args), cwd=str(cwd or self.repo_path), env=dict(os.environ, **GIT_ENV),
+            check=check, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True).stdout
+
+    def write(self, filename, text):
+        (self.repo_path / filename).write_text(text)
+
+    def status(self):
+        return git_status.repository_status(self.lab_path)
+
+    def git_index(self):
+        ''' The entries of the index (git ls-files -s) with stage 0 '''
+        index = {}
+        for line in self.git("ls-files", "-s", "-z").split("\0"):
+            if line:
+                info, name = line.split("\t", 1)
+                mode, oid, stage = info.split()
+                index[name] = (mode, oid) if stage == "0" else None
+        return index
+
+    def git_differs(self, ref):
+        returncode = subprocess.run(["git", "diff", "--cached", "--quiet", ref, "--"], cwd=str(self.repo_path),
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE).returncode
+        return { 0 : False, 1 : True }.get(returncode)
+
+    def test_read_index(self):
+        self.write("lab01/arithmetic.sv", "module arithmetic(input logic a);\nendmodule\n")
+        self.git("add", "lab01/arithmetic.sv")
+        for version in ("2", "3", "4"):
+            self.git("update-index", "--index-version", version)
+            self.assertEqual(self.status().tracked, self.git_index(), "index version " + version)
+
+    def test_changed_files(self):
+        self.write("lab01/arithmetic.sv", "// modified\n")
+        self.write("lab01/tb.sv", "// staged\n")
+        self.git("add", "lab01/tb.sv")
+        self.write("lab01/notes.txt", "untracked\n")
+        status = self.status()
+        porcelain = {}
+        for record in self.git("status", "--porcelain", "-z", "--untracked-files=all").split("\0"):
+            if record:
+                porcelain[record[3:]] = record[:2].replace(" ", ".")
+        changed = status.changed_files([ "arithmetic.sv", "tb.sv", "notes.txt", "../README.md" ])
+        self.assertEqual(changed, sorted((xy, name) for name, xy in porcelain.items()))
+        self.assertEqual(status.untracked_files(), [ "notes.txt" ])
+        self.assertTrue(status.is_tracked("tb.sv"))
+        self.assertFalse(status.is_tracked("notes.txt"))
+
+    def test_resolve_ref(self):
+        self.git("tag", "lab01")
+        self.git("tag", "-a", "-m", "annotated", "lab01_final")
+        for packed in (False, True):
+            if packed:
+                self.git("pack-refs", "--all")
+            status = self.status()
+            for ref in ("HEAD", "main", "lab01", "lab01_final", "origin/main", "origin", "refs/tags/lab01"):
+                self.assertEqual(git_status.resolve_ref(status.git_dir, status.common_dir, ref),
+                    self.git("rev-parse", ref).strip(), ref)
+            self.assertIsNone(git_status.resolve_ref(status.git_dir, status.common_dir, "lab02"))
+
+    def test_differs_from(self):
+        self.assertEqual(self.status().differs_from("origin/main"), False)
+        self.write("lab01/tb.sv", "// staged\n")
+        self.git("add", "lab01/tb.sv")
+        self.assertEqual(self.status().differs_from("origin/main"), True)
+        self.git("commit", "--quiet", "-m", "testbench")
+        self.assertEqual(self.status().differs_from("origin/main"), True)
+        self.git("pack-refs", "--all")
+        self.assertEqual(self.status().differs_from("origin/main"), self.git_differs("origin/main"))
+        self.assertEqual(self.status().differs_from("main"), False)
+        self.assertIsNone(self.status().differs_from("origin/lab02"))
+
+    def test_intent_to_add(self):
+        self.write("lab01/notes.txt", "notes\n")
+        self.git("add", "-N", "lab01/notes.txt")
+        self.assertIsNone(self.status().tracked["lab01/notes.txt"])
+        self.assertEqual(self.status().differs_from("origin/main"), self.git_differs("origin/main"))
+        self.git("tag", "starter")
+        self.write("lab01/tb.sv", "// staged\n")
+        self.git("add", "lab01/tb.sv")
+        self.git("commit", "--quiet", "-m", "testbench")
+        self.assertEqual(self.status().differs_from("starter"), True)
+        self.assertEqual(self.status().differs_from("HEAD"), self.git_differs("HEAD"))
+
+    def test_merge_conflict(self):
+        self.git("checkout", "--quiet", "-b", "other")
+        self.write("lab01/tb.sv", "// other\n")
+        self.git("commit", "--quiet", "-a", "-m", "other")
+        self.git("checkout", "--quiet", "main")
+        self.write("lab01/tb.sv", "// main\n")
+        self.git("commit", "--quiet", "-a", "-m", "main")
+        self.git("merge", "--quiet", "other", check=False)
+        status = self.status()
+        self.assertIsNone(status.tracked["lab01/tb.sv"])
+        self.assertEqual(status.tracked, self.git_index())
+        for ref in ("origin/main", "main", "other"):
+            self.assertEqual(status.differs_from(ref), self.git_differs(ref), ref)
+
+if __name__ == "__main__":
+    unittest.main()
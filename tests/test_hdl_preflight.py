@@ -0,0 +1,69 @@
+#!/usr/bin/python3
+
+'''
+Tests of the preflight checks of the HDL files (hdl_preflight).
+
+Usage:
+  python3 -m unittest tests.test_hdl_preflight
+'''
+
+import pathlib
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import hdl_preflight
+
+ADDER_SV = '''
+module adder(input logic [3:0] a, b, output logic [3:0] sum);
+    assign sum = a + b;
+endmodule
+'''
+
+class preflight_test(unittest.TestCase):
+    ''' The definite problems fail a module, the other problems are warnings '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name)
+        (self.path / "adder.sv").write_text(ADDER_SV)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def check(self, top_name, tb_text):
+        (self.path / "tb.sv").write_text(tb_text)
+        design = hdl_preflight.hdl_design(self.path)
+        return [ (problem.definite, str(problem)) for problem in design.check_design(top_name, [ "adder.sv", "tb.sv" ]) ]
+
+    def test_valid_design(self):
+        self.assertEqual(self.check("tb", "module tb();\n adder a0(.a(1), .b(2), .sum());\nendmodule\n"), [])
+
+    def test_missing_top_module(self):
+        problems = self.check("tb_adder", "module tb();\nendmodule\n")
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0][0])
+        self.assertIn("top module 'tb_adder' is not declared", problems[0][1])
+
+    def test_missing_include(self):
+        problems = self.check("tb", '`include "missing.vh"\nmodule tb();\nendmodule\n')
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0][0])
+        self.assertIn("included file 'missing.vh' not found", problems[0][1])
+
+    def test_undeclared_port(self):
+        problems = self.check("tb", "module tb();\n adder a0(.a(1), .b(2), .total());\nendmodule\n")
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0][0])
+        self.assertIn("connects port 'total' that is not declared by module 'adder'", problems[0][1])
+
+    def test_heuristic_problems(self):
+        # An undeclared module and a positional port count mismatch are warnings
+        problems = self.check("tb", "module tb();\n multiplier m0(.a(1));\n adder a0(1, 2, s, c);\nendmodule\n")
+        self.assertEqual([ definite for definite, _ in problems ], [ False, False ])
+
+if __name__ == "__main__":
+    unittest.main()
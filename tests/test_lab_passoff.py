@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+'''
+Tests of the passoff scripts that do not need the Vivado tools.
+
+Usage:
+  python3 -m unittest discover tests
+'''
+
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import test_scheduler
+
+class failed_clone_test(unittest.TestCase):
+    ''' The tests are skipped (rather than crashing) when the repository cannot be cloned '''
+
+    def test_failed_clone(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            env = dict(os.environ, HOME=tmp_dir)
+            cmd = [ sys.executable, "lab07_passoff.py", "--git_repo", os.path.join(tmp_dir, "nonexistent"),
+                "--no_tag", "--force", "--non_interactive", "--extract_dir", os.path.join(tmp_dir, "extract") ]
+            proc = subprocess.run(cmd, cwd=str(REPO_ROOT_PATH / "lab07"), env=env, stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, timeout=120)
+        self.assertNotIn("Traceback", proc.stdout)
+        self.assertIn("Failed to clone repository", proc.stdout)
+        self.assertIn("Skipping test", proc.stdout)
+        self.assertNotIn("Success:", proc.stdout)
+
+class file_module:
+    ''' A test module that only declares the files it consumes and produces '''
+
+    def __init__(self, inputs, outputs):
+        self.inputs = inputs
+        self.outputs = outputs
+
+    def input_files(self, lab_test):
+        return self.inputs
+
+    def output_files(self, lab_test):
+        return self.outputs
+
+    def module_name(self):
+        return str.format("Files ({})", " ".join(self.outputs))
+
+class scheduler_graph_test(unittest.TestCase):
+    ''' The dependencies built from the files of the test modules '''
+
+    def edges(self, modules, sandboxed=False):
+        ''' Returns the (data dependencies, ordering predecessors) of each module '''
+        scheduler = test_scheduler.test_scheduler(None, modules, sandboxed)
+        return [ (sorted(dep.index for dep in node.dependencies), sorted(pred.index for pred in node.predecessors))
+            for node in scheduler.nodes ]
+
+    def test_pattern_read_before_write(self):
+        # A module producing a file matching the pattern read by an earlier module runs after it
+        modules = [ file_module(["*.mem"], ["tb.log"]), file_module([], ["code.mem"]) ]
+        self.assertEqual(self.edges(modules), [ ([], []), ([], [0]) ])
+        self.assertEqual(self.edges(modules, sandboxed=True), [ ([], []), ([], []) ])
+
+    def test_pattern_read_after_write(self):
+        modules = [ file_module([], ["code.mem"]), file_module([], ["data.txt"]), file_module(["*.mem"], ["tb.log"]) ]
+        self.assertEqual(self.edges(modules), [ ([], []), ([], []), ([0], []) ])
+
+    def test_independent_snapshots(self):
+        # Simulations of different top modules have their own snapshot and work library. Two
+        # simulations of the same top module are only ordered by the snapshot and library they share.
+        modules = [ file_module(["a.sv", "a_text.mem"], ["xsim.dir/a", "xsim.dir/work_a", "a_simulation.txt"]),
+            file_module(["b.sv"], ["xsim.dir/b", "xsim.dir/work_b", "b_simulation.txt"]),
+            file_module(["a.sv", "b_text.mem"], ["xsim.dir/a", "xsim.dir/work_a", "a_2_simulation.txt"]) ]
+        self.assertEqual(self.edges(modules), [ ([], []), ([], []), ([], [0]) ])
+
+class scheduler_run_test(unittest.TestCase):
+    ''' Running the graph: a failed module only cancels the modules that read its outputs '''
+
+    class lab_test:
+        def __init__(self, failing):
+            self.failing = failing
+            self.executed = []
+            self.skipped = []
+
+        def print_step_message(self, message):
+            pass
+
+        def print_error(self, *msg):
+            pass
+
+        def execute_test_module(self, test_module):
+            self.executed.append(test_module)
+            return test_module not in self.failing
+
+        def skip_test_module(self, test_module, failed_module):
+            self.skipped.append(test_module)
+
+    def test_ordering_successor_runs(self):
+        producer = file_module([], ["code.mem", "xsim.dir/top"])
+        consumer = file_module(["code.mem"], ["tb.log"])
+        successor = file_module([], ["xsim.dir/top"])
+        lab_test = self.lab_test([ producer ])
+        scheduler = test_scheduler.test_scheduler(lab_test, [ producer, consumer, successor ])
+        self.assertFalse(scheduler.run(max_workers=2))
+        self.assertEqual(lab_test.executed, [ producer, successor ])
+        self.assertEqual(lab_test.skipped, [ consumer ])
+        self.assertEqual([ node.state for node in scheduler.nodes ], [ "failed", "cancelled", "passed" ])
+
+if __name__ == "__main__":
+    unittest.main()
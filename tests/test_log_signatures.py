@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+'''
+Tests of the error signatures of the tool logs (log_signatures) on lines printed by
+xvlog, xelab, xsim, vivado, rars and the testbenches.
+
+Usage:
+  python3 -m unittest tests.test_log_signatures
+'''
+
+import pathlib
+import sys
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import log_monitor
+import log_signatures
+
+class log_signatures_test(unittest.TestCase):
+    ''' Each line is matched to the severity, code and location of its message '''
+
+    def check(self, tool, line, severity=None, code=None, location=""):
+        found = log_signatures.signatures(tool).match(line)
+        if severity is None:
+            self.assertIsNone(found, line)
+            return
+        self.assertIsNotNone(found, line)
+        self.assertEqual((found.severity, found.code, found.location()), (severity, code, location), line)
+
+    def test_xvlog(self):
+        self.check("xvlog", 'INFO: [VRFC 10-2263] Analyzing SystemVerilog file "/home/student/lab03/alu.sv" into library work')
+        self.check("xvlog", "ERROR: [VRFC 10-4982] syntax error near 'endmodule' [/home/student/lab03/alu.sv:42]",
+            "ERROR", "VRFC 10-4982", "/home/student/lab03/alu.sv:42")
+        self.check("xvlog", "WARNING: [VRFC 10-3380] identifier 'zero' is used before its declaration [/home/student/lab03/alu.sv:10]",
+            "WARNING", "VRFC 10-3380", "/home/student/lab03/alu.sv:10")
+
+    def test_xelab(self):
+        self.check("xelab", "Starting static elaboration")
+        self.check("xelab", "ERROR: [VRFC 10-3180] cannot find port 'clk' on this module [/home/student/lab03/tb_alu.sv:30]",
+            "ERROR", "VRFC 10-3180", "/home/student/lab03/tb_alu.sv:30")
+        self.check("xelab", "ERROR: [XSIM 43-3322] Static elaboration of top level Verilog design unit(s) in library work failed.",
+            "ERROR", "XSIM 43-3322")
+        self.check("xelab", "Abnormal program termination (EXCEPTION_ACCESS_VIOLATION)", "ERROR", "xelab")
+
+    def test_xsim(self):
+        self.check("xsim", '$finish called at time : 1005 ns : File "/home/student/lab03/tb_alu.sv" Line 80')
+        self.check("xsim", "Error: Assertion violation: result 5 != 6", "ERROR", "$severity")
+        self.check("xsim", "Warning: sample taken at X", "WARNING", "$severity")
+        self.check("xsim", "FATAL_ERROR: Vivado Simulator kernel has discovered an exceptional condition from which it cannot recover.",
+            "FATAL", "XSIM")
+
+    def test_testbench(self):
+        # Errors printed by the testbench (not the words 'No Errors' or '0 errors')
+        self.check("testbench", "*** Error: ALU result 00000005 does not match expected 00000006 at time 120 ns",
+            "ERROR", "testbench")
+        self.check("testbench", "[120 ns] ERROR - register x3 is 0x00000004 (expected 0x00000008)", "ERROR", "testbench")
+        self.check("testbench", "===== TEST PASSED: No Errors =====")
+        self.check("testbench", "Simulation completed with 0 errors")
+        self.check("testbench", "Simulation done with 3 errors")
+        self.check("testbench", "Testing the Error flag of the ALU")
+
+    def test_vivado(self):
+        self.check("vivado", "INFO: [Common 17-206] Exiting Vivado at Thu Jan 18 10:04:31 2024...")
+        self.check("vivado", "ERROR: [Synth 8-439] module 'seven_segment' not found [/home/student/lab04/top.sv:12]",
+            "ERROR", "Synth 8-439", "/home/student/lab04/top.sv:12")
+        self.check("vivado", "CRITICAL WARNING: [Constraints 18-619] A clock with name 'clk' already exists [/home/student/lab04/top.xdc:3]",
+            "CRITICAL WARNING", "Constraints 18-619", "/home/student/lab04/top.xdc:3")
+        self.check("vivado", 'invalid command name "synth_desing"', "ERROR", "Tcl")
+        self.check("vivado", "Number of errors: 0, Number of Warnings: 2")
+
+    def test_rars(self):
+        self.check("rars", 'Error in /home/student/lab05/fib.s line 12 column 5: "foo": operand is of incorrect type',
+            "ERROR", "RARS", "/home/student/lab05/fib.s:12")
+        self.check("rars", "Processing terminated due to errors.", "ERROR", "RARS")
+        self.check("rars", 'Exception in thread "main" java.lang.NullPointerException', "ERROR", "java")
+        self.check("rars", "Program terminated by calling exit")
+
+    def test_monitor(self):
+        # The location printed by xsim after a $error is given to the error
+        monitor = log_monitor.line_monitor("testbench")
+        monitor.feed("Starting simulation\nError: wrong result\nTime: 50 ns  Iteration: 0  Process: /tb/check  "
+            "Scope: /tb  File: /home/student/lab03/tb_alu.sv Line: 52\nNo Errors\n")
+        monitor.feed("*** Error: PC mismatch")
+        monitor.finish()
+        self.assertEqual([ (e.log_line, e.location()) for e in monitor.errors ],
+            [ (2, "/home/student/lab03/tb_alu.sv:52"), (5, "") ])
+        self.assertEqual(monitor.line_count, 5)
+        self.assertFalse(monitor.abort)
+
+    def test_abort_on_error(self):
+        monitor = log_monitor.line_monitor("vivado", abort_on_error=True)
+        monitor.feed("CRITICAL WARNING: [Timing 38-282] The design failed to meet the timing requirements.\n")
+        self.assertFalse(monitor.abort)
+        self.assertEqual(monitor.count("CRITICAL WARNING"), 1)
+        monitor.feed("ERROR: [Place 30-58] IO placement is infeasible.\n")
+        self.assertTrue(monitor.abort)
+
+if __name__ == "__main__":
+    unittest.main()
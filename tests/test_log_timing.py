@@ -0,0 +1,83 @@
+#!/usr/bin/python3
+
+'''
+Tests of the phase timing of the Vivado and xsim logs (log_timing).
+
+Usage:
+  python3 -m unittest tests.test_log_timing
+'''
+
+import pathlib
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import compressed_log
+import log_monitor
+import log_timing
+
+VIVADO_LOG = '''INFO: [Common 17-206] Starting synth_design
+synth_design: Time (s): cpu = 00:00:34 ; elapsed = 00:00:37 . Memory (MB): peak = 2543.887 ; gain = 1022.406
+write_checkpoint: Time (s): cpu = 00:00:01 ; elapsed = 00:00:02 . Memory (MB): peak = 2550.000 ; gain = 0.000
+opt_design: Time (s): cpu = 00:00:02.5 ; elapsed = 00:00:03 . Memory (MB): peak = 2601.125 ; gain = -12.500
+route_design: Time (s): cpu = 00:01:10 ; elapsed = 01:00:05 . Memory (MB): peak = 2800.000
+write_checkpoint: Time (s): cpu = 00:00:03 ; elapsed = 00:00:04 . Memory (MB): peak = 2700.000 ; gain = 1.000
+INFO: [Common 17-206] Exiting Vivado at Thu Jan 18 10:04:31 2024...
+'''
+
+class log_timing_test(unittest.TestCase):
+    ''' The timing lines of a log are summed by phase '''
+
+    def test_seconds(self):
+        self.assertEqual(log_timing.seconds("00:00:37"), 37.0)
+        self.assertEqual(log_timing.seconds("01:02:03.5"), 3723.5)
+
+    def test_lines(self):
+        timing = log_timing.phase_timing()
+        found = [ timing.add_line(line) for line in VIVADO_LOG.splitlines() ]
+        self.assertEqual(found, [ False, True, True, True, True, True, False ])
+        phases = timing.as_list()
+        self.assertEqual([ phase["phase"] for phase in phases ],
+            [ "synth_design", "write_checkpoint", "opt_design", "route_design" ])
+        self.assertEqual(phases[0], { "phase" : "synth_design", "count" : 1, "cpu" : 34.0, "elapsed" : 37.0,
+            "peak_mb" : 2543.887, "gain_mb" : 1022.406 })
+        # A phase run more than once: total time and the largest peak memory
+        self.assertEqual(phases[1], { "phase" : "write_checkpoint", "count" : 2, "cpu" : 4.0, "elapsed" : 6.0,
+            "peak_mb" : 2700.0, "gain_mb" : 1.0 })
+        self.assertEqual((phases[2]["cpu"], phases[2]["gain_mb"]), (2.5, -12.5))
+        self.assertEqual((phases[3]["elapsed"], phases[3]["gain_mb"]), (3605.0, 0.0))
+
+    def test_merge(self):
+        first = log_timing.phase_timing()
+        first.add("synth_design", 10.0, 12.0, 1000.0)
+        second = log_timing.phase_timing()
+        second.add("synth_design", 5.0, 6.0, 1500.0)
+        second.add("synth_design", 1.0, 1.0, 900.0)
+        second.add("run", 2.0, 2.0, 300.0)
+        first.merge(second)
+        self.assertEqual([ (phase["phase"], phase["count"], phase["cpu"], phase["peak_mb"]) for phase in first.as_list() ],
+            [ ("synth_design", 3, 16.0, 1500.0), ("run", 1, 2.0, 300.0) ])
+
+    def test_compressed_log(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_filepath = pathlib.Path(tmp_dir) / "design_implementation.txt"
+            with compressed_log.log_writer(log_filepath, frame_size=64) as writer:
+                writer.write(VIVADO_LOG.encode())
+            phases = log_timing.phase_timing().scan_file(log_filepath).as_list()
+        self.assertEqual([ (phase["phase"], phase["count"]) for phase in phases ],
+            [ ("synth_design", 1), ("write_checkpoint", 2), ("opt_design", 1), ("route_design", 1) ])
+
+    def test_monitor(self):
+        # The monitor of a tool collects the timing while the output is produced
+        monitor = log_monitor.line_monitor("vivado")
+        monitor.feed(VIVADO_LOG[:100])
+        monitor.feed(VIVADO_LOG[100:])
+        monitor.finish()
+        self.assertEqual(len(monitor.timing.as_list()), 4)
+        self.assertEqual(monitor.errors, [])
+
+if __name__ == "__main__":
+    unittest.main()
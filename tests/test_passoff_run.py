@@ -0,0 +1,54 @@
+#!/usr/bin/python3
+
+'''
+End-to-end test of a lab passoff script run with the stand-in tools of tool_stubs (in a
+scratch copy of the repository made by harness_benchmark).
+
+Usage:
+  python3 -m unittest tests.test_passoff_run
+'''
+
+import json
+import pathlib
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import harness_benchmark
+
+class passoff_run_test(unittest.TestCase):
+    ''' Every test module of a lab passes when the tools succeed '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.workspace = harness_benchmark.benchmark_workspace(self.tmp_dir.name, latency_scale=0,
+            volume_scale=0.01)
+        self.workspace.create()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def check_lab(self, lab_num, jobs):
+        result = self.workspace.run_passoff(lab_num, jobs)
+        with open(self.workspace.lab_path(lab_num) / str.format("lab{}_test_result.json", lab_num)) as fp:
+            modules = json.load(fp)["modules"]
+        self.assertEqual([ (module["name"], module["status"], module["reason"]) for module in modules
+            if module["status"] != "passed" ], [])
+        self.assertEqual(result["return_code"], 0)
+        self.assertGreater(result["modules"], 0)
+        self.assertEqual(result["passed"], result["modules"])
+        return modules
+
+    def test_lab10(self):
+        # Memory files of two programs, a simulation, a bitstream and a bitstream updated
+        # with the memory of the second program
+        modules = self.check_lab(10, jobs=2)
+        tools = [ run["tool"] for module in modules for run in module["tool_runs"] ]
+        self.assertEqual(sorted(set(tools)), [ "java", "vivado", "xelab", "xsim", "xvhdl", "xvlog" ])
+        self.assertEqual(tools.count("vivado"), 2)
+
+if __name__ == "__main__":
+    unittest.main()
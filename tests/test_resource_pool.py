@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+'''
+Tests of the admission of tool processes by the resource pool (resource_pool).
+
+Usage:
+  python3 -m unittest tests.test_resource_pool
+'''
+
+import fcntl
+import os
+import pathlib
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import resource_pool
+
+# Time allowed for a thread to reach a state
+WAIT_SECONDS = 5
+
+def wait_until(condition):
+    deadline = time.monotonic() + WAIT_SECONDS
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+class request_thread(threading.Thread):
+    ''' A thread that acquires resources from the pool and holds them until it is told to release them '''
+
+    def __init__(self, pool, memory_mb, threads, admitted):
+        super().__init__(daemon=True)
+        self.pool = pool
+        self.memory_mb = memory_mb
+        self.threads = threads
+        # Shared list of the admitted requests (in order)
+        self.admitted = admitted
+        self.done = threading.Event()
+
+    def run(self):
+        reservation = self.pool.acquire(self.memory_mb, self.threads)
+        self.admitted.append(self)
+        self.done.wait()
+        self.pool.release(reservation)
+
+class resource_pool_test(unittest.TestCase):
+    ''' Requests are admitted in the order they are made (a large request is not starved) '''
+
+    def check_fifo(self, pool, waiting_count):
+        ''' A large request waits for the resources held by the first request and a later small
+        request that would fit waits behind the large one. 'waiting_count' returns the number of
+        requests that have reached the pool. '''
+        admitted = []
+        first = request_thread(pool, 512, 1, admitted)
+        first.start()
+        wait_until(lambda: admitted == [ first ])
+        large = request_thread(pool, 1024, 2, admitted)
+        large.start()
+        wait_until(lambda: waiting_count() >= 1)
+        small = request_thread(pool, 256, 1, admitted)
+        small.start()
+        wait_until(lambda: waiting_count() >= 2)
+        time.sleep(0.1)
+        self.assertEqual(admitted, [ first ])
+        first.done.set()
+        wait_until(lambda: len(admitted) == 2)
+        self.assertEqual(admitted, [ first, large ])
+        time.sleep(0.1)
+        self.assertEqual(admitted, [ first, large ])
+        large.done.set()
+        wait_until(lambda: len(admitted) == 3)
+        self.assertEqual(admitted, [ first, large, small ])
+        small.done.set()
+        for thread in (first, large, small):
+            thread.join(WAIT_SECONDS)
+
+    def test_fifo_threads(self):
+        pool = resource_pool.resource_pool(memory_mb=1024, threads=2)
+        self.check_fifo(pool, lambda: len(pool.waiting))
+        self.assertEqual((pool.available_memory_mb, pool.available_threads), (1024, 2))
+
+    def test_fifo_lock_dir(self):
+        with tempfile.TemporaryDirectory() as lock_dir, mock.patch.object(resource_pool, "TOKEN_POLL_SECONDS", 0.01):
+            pool = resource_pool.resource_pool(memory_mb=1024, threads=2, lock_dir=lock_dir)
+            # The requests after the first wait on the admission lock or for tokens
+            original_acquire = pool.acquire_tokens
+            arrivals = []
+            def counting_acquire(memory_mb, threads):
+                arrivals.append(memory_mb)
+                return original_acquire(memory_mb, threads)
+            pool.acquire_tokens = counting_acquire
+            def admission_locked():
+                fd = os.open(os.path.join(lock_dir, resource_pool.ADMISSION_LOCK_FILENAME), os.O_RDWR | os.O_CREAT)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    return False
+                except OSError:
+                    return True
+                finally:
+                    os.close(fd)
+            self.check_fifo(pool, lambda: len(arrivals) - 1 if admission_locked() else 0)
+
+    def test_clamp(self):
+        # A request larger than the pool is limited to the size of the pool
+        pool = resource_pool.resource_pool(memory_mb=1024, threads=2)
+        with pool.reserve(["vivado", "-mode", "batch"]):
+            self.assertEqual((pool.available_memory_mb, pool.available_threads), (0, 0))
+        self.assertEqual((pool.available_memory_mb, pool.available_threads), (1024, 2))
+
+if __name__ == "__main__":
+    unittest.main()
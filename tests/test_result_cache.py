@@ -0,0 +1,106 @@
+#!/usr/bin/python3
+
+'''
+Tests of the content-addressed cache of test module results (result_cache).
+
+Usage:
+  python3 -m unittest tests.test_result_cache
+'''
+
+import os
+import pathlib
+import stat
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import result_cache
+
+class result_cache_test(unittest.TestCase):
+    ''' Storing, looking up, restoring and evicting the outputs of test modules '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name)
+        self.src_path = self.path / "src"
+        self.src_path.mkdir()
+        self.cache = result_cache.result_cache(self.path / "cache")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, filename, text):
+        filepath = self.src_path / filename
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        filepath.write_text(text)
+
+    def set_use_time(self, key, use_time):
+        os.utime(self.cache.entry_filepath(key), (use_time, use_time))
+
+    def test_store_lookup_restore(self):
+        self.write("tb_simulation.txt", "No errors\n")
+        self.write("xsim.dir/tb/xsimk", "snapshot\n")
+        self.cache.store("k1", self.src_path, [ "tb_simulation.txt", "xsim.dir/tb/xsimk", "missing.txt" ])
+        entry = self.cache.lookup("k1")
+        self.assertEqual(sorted(entry["files"]), [ "tb_simulation.txt", os.path.join("xsim.dir", "tb", "xsimk") ])
+        self.assertIsNone(self.cache.lookup("k2"))
+        dest_path = self.path / "dest"
+        restored = self.cache.restore(entry, dest_path)
+        self.assertEqual(sorted(restored), sorted(entry["files"]))
+        self.assertEqual((dest_path / "tb_simulation.txt").read_text(), "No errors\n")
+        self.assertEqual((dest_path / "xsim.dir" / "tb" / "xsimk").read_text(), "snapshot\n")
+
+    def test_missing_object(self):
+        # An entry whose objects have been removed is not used
+        self.write("a.txt", "a\n")
+        self.cache.store("k1", self.src_path, [ "a.txt" ])
+        os.remove(self.cache.object_filepath(result_cache.file_hash(self.src_path / "a.txt")))
+        self.assertIsNone(self.cache.lookup("k1"))
+
+    def test_lru_eviction(self):
+        self.cache.max_size = 2500
+        for i, key in enumerate([ "k1", "k2" ]):
+            self.write(key + ".txt", key * 500)
+            self.cache.store(key, self.src_path, [ key + ".txt" ])
+            self.set_use_time(key, 1000 + i)
+        # k1 is used after k2: k2 is the least recently used when k3 is stored
+        self.assertIsNotNone(self.cache.lookup("k1"))
+        self.write("k3.txt", "k3" * 500)
+        self.cache.store("k3", self.src_path, [ "k3.txt" ])
+        self.assertIsNotNone(self.cache.lookup("k1"))
+        self.assertIsNone(self.cache.lookup("k2"))
+        self.assertIsNotNone(self.cache.lookup("k3"))
+        self.assertFalse(os.path.exists(self.cache.object_filepath(result_cache.file_hash(self.src_path / "k2.txt"))))
+        self.assertLessEqual(self.cache.size(), self.cache.max_size)
+
+    def test_shared_object(self):
+        # An object referenced by another entry is kept when an entry is evicted
+        self.cache.max_size = 2500
+        self.write("common.txt", "c" * 1000)
+        self.write("k1.txt", "1" * 1000)
+        self.cache.store("k1", self.src_path, [ "common.txt", "k1.txt" ])
+        self.set_use_time("k1", 1000)
+        self.write("k2.txt", "2" * 1000)
+        self.cache.store("k2", self.src_path, [ "common.txt", "k2.txt" ])
+        self.assertIsNone(self.cache.lookup("k1"))
+        self.assertIsNotNone(self.cache.lookup("k2"))
+        self.assertTrue(os.path.exists(self.cache.object_filepath(result_cache.file_hash(self.src_path / "common.txt"))))
+
+    def test_group_shared(self):
+        # The directories of the cache are setgid and the files are writable by the group
+        self.write("a.txt", "a\n")
+        self.cache.store("k1", self.src_path, [ "a.txt" ])
+        object_filepath = self.cache.object_filepath(result_cache.file_hash(self.src_path / "a.txt"))
+        for directory in (self.cache.cache_dir, self.cache.objects_dir, self.cache.entries_dir,
+            os.path.dirname(object_filepath)):
+            mode = os.stat(directory).st_mode
+            self.assertTrue(mode & stat.S_ISGID, directory)
+            self.assertTrue(mode & stat.S_IWGRP, directory)
+        for filepath in (self.cache.lock_filepath, self.cache.entry_filepath("k1"), object_filepath):
+            self.assertTrue(os.stat(filepath).st_mode & stat.S_IWGRP, filepath)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+
+'''
+Tests of the harvest of roster submissions into a shared object store (roster_harvest)
+with local repositories.
+
+Usage:
+  python3 -m unittest tests.test_roster_harvest
+'''
+
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import tarfile
+import tempfile
+import unittest
+from unittest import mock
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import batch_passoff
+import roster_harvest
+
+# Identity of the commits of the test repositories
+GIT_ENV = { "GIT_AUTHOR_NAME" : "student", "GIT_AUTHOR_EMAIL" : "student@example.com",
+    "GIT_COMMITTER_NAME" : "student", "GIT_COMMITTER_EMAIL" : "student@example.com" }
+
+def git(cwd, *args):
+    return subprocess.run(["git"] + list(args), cwd=str(cwd), env=dict(os.environ, **GIT_ENV), check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True).stdout.strip()
+
+class roster_harvest_test(unittest.TestCase):
+    ''' Submissions are fetched from bare repositories into the store and materialized '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name)
+        self.commits = {}
+        for name in ("alice", "bob"):
+            work_path = self.path / "work" / name
+            work_path.mkdir(parents=True)
+            git(work_path, "init", "--quiet")
+            (work_path / "lab01").mkdir()
+            (work_path / "lab01" / "arithmetic.sv").write_text("// " + name + "\n")
+            git(work_path, "add", "-A")
+            git(work_path, "commit", "--quiet", "-m", "lab 1")
+            git(work_path, "tag", "lab01")
+            self.commits[name] = git(work_path, "rev-parse", "HEAD")
+            git(self.path, "clone", "--quiet", "--bare", str(work_path), str(self.path / (name + ".git")))
+        roster_path = self.path / "roster.txt"
+        roster_path.write_text(str.format("{0}/alice.git\n{0}/bob.git\n{0}/missing.git\n", self.path))
+        self.submissions = batch_passoff.read_roster(str(roster_path))
+        self.store = roster_harvest.harvest_store(self.path / "store")
+        self.store.create()
+        self.output_path = self.path / "output"
+        self.output_path.mkdir()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def harvest(self, archive):
+        with mock.patch("sys.stdout"):
+            return roster_harvest.harvest(self.store, self.submissions, "lab01", self.output_path, connections=2,
+                archive=archive)
+
+    def check_results(self, results):
+        self.assertEqual([ r.name for r in results ], [ "alice", "bob", "missing" ])
+        for result in results[:2]:
+            self.assertIsNone(result.error)
+            self.assertEqual(result.commit, self.commits[result.name])
+            self.assertEqual((result.path / "lab01" / "arithmetic.sv").read_text(), "// " + result.name + "\n")
+        self.assertIsNotNone(results[2].error)
+        # Concurrent fetches do not write FETCH_HEAD
+        self.assertFalse((self.path / "store" / "FETCH_HEAD").exists())
+        with open(self.output_path / roster_harvest.MANIFEST_FILENAME) as fp:
+            manifest = json.load(fp)
+        self.assertEqual([ entry["commit"] for entry in manifest ],
+            [ self.commits["alice"], self.commits["bob"], None ])
+
+    def test_worktrees(self):
+        results = self.harvest(archive=False)
+        self.check_results(results)
+        # The origin of each worktree is the repository of the student
+        self.assertEqual(git(results[0].path, "config", "remote.origin.url"), str(self.path / "alice.git"))
+        self.assertEqual(git(results[1].path, "rev-parse", "HEAD"), self.commits["bob"])
+
+    def test_archive(self):
+        results = self.harvest(archive=True)
+        self.check_results(results)
+        self.assertFalse((results[0].path / ".git").exists())
+
+    def test_checkout_files(self):
+        # Export without the extraction filter of tarfile
+        data_filter = getattr(tarfile, "data_filter", None)
+        if data_filter is not None:
+            del tarfile.data_filter
+        try:
+            results = self.harvest(archive=True)
+        finally:
+            if data_filter is not None:
+                tarfile.data_filter = data_filter
+        self.check_results(results)
+
+    def test_unsafe_archive(self):
+        # A symbolic link out of the export is not extracted
+        work_path = self.path / "work" / "alice"
+        os.symlink("/etc/passwd", str(work_path / "lab01" / "passwd"))
+        git(work_path, "add", "-A")
+        git(work_path, "commit", "--quiet", "-m", "link")
+        git(work_path, "tag", "--force", "lab01")
+        git(work_path, "push", "--quiet", "--force", str(self.path / "alice.git"), "refs/tags/lab01")
+        results = self.harvest(archive=True)
+        self.assertIn("unsafe file", results[0].error)
+        self.assertIsNone(results[1].error)
+
+if __name__ == "__main__":
+    unittest.main()
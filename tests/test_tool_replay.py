@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+
+'''
+Tests of the record and replay of the tool runs (tool_replay) with the stand-in tools of
+tool_stubs.
+
+Usage:
+  python3 -m unittest tests.test_tool_replay
+'''
+
+import contextlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import lab_passoff
+import tester_module
+import tool_replay
+import tool_stubs
+
+ADDER_SV = '''
+module adder(input logic [3:0] a, b, output logic [3:0] sum);
+    assign sum = a + b;
+endmodule
+'''
+
+TB_ADDER_SV = '''
+module tb_adder();
+    logic [3:0] a, b, sum;
+    adder dut(.a(a), .b(b), .sum(sum));
+    initial begin
+        a = 1; b = 2;
+        #10 $finish;
+    end
+endmodule
+'''
+
+class tool_replay_test(unittest.TestCase):
+    ''' A recorded simulation is replayed without running the tools '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.tmp_dir.name)
+        self.top_path = root / "repo"
+        self.lab_path = self.top_path / "lab03"
+        self.lab_path.mkdir(parents=True)
+        (self.lab_path / "adder.sv").write_text(ADDER_SV)
+        (self.lab_path / "tb_adder.sv").write_text(TB_ADDER_SV)
+        self.record_path = root / "recording"
+        self.ledger_path = root / "ledger.txt"
+        self.environ = dict(os.environ)
+        self.stub_bin_path = str(tool_stubs.install(root / "bin"))
+        os.environ["TOOL_STUB_LATENCY_SCALE"] = "0"
+        os.environ["TOOL_STUB_VOLUME_SCALE"] = "0.01"
+        os.environ["TOOL_STUB_LEDGER"] = str(self.ledger_path)
+        self.lab_tests = []
+
+    def tearDown(self):
+        for lab_test in self.lab_tests:
+            lab_test.process_runner.stop()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.tmp_dir.cleanup()
+
+    def run_simulation(self, options, tools_in_path):
+        ''' Run the testbench simulation with a new lab_test. Returns (result, output). '''
+        os.environ["PATH"] = (self.stub_bin_path + os.pathsep if tools_in_path else "") + self.environ.get("PATH", "")
+        lab_test = lab_passoff.lab_test(self.lab_path, 3)
+        self.lab_tests.append(lab_test)
+        lab_test.args = lab_test.parser.parse_args([ "--local", "--output_mode", "file" ] + options)
+        lab_test.submission_top_path = self.top_path
+        lab_test.submission_lab_path = self.lab_path
+        lab_test.execution_path = self.lab_path
+        lab_test.set_lab_fileset({ "adder" : "adder.sv" }, { "tb" : "tb_adder.sv" })
+        if lab_test.args.record_dir or lab_test.args.replay_dir:
+            lab_test.tool_recorder = tool_replay.tool_recorder(lab_test.args.record_dir or lab_test.args.replay_dir,
+                replaying=lab_test.args.replay_dir is not None)
+        module = tester_module.testbench_simulation("Adder", "tb_adder", [ "adder", "tb" ], [])
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = lab_test.execute_test_module(module)
+        return result, output.getvalue()
+
+    def tool_runs(self):
+        ''' The tools run by the stand-ins (from the ledger) other than the version checks '''
+        if not self.ledger_path.exists():
+            return []
+        with open(self.ledger_path) as fp:
+            entries = [ json.loads(line) for line in fp ]
+        return [ entry["tool"] for entry in entries if "--version" not in entry["args"] ]
+
+    def clean_outputs(self):
+        shutil.rmtree(str(self.lab_path / "xsim.dir"))
+        for log_filepath in self.lab_path.glob("tb_adder_*.txt"):
+            log_filepath.unlink()
+
+    def test_round_trip(self):
+        result, _ = self.run_simulation([ "--record_dir", str(self.record_path) ], tools_in_path=True)
+        self.assertTrue(result)
+        recorded_tools = self.tool_runs()
+        self.assertEqual(recorded_tools, [ "xvlog", "xelab", "xsim" ])
+        entries = tool_replay.tool_recorder(self.record_path).entries()
+        self.assertEqual(sorted(entry["tool"] for entry in entries), [ "xelab", "xsim", "xvlog" ])
+        simulation_log = (self.lab_path / "tb_adder_simulation.txt").read_text()
+        self.clean_outputs()
+
+        # Replayed without the tools: the outputs and logs are restored
+        result, _ = self.run_simulation([ "--replay_dir", str(self.record_path) ], tools_in_path=False)
+        self.assertTrue(result)
+        self.assertEqual(self.tool_runs(), recorded_tools)
+        self.assertTrue((self.lab_path / "xsim.dir" / "tb_adder" / "xsimk").exists())
+        self.assertEqual((self.lab_path / "tb_adder_simulation.txt").read_text(), simulation_log)
+
+    def test_changed_input(self):
+        self.assertTrue(self.run_simulation([ "--record_dir", str(self.record_path) ], tools_in_path=True)[0])
+        self.clean_outputs()
+        (self.lab_path / "adder.sv").write_text(ADDER_SV.replace("a + b", "a - b"))
+        result, output = self.run_simulation([ "--replay_dir", str(self.record_path) ], tools_in_path=False)
+        self.assertFalse(result)
+        self.assertIn("No recorded run of xvlog (inputs changed since the recording: {exec}/adder.sv)", output)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+
+'''
+Tests of the bitstream update modules (tester_module.update_*) run with the stand-in tools
+of tool_stubs.
+
+Usage:
+  python3 -m unittest tests.test_update_modules
+'''
+
+import contextlib
+import io
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import unittest
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import lab_passoff
+import tester_module
+import tool_stubs
+
+class update_module_test(unittest.TestCase):
+    ''' Each update module writes its bitstream (and checkpoint) from the input checkpoint '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = pathlib.Path(self.tmp_dir.name)
+        self.lab_path = root / "repo" / "lab10"
+        self.lab_path.mkdir(parents=True)
+        (root / "repo" / "resources").mkdir()
+        shutil.copy(str(REPO_ROOT_PATH / "resources" / "load_mem.tcl"), str(root / "repo" / "resources"))
+        for filename in ("design.dcp", "prog_text.mem", "prog_data.mem", "font.mem", "background.mem"):
+            (self.lab_path / filename).write_text(filename + "\n")
+        self.environ = dict(os.environ)
+        os.environ["PATH"] = str(tool_stubs.install(root / "bin")) + os.pathsep + os.environ.get("PATH", "")
+        os.environ["TOOL_STUB_LATENCY_SCALE"] = "0"
+        os.environ["TOOL_STUB_VOLUME_SCALE"] = "0.01"
+        os.environ.pop("TOOL_STUB_LEDGER", None)
+        self.lab_test = lab_passoff.lab_test(self.lab_path, 10)
+        self.lab_test.args = self.lab_test.parser.parse_args(["--local", "--output_mode", "file"])
+        self.lab_test.submission_top_path = root / "repo"
+        self.lab_test.submission_lab_path = self.lab_path
+        self.lab_test.execution_path = self.lab_path
+
+    def tearDown(self):
+        self.lab_test.process_runner.stop()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.tmp_dir.cleanup()
+
+    def execute(self, test_module):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.lab_test.execute_test_module(test_module)
+
+    def test_update_bitstream_mem(self):
+        module = tester_module.update_bitstream_mem("prog_text.mem", "prog_data.mem", "design.dcp", "prog.bit",
+            "prog.dcp")
+        self.assertTrue(self.execute(module))
+        self.assertTrue((self.lab_path / "prog.bit").exists())
+        self.assertTrue((self.lab_path / "prog.dcp").exists())
+        self.assertTrue((self.lab_path / "prog_update.txt").exists())
+
+    def test_update_font_mem(self):
+        module = tester_module.update_font_mem("design.dcp", "font.mem", "font.bit")
+        self.assertTrue(self.execute(module))
+        self.assertTrue((self.lab_path / "font.bit").exists())
+
+    def test_update_background_mem(self):
+        module = tester_module.update_background_mem("design.dcp", "background.mem", "background.bit")
+        self.assertTrue(self.execute(module))
+        self.assertTrue((self.lab_path / "background.bit").exists())
+
+    def test_update_mem_chain(self):
+        module = tester_module.update_mem_chain("design.dcp", [
+            tester_module.font_update("font.mem"),
+            tester_module.background_update("background.mem", output_dcp="background.dcp"),
+            tester_module.program_update("prog_text.mem", "prog_data.mem", bitstream_filename="chain.bit") ])
+        self.assertTrue(self.execute(module))
+        self.assertTrue((self.lab_path / "background.dcp").exists())
+        self.assertTrue((self.lab_path / "chain.bit").exists())
+
+    def test_missing_checkpoint(self):
+        module = tester_module.update_bitstream_mem("prog_text.mem", "prog_data.mem", "missing.dcp", "prog.bit")
+        self.assertFalse(self.execute(module))
+        self.assertFalse((self.lab_path / "prog.bit").exists())
+
+if __name__ == "__main__":
+    unittest.main()
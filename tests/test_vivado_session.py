@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+'''
+Tests of the reused Vivado tcl sessions (vivado_session). The sessions run 'tclsh' with
+a script that stands in for 'vivado -mode tcl': the commands read from stdin are
+evaluated as they are completed and 'source' accepts the -notrace option of Vivado.
+
+Usage:
+  python3 -m unittest tests.test_vivado_session
+'''
+
+import functools
+import pathlib
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+REPO_ROOT_PATH = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT_PATH / "resources"))
+
+import compressed_log
+import log_monitor
+import vivado_session
+
+TCLSH = shutil.which("tclsh")
+
+VIVADO_TCL = '''rename source tcl_source
+proc source {args} {
+    if {[lindex $args 0] eq "-notrace"} {
+        set args [lrange $args 1 end]
+    }
+    uplevel 1 tcl_source $args
+}
+set command ""
+while {[gets stdin line] >= 0} {
+    append command $line "\\n"
+    if {[info complete $command]} {
+        catch { uplevel #0 $command } message
+        set command ""
+    }
+}
+'''
+
+SCRIPT_TCL = '''puts "script args: $argc [lindex $argv 0] [lindex $argv 1]"
+puts "directory: [file tail [pwd]]"
+if {[lindex $argv 0] eq "fail"} {
+    error "requested failure"
+}
+'''
+
+@unittest.skipUnless(TCLSH, "tclsh is not installed")
+class vivado_session_test(unittest.TestCase):
+    ''' Commands are sent to a running session and their completion and status are reported '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name)
+        (self.path / "script.tcl").write_text(SCRIPT_TCL)
+        (self.path / "vivado.tcl").write_text(VIVADO_TCL)
+        self.session = vivado_session.vivado_session([ TCLSH, str(self.path / "vivado.tcl") ])
+        self.output = []
+
+    def tearDown(self):
+        self.session.stop()
+        self.tmp_dir.cleanup()
+
+    def test_execute(self):
+        self.assertTrue(self.session.start())
+        self.assertEqual(self.session.execute('puts "first"; puts "second"', self.output.append), 0)
+        self.assertEqual(self.output, [ "first\n", "second\n" ])
+        # Output without a newline before the completion marker
+        self.output.clear()
+        self.assertEqual(self.session.execute('puts -nonewline "partial"', self.output.append), 0)
+        self.assertEqual(self.output, [ "partial\n" ])
+        self.output.clear()
+        self.assertEqual(self.session.execute("error {bad command}", self.output.append), 1)
+        self.assertEqual(self.output, [ "ERROR: bad command\n" ])
+        self.assertTrue(self.session.is_running())
+
+    def test_exit(self):
+        self.assertTrue(self.session.start())
+        self.assertEqual(self.session.execute("exit 3", self.output.append), -1)
+        self.assertFalse(self.session.is_running())
+
+    def test_timeout(self):
+        self.assertTrue(self.session.start())
+        self.assertEqual(self.session.execute("after 10000", self.output.append, timeout=0.5), -2)
+        self.assertFalse(self.session.is_running())
+
+    def test_run_script(self):
+        status = self.session.run_script("script.tcl", str(self.path), [ "ok", "two words" ], self.output.append)
+        self.assertEqual(status, 0)
+        self.assertEqual(self.output, [ "Starting Vivado tcl session\n", "script args: 2 ok two words\n",
+            "directory: " + self.path.name + "\n" ])
+        # The same process runs the next script
+        pid = self.session.proc.pid
+        self.output.clear()
+        self.assertEqual(self.session.run_script("script.tcl", str(self.path), [ "fail" ], self.output.append), 1)
+        self.assertEqual(self.output[-1], "ERROR: requested failure\n")
+        self.assertEqual(self.session.proc.pid, pid)
+
+    def test_restart(self):
+        # A session that exited is restarted before the next script
+        self.assertEqual(self.session.run_script("script.tcl", str(self.path), [ "ok" ], self.output.append), 0)
+        self.session.execute("exit", None)
+        self.output.clear()
+        self.assertEqual(self.session.run_script("script.tcl", str(self.path), [ "ok" ], self.output.append), 0)
+        self.assertEqual(self.output[0], "Starting Vivado tcl session\n")
+
+@unittest.skipUnless(TCLSH, "tclsh is not installed")
+class vivado_session_pool_test(unittest.TestCase):
+    ''' The pool reuses idle sessions and writes the output of the scripts to their logs '''
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = pathlib.Path(self.tmp_dir.name)
+        (self.path / "script.tcl").write_text(SCRIPT_TCL)
+        (self.path / "vivado.tcl").write_text(VIVADO_TCL)
+        patcher = mock.patch.object(vivado_session, "vivado_session",
+            functools.partial(vivado_session.vivado_session, [ TCLSH, str(self.path / "vivado.tcl") ]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pool = vivado_session.vivado_session_pool()
+
+    def tearDown(self):
+        self.pool.stop()
+        self.tmp_dir.cleanup()
+
+    def test_run_script(self):
+        for i, arg in enumerate([ "ok", "fail" ]):
+            log_filepath = self.path / str.format("build{}.txt", i)
+            monitor = log_monitor.line_monitor("vivado")
+            status = self.pool.run_script(log_filepath, "script.tcl", str(self.path), [ arg ],
+                monitor=monitor, compress=(i == 1), output_mode="file")
+            self.assertEqual(status, 0 if arg == "ok" else 1)
+            with compressed_log.open_reader(log_filepath) as fp:
+                log = fp.read()
+            self.assertIn("script args: 1 " + arg, log)
+            self.assertEqual("ERROR: requested failure" in log, arg == "fail")
+            # The monitor is given every line of the log after the two header lines
+            self.assertEqual(monitor.line_count, log.count("\n") - 2)
+        self.assertTrue(compressed_log.is_compressed(self.path / "build1.txt"))
+        # The second script ran in the idle session of the first
+        self.assertEqual(len(self.pool.all_sessions), 1)
+
+if __name__ == "__main__":
+    unittest.main()